@@ -13,4 +13,9 @@ application = ProtocolTypeRouter({
             erp_main.routing.websocket_urlpatterns  # ИЛИ chat.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
+
+# Словари склонений загружаются при старте веб-воркера, а не в первом запросе договора
+from erp_main.services.morphology import Morphology  # noqa: E402
+
+Morphology.preload()
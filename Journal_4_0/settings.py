@@ -154,6 +154,19 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# Кэш процесса (уведомления по заказам) и общий кэш версии каталога фурнитуры в Redis.
+# Недоступность Redis не ломает страницы: каталог перестраивается по таймауту снимка (FurnitureCatalog)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'furniture_catalog': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+}
+FURNITURE_CATALOG_CACHE = 'furniture_catalog'
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
@@ -227,3 +240,15 @@ STATIC_ROOT = BASE_DIR / "staticfiles"  # для collectstatic
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Фоновая обработка загруженных бланков заказов (erp_main.services.order_import_jobs)
+ORDER_IMPORT_ASYNC = True
+ORDER_IMPORT_WORKERS = 2
+
+# Резерв фурнитуры заказа при запуске в производство (erp_main.services.order_reservation).
+# Включать только после ввода фактических остатков склада: иначе запуск заказов с комплектами будет отклонен
+ORDER_FURNITURE_RESERVATION = False
+
+# Загрузка словарей pymorphy3 при старте веб-воркера (wsgi.py/asgi.py), а не при первом договоре
+# (erp_main.services.morphology); manage.py и фоновые процессы словари не загружают
+CONTRACT_MORPHOLOGY_PRELOAD = True
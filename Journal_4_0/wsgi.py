@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Journal_4_0.settings')
 
 application = get_wsgi_application()
+
+# Словари склонений загружаются при старте веб-воркера, а не в первом запросе договора
+from erp_main.services.morphology import Morphology  # noqa: E402
+
+Morphology.preload()
@@ -109,25 +109,31 @@ class InternalLegalEntityAdmin(admin.ModelAdmin):
     class Media:
         js = ('admin/js/internal_legal_entity.js',)
 
+class OrganizationSearchMixin:
+    """Поиск в админке по общему индексу контрагентов вместо LIKE по каждому полю из search_fields"""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
+
 @admin.register(LegalEntity)
-class LegalEntityAdmin(admin.ModelAdmin):
+class LegalEntityAdmin(OrganizationSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'legal_form', 'inn', 'internal_legal_entity', 'user', 'created_at']
     list_filter = ['legal_form', 'internal_legal_entity', 'created_at']
     search_fields = ['name', 'inn', 'ogrn']
-    readonly_fields = ['history']
 
 @admin.register(IndividualEntrepreneur)
-class IndividualEntrepreneurAdmin(admin.ModelAdmin):
+class IndividualEntrepreneurAdmin(OrganizationSearchMixin, admin.ModelAdmin):
     list_display = ['full_name', 'inn', 'internal_legal_entity', 'user', 'created_at']
     list_filter = ['internal_legal_entity', 'created_at']
-    search_fields = ['full_name', 'inn', 'ogrnip']
-    readonly_fields = ['history']
+    search_fields = ['full_name', 'inn', 'ogrn']
 
 @admin.register(PhysicalPerson)
-class PhysicalPersonAdmin(admin.ModelAdmin):
+class PhysicalPersonAdmin(OrganizationSearchMixin, admin.ModelAdmin):
     list_display = ['full_name', 'phone', 'user', 'created_at']
     search_fields = ['full_name', 'phone']
-    readonly_fields = ['history']
 
 # Сначала отменяем стандартную регистрацию
 admin.site.unregister(Group)
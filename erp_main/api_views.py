@@ -1,4 +1,5 @@
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,19 +10,21 @@ from django.shortcuts import get_object_or_404
 from .models import *
 from .serializers import *
 from .filters import *
+from .services.order_reservation import OrderReservationService
+from .services.order_summary import OrderSummaryService
 # from .models import ChatRoom, ChatMessage, UserStatus
 
 class OrganizationViewSet(viewsets.ModelViewSet):
     queryset = Organization.objects.all()
     serializer_class = OrganizationSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrganizationSearchFilter]
     filterset_class = OrganizationFilter
-    search_fields = ['name', 'name_fl', 'inn']
 
     def get_queryset(self):
+        queryset = Organization.objects.select_related('user').with_stats()
         if self.request.user.is_superuser:
-            return Organization.objects.all()
-        return Organization.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
 
 class InternalLegalEntityViewSet(viewsets.ModelViewSet):
@@ -34,14 +37,18 @@ class InternalLegalEntityViewSet(viewsets.ModelViewSet):
 class InvoiceViewSet(viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrganizationSearchFilter]
     filterset_class = InvoiceFilter
-    search_fields = ['number', 'organization__name']
+    search_fields = ['number']
+    organization_search_field = 'organization'
 
     def get_queryset(self):
+        queryset = Invoice.objects.select_related('internal_legal_entity').prefetch_related(
+            prefetch_organization_subtypes('organization', Organization.objects.select_related('user'))
+        )
         if self.request.user.is_superuser:
-            return Invoice.objects.all()
-        return Invoice.objects.filter(organization__user=self.request.user)
+            return queryset
+        return queryset.filter(organization__user=self.request.user)
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -52,20 +59,31 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.request.user.is_superuser:
-            return Order.objects.all()
-        return Order.objects.filter(invoice__organization__user=self.request.user)
+            queryset = Order.objects.all()
+        else:
+            queryset = Order.objects.filter(invoice__organization__user=self.request.user)
+        return queryset.with_rollups().select_related('invoice__internal_legal_entity').prefetch_related(
+            'items',
+            prefetch_organization_subtypes('invoice__organization', Organization.objects.select_related('user')),
+        )
 
     @action(detail=True, methods=['post'])
     def update_workshop(self, request, pk=None):
         order = self.get_object()
         workshop = request.data.get('workshop')
 
-        if workshop in ['1', '3']:
-            order.items.update(workshop=workshop, p_status='product')
-        elif workshop == '2':
-            order.items.update(workshop=workshop, p_status='stopped')
-        elif workshop == '4':
-            order.items.update(p_status='ready')
+        try:
+            with transaction.atomic():
+                if workshop in ['1', '3']:
+                    order.items.update(workshop=workshop, p_status='product')
+                elif workshop == '2':
+                    order.items.update(workshop=workshop, p_status='stopped')
+                elif workshop == '4':
+                    order.items.update(p_status='ready')
+                OrderSummaryService.refresh([order.pk])
+                OrderReservationService.sync_orders([order.pk], request.user, reserve=workshop in ['1', '3'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'status': 'workshop updated'})
 
@@ -80,14 +98,22 @@ class OrderItemViewSet(viewsets.ModelViewSet):
     def bulk_update_status(self, request):
         updates = request.data.get('updates', {})
 
-        for item_id, data in updates.items():
-            try:
-                item = OrderItem.objects.get(id=item_id)
-                item.p_status = data.get('status', item.p_status)
-                item.workshop = data.get('workshop', item.workshop)
-                item.save()
-            except OrderItem.DoesNotExist:
-                continue
+        try:
+            with transaction.atomic():
+                order_ids, started = set(), False
+                for item_id, data in updates.items():
+                    try:
+                        item = OrderItem.objects.get(id=item_id)
+                        item.p_status = data.get('status', item.p_status)
+                        item.workshop = data.get('workshop', item.workshop)
+                        item.save()
+                    except OrderItem.DoesNotExist:
+                        continue
+                    order_ids.add(item.order_id)
+                    started = started or item.p_status == 'product'
+                OrderReservationService.sync_orders(order_ids, request.user, reserve=started)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'status': 'items updated'})
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ErpMainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'erp_main'
+
+    def ready(self):
+        from . import signals  # noqa: F401
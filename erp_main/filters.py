@@ -1,5 +1,7 @@
 import django_filters
 from django import template
+from django.db.models import Q
+from rest_framework.filters import SearchFilter
 from .models import *
 
 register = template.Library()
@@ -9,13 +11,35 @@ def get_item(dictionary, key):
     """Получить значение из словаря по ключу"""
     return dictionary.get(key)
 
+class OrganizationSearchFilter(SearchFilter):
+    """
+    ?search= по общему индексу контрагентов.
+    organization_search_field у view - путь к контрагенту (для счетов 'organization'), без него ищутся
+    сами контрагенты; search_fields view добавляются через ИЛИ обычным icontains.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        field = getattr(view, 'organization_search_field', None)
+        organizations = Organization.objects.search(query).values('pk')
+        condition = Q(**{f'{field}__in' if field else 'pk__in': organizations})
+        for search_field in getattr(view, 'search_fields', None) or []:
+            condition |= Q(**{f'{search_field}__icontains': query})
+        return queryset.filter(condition)
+
+
 class OrganizationFilter(django_filters.FilterSet):
     user = django_filters.NumberFilter(field_name='user__id')
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Organization
-        fields = ['kind', 'user']
+        fields = ['type', 'user']
+
+    def filter_name(self, queryset, name, value):
+        return queryset.search(value)
 
 
 class InvoiceFilter(django_filters.FilterSet):
@@ -1,8 +1,11 @@
+import zipfile
+
 from django import forms
 from django.contrib.auth.models import User
 from .models import (Organization, Invoice, Order, InternalLegalEntity, OrderItem, Shipment, Certificate,
                      ContractTemplate, LegalEntity, IndividualEntrepreneur, PhysicalPerson)
 from django.core.exceptions import ValidationError
+from .services.organization_identifiers import OrganizationIdentifiers
 
 
 # class UserCreationForm(forms.ModelForm):
@@ -31,6 +34,28 @@ class OrderForm(forms.ModelForm):
             self.fields['invoice'].queryset = Invoice.objects.all()
 
 
+class OrderBatchForm(forms.Form):
+    """Пакетная загрузка бланков заказов из ZIP-архива"""
+    archive = forms.FileField(label='ZIP-архив с бланками')
+    invoice = forms.ModelChoiceField(queryset=Invoice.objects.none(), label='Счет')
+    due_date = forms.DateField(required=False, label='Дата готовности', widget=forms.DateInput(attrs={'type': 'date'}))
+    comment = forms.CharField(required=False, label='Комментарий', widget=forms.Textarea(attrs={'rows': 2}))
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not user.is_superuser:
+            self.fields['invoice'].queryset = Invoice.objects.filter(organization__user=user)
+        else:
+            self.fields['invoice'].queryset = Invoice.objects.all()
+
+    def clean_archive(self):
+        archive = self.cleaned_data['archive']
+        if not zipfile.is_zipfile(archive):
+            raise ValidationError('Загрузите ZIP-архив с бланками заказов')
+        archive.seek(0)
+        return archive
+
+
 class InternalLegalEntityForm(forms.ModelForm):
     class Meta:
         model = InternalLegalEntity
@@ -91,7 +116,43 @@ class InternalLegalEntityForm(forms.ModelForm):
         }
 
 
-class LegalEntityForm(forms.ModelForm):
+class OrganizationDuplicateCheckMixin:
+    """
+    Проверка дубликатов контрагента по реестру идентификаторов одним запросом до сохранения,
+    в том числе между типами (ИНН юрлица у ИП и т.п.). Реестр не видит изменений в обход save()
+    (queryset.update(), загрузки), поэтому обычная проверка уникальности полей модели остается:
+    она срабатывает для полей, по которым реестр ошибку не нашел.
+    """
+
+    # Вид идентификатора -> поле формы для сообщения об ошибке
+    DUPLICATE_FIELDS = {
+        OrganizationIdentifiers.INN: 'inn',
+        OrganizationIdentifiers.OGRN: 'ogrn',
+        OrganizationIdentifiers.KPP_INN: 'kpp',
+        OrganizationIdentifiers.PHONE: 'phone',
+    }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        identifiers = OrganizationIdentifiers.values(self._meta.model.__name__, cleaned_data)
+        duplicates = OrganizationIdentifiers.duplicates(identifiers, exclude=self.instance.pk)
+        if duplicates:
+            names = dict(Organization.objects.filter(
+                pk__in={organization_id for _, _, organization_id in duplicates}
+            ).values_list('pk', 'display_name'))
+            kinds = dict(OrganizationIdentifiers.KINDS)
+            for kind, _, organization_id in duplicates:
+                field = self.DUPLICATE_FIELDS.get(kind)
+                message = (f"{kinds[kind]} уже указан у контрагента "
+                           f"«{names.get(organization_id) or organization_id}»")
+                if field in self.fields and field not in self.errors:
+                    self.add_error(field, message)
+                elif field not in self.fields:
+                    self.add_error(None, message)
+        return cleaned_data
+
+
+class LegalEntityForm(OrganizationDuplicateCheckMixin, forms.ModelForm):
     show_advanced = forms.BooleanField(
         required=False,
         initial=False,
@@ -135,7 +196,7 @@ class LegalEntityForm(forms.ModelForm):
         self.fields['internal_legal_entity'].required = True
 
 
-class IndividualEntrepreneurForm(forms.ModelForm):
+class IndividualEntrepreneurForm(OrganizationDuplicateCheckMixin, forms.ModelForm):
     show_advanced = forms.BooleanField(
         required=False,
         initial=False,
@@ -171,7 +232,7 @@ class IndividualEntrepreneurForm(forms.ModelForm):
         self.fields['internal_legal_entity'].required = True
 
 
-class PhysicalPersonForm(forms.ModelForm):
+class PhysicalPersonForm(OrganizationDuplicateCheckMixin, forms.ModelForm):
     show_advanced = forms.BooleanField(
         required=False,
         initial=False,
@@ -216,10 +277,10 @@ class InvoiceForm(forms.ModelForm):
         self.fields['internal_legal_entity'].queryset = InternalLegalEntity.objects.all()
         self.fields['organization'].label = 'Организация'
         if not user.is_superuser:
-            self.fields['organization'].queryset = Organization.objects.filter(user=user)
+            self.fields['organization'].queryset = Organization.objects.filter(user=user).order_by('display_name')
 
         else:
-            self.fields['organization'].queryset = Organization.objects.all()
+            self.fields['organization'].queryset = Organization.objects.order_by('display_name')
 
     def __str__(self):
         return self.number if self.number else "Без номера"
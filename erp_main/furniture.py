@@ -122,6 +122,17 @@ class LockCylinder(BaseFurnitureItem):
         verbose_name_plural = 'Цилиндровые механизмы'
 
 
+class FurnitureKitQuerySet(models.QuerySet):
+    def with_items(self):
+        """Предзагрузка замков, ручек и ц/м для codes_string(): 4 запроса на любой набор комплектов"""
+        return self.prefetch_related(
+            models.Prefetch('furniturekitlock_set', queryset=FurnitureKitLock.objects.select_related('door_lock')),
+            models.Prefetch('furniturekithandle_set', queryset=FurnitureKitHandle.objects.select_related('door_handle')),
+            models.Prefetch('furniturekitcylinder_set',
+                            queryset=FurnitureKitCylinder.objects.select_related('lock_cylinder')),
+        )
+
+
 class FurnitureKit(models.Model):
     """Комплект фурнитуры - связан с OrderItem через OneToOne"""
     name = models.CharField(max_length=100, verbose_name='Наименование комплекта', blank=True)
@@ -158,6 +169,15 @@ class FurnitureKit(models.Model):
         verbose_name='Позиция'
     )
 
+    objects = FurnitureKitQuerySet.as_manager()
+
+    # (строки комплекта, атрибут элемента фурнитуры) в порядке частей кода
+    ITEM_SETS = (
+        ('furniturekitlock_set', 'door_lock'),
+        ('furniturekithandle_set', 'door_handle'),
+        ('furniturekitcylinder_set', 'lock_cylinder'),
+    )
+
     class Meta:
         verbose_name = 'Комплект фурнитуры'
         verbose_name_plural = 'Комплекты фурнитуры'
@@ -167,6 +187,18 @@ class FurnitureKit(models.Model):
             return self.name
         return f'Комплект фурнитуры для {self.order_item.id}'
 
+    def codes_string(self):
+        """
+        Коды фурнитуры комплекта в формате 'замки-ручки-ц/м', например '12.15-07-00'.
+        Только чтение; с FurnitureKit.objects.with_items() не выполняет запросов.
+        """
+        parts = []
+        for set_name, item_attr in self.ITEM_SETS:
+            rows = sorted(getattr(self, set_name).all(), key=lambda row: row.pk)
+            codes = [str(getattr(row, item_attr).get_code() or '00') for row in rows]
+            parts.append('.'.join(codes) if codes else '00')
+        return '-'.join(parts)
+
     def save(self, *args, **kwargs):
         # Автоматически генерируем имя, если оно не указано
         if not self.name and self.order_item:
@@ -174,10 +206,44 @@ class FurnitureKit(models.Model):
         super().save(*args, **kwargs)
 
 
-class FurnitureKitLock(models.Model):
+class FurnitureKitItem(models.Model):
+    """
+    Базовая модель строки комплекта фурнитуры.
+    Запоминает комплект и элемент фурнитуры при загрузке из БД, чтобы сигналы пересчитывали
+    коды позиции только при реальном изменении состава комплекта (количество на коды не влияет).
+    """
+    item_field = None  # Имя ForeignKey на элемент фурнитуры
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_codes_key = instance._codes_key()
+        return instance
+
+    def _codes_key(self):
+        return self.__dict__.get('furniture_kit_id'), self.__dict__.get(f'{self.item_field}_id')
+
+    @property
+    def loaded_kit_id(self):
+        """Комплект, к которому строка относилась при загрузке (None для новой строки)"""
+        return getattr(self, '_loaded_codes_key', (None, None))[0]
+
+    def codes_changed(self):
+        """Новая строка, другой элемент фурнитуры или другой комплект"""
+        return getattr(self, '_loaded_codes_key', None) != self._codes_key()
+
+    def mark_codes_saved(self):
+        self._loaded_codes_key = self._codes_key()
+
+
+class FurnitureKitLock(FurnitureKitItem):
     """Связь комплекта фурнитуры с замком"""
     furniture_kit = models.ForeignKey(FurnitureKit, on_delete=models.CASCADE)
     door_lock = models.ForeignKey(DoorLock, on_delete=models.CASCADE)
+    item_field = 'door_lock'
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
 
     class Meta:
@@ -189,10 +255,11 @@ class FurnitureKitLock(models.Model):
         return f"{self.door_lock.name} × {self.quantity}"
 
 
-class FurnitureKitHandle(models.Model):
+class FurnitureKitHandle(FurnitureKitItem):
     """Связь комплекта фурнитуры с ручкой"""
     furniture_kit = models.ForeignKey(FurnitureKit, on_delete=models.CASCADE)
     door_handle = models.ForeignKey(DoorHandle, on_delete=models.CASCADE)
+    item_field = 'door_handle'
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
 
     class Meta:
@@ -204,10 +271,11 @@ class FurnitureKitHandle(models.Model):
         return f"{self.door_handle.name} × {self.quantity}"
 
 
-class FurnitureKitCylinder(models.Model):
+class FurnitureKitCylinder(FurnitureKitItem):
     """Связь комплекта фурнитуры с ц/м"""
     furniture_kit = models.ForeignKey(FurnitureKit, on_delete=models.CASCADE)
     lock_cylinder = models.ForeignKey(LockCylinder, on_delete=models.CASCADE)
+    item_field = 'lock_cylinder'
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
 
     class Meta:
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from erp_main.services.furniture_codes import FurnitureCodesService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает коды фурнитуры (p_furniture) всех позиций с комплектами фурнитуры'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        checked, updated = FurnitureCodesService.backfill(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проверено комплектов: {checked}, обновлено позиций: {updated}'))
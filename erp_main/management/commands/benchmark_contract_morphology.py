@@ -0,0 +1,120 @@
+import time
+
+import pymorphy3
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from erp_main.models import InternalLegalEntity, LegalEntity
+from erp_main.services.morphology import Morphology
+
+SAMPLES = [
+    ('генеральный директор', 'Иванов Петр Сергеевич'),
+    ('директор', 'Смирнова Анна Викторовна'),
+    ('исполнительный директор', 'Кузнецов Олег Игоревич'),
+    ('управляющий', 'Попова Мария Андреевна'),
+]
+
+
+def legacy_genitive_case(word, morph=None):
+    """Прежнее склонение: create_contract в views.py создавал анализатор на каждый вызов"""
+    if not word:
+        return ""
+    morph = morph or pymorphy3.MorphAnalyzer()
+    try:
+        words = word.split()
+        modified_words = []
+        for w in words:
+            parsed_word = morph.parse(w)[0]
+            if "NOUN" in parsed_word.tag or "ADJF" in parsed_word.tag:
+                modified_words.append(parsed_word.inflect({"gent"}).word)
+            else:
+                modified_words.append(w)
+        if len(words) == 3:
+            return " ".join(word.capitalize() for word in modified_words)
+        return " ".join(modified_words)
+    except Exception:
+        return word
+
+
+def legacy_workday_phrase(number, morph=None):
+    morph = morph or pymorphy3.MorphAnalyzer()
+    if number % 10 == 1 and number % 100 != 11:
+        workday_form = morph.parse('рабочий')[0].inflect({'nomn', 'sing'}).word
+    else:
+        workday_form = morph.parse('рабочий')[0].inflect({'gent', 'plur'}).word
+    return f"{number} {workday_form}"
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время склонений для договора: анализатор на каждый вызов (views.py), '
+            'анализатор на каждый генератор (прежний ContractGenerator), общий анализатор с кэшем')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contracts', type=int, default=20, help='Договоров в замере')
+        parser.add_argument('--days', type=int, default=21, help='Срок в рабочих днях')
+
+    def samples(self):
+        """Пары (должность, ФИО) руководителей из базы: юрлица компании и контрагенты-юрлица"""
+        full_name = r'^\S+\s+\S+\s+\S+$'
+        rows = list(InternalLegalEntity.objects.filter(
+            ~Q(ceo_title=''), ceo_title__isnull=False, ceo_name__regex=full_name
+        ).values_list('ceo_title', 'ceo_name').distinct()[:50])
+        positions = dict(LegalEntity.LEADER_POSITIONS)
+        rows += [
+            (positions.get(position, 'директор').lower(), name)
+            for position, name in LegalEntity.objects.filter(leader_name__regex=full_name).values_list(
+                'leader_position', 'leader_name').distinct()[:50]
+        ]
+        return rows or SAMPLES
+
+    def measure(self, func, contracts):
+        started = time.perf_counter()
+        for number in range(contracts):
+            func(number)
+        return (time.perf_counter() - started) * 1000 / contracts
+
+    def handle(self, *args, **options):
+        samples = self.samples()
+        contracts = options['contracts']
+        days = options['days']
+
+        def parties(number):
+            # Юрлицо компании и контрагент договора
+            return samples[number % len(samples)], samples[(number + 1) % len(samples)]
+
+        def per_call(number):
+            for title, name in parties(number):
+                legacy_genitive_case(title)
+                legacy_genitive_case(name)
+            legacy_workday_phrase(days)
+
+        def per_generator(number):
+            morph = pymorphy3.MorphAnalyzer()
+            for title, name in parties(number):
+                legacy_genitive_case(title, morph)
+                legacy_genitive_case(name, morph)
+            legacy_workday_phrase(days, morph)
+
+        def shared(number):
+            for title, name in parties(number):
+                Morphology.genitive_case(title)
+                Morphology.genitive_case(name)
+                Morphology.format_full_name(*name.split())
+            Morphology.get_workday_phrase(days)
+
+        # Первый договор процесса без предзагрузки: загрузка словарей и пустой кэш
+        Morphology._analyzer = None
+        Morphology.cache_clear()
+        cold = self.measure(shared, 1)
+
+        results = [
+            ('Анализатор на каждый вызов (views.py)', self.measure(per_call, contracts)),
+            ('Анализатор на каждый генератор (прежний ContractGenerator)', self.measure(per_generator, contracts)),
+            ('Общий анализатор: первый договор процесса', cold),
+            ('Общий анализатор с кэшем после прогрева', self.measure(shared, contracts)),
+        ]
+        self.stdout.write(f'Руководителей в выборке: {len(samples)}, договоров: {contracts}')
+        for label, value in results:
+            self.stdout.write(f'{label}: {value:.2f} мс на договор')
+        info = Morphology.cache_info()['genitive_case']
+        self.stdout.write(self.style.SUCCESS(f'Кэш склонений: попаданий {info.hits}, промахов {info.misses}'))
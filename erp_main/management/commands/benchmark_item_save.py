@@ -0,0 +1,104 @@
+import uuid
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+
+from erp_main.furniture import DoorLock, DoorHandle, LockCylinder, FurnitureKit
+from erp_main.models import OrderItem
+from erp_main.signals import refresh_order_summary_on_save
+
+
+def new_code():
+    return uuid.uuid4().hex[:12]
+
+
+def legacy_generate_codes(item):
+    """Прежний расчет кодов: exists() и упорядоченный запрос на каждый тип плюс повторный save()"""
+    def format_items(items, attr):
+        if not items.exists():
+            return "00"
+        return ".".join(str(getattr(row, attr).get_code()) for row in items.order_by('id'))
+
+    kit = item.furniture_kit
+    item.p_furniture = (f"{format_items(kit.furniturekitlock_set.all(), 'door_lock')}-"
+                        f"{format_items(kit.furniturekithandle_set.all(), 'door_handle')}-"
+                        f"{format_items(kit.furniturekitcylinder_set.all(), 'lock_cylinder')}")
+    legacy_save(item, update_fields=['p_furniture'])
+
+
+@contextmanager
+def legacy_signals():
+    """Без обработчиков post_save позиции, которых не было в прежнем коде (пересчет сводки заказа)"""
+    post_save.disconnect(refresh_order_summary_on_save, sender=OrderItem)
+    try:
+        yield
+    finally:
+        post_save.connect(refresh_order_summary_on_save, sender=OrderItem)
+
+
+def legacy_save(item, **kwargs):
+    """Прежний OrderItem.save(): после каждого сохранения коды фурнитуры пересчитывались заново"""
+    models.Model.save(item, **kwargs)
+    if hasattr(item, 'furniture_kit') and item.furniture_kit is not None:
+        if 'p_furniture' not in kwargs.get('update_fields', []):
+            legacy_generate_codes(item)
+
+
+def legacy_measure_save(item, **kwargs):
+    with legacy_signals():
+        legacy_save(item, **kwargs)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает количество запросов при сохранении позиции с комплектом фурнитуры: до и после'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item', type=int, default=None, help='id позиции (по умолчанию - первая)')
+        parser.add_argument('--locks', type=int, default=2, help='Замков в тестовом комплекте')
+
+    def count(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries.captured_queries)
+
+    def handle(self, *args, **options):
+        item = OrderItem.objects.filter(pk=options['item']).first() if options['item'] else OrderItem.objects.first()
+        if item is None:
+            raise CommandError('Нет позиций заказа для замера')
+
+        # Все изменения откатываются в конце
+        with transaction.atomic():
+            kit = FurnitureKit.objects.filter(order_item=item).first() or FurnitureKit.objects.create(order_item=item)
+            for _ in range(options['locks']):
+                kit.furniturekitlock_set.create(door_lock=DoorLock.objects.create(name='замок', code=new_code()))
+            kit.furniturekithandle_set.create(door_handle=DoorHandle.objects.create(name='ручка', code=new_code()))
+            kit.furniturekitcylinder_set.create(lock_cylinder=LockCylinder.objects.create(name='ц/м', code=new_code()))
+            lock_row = kit.furniturekitlock_set.first()
+            lock_row.quantity += 1
+            handle = DoorHandle.objects.create(name='ручка', code=new_code())
+
+            def measure(save, **changes):
+                fresh = OrderItem.objects.get(pk=item.pk)
+                for name, value in changes.items():
+                    setattr(fresh, name, value)
+                return self.count(lambda: save(fresh))
+
+            new_status = 'product' if item.p_status != 'product' else 'ready'
+            results = [
+                ('Изменение комментария: прежний save', measure(legacy_measure_save, p_comment='замер')),
+                ('Изменение комментария: текущий save', measure(OrderItem.save, p_comment='замер 2')),
+                ('Изменение статуса: прежний save', measure(legacy_measure_save, p_status=new_status)),
+                ('Изменение статуса: текущий save', measure(OrderItem.save, p_status=item.p_status)),
+                ('Изменение количества замка в комплекте', self.count(lambda: lock_row.save())),
+                ('Добавление ручки в комплект', self.count(
+                    lambda: kit.furniturekithandle_set.create(door_handle=handle)
+                )),
+            ]
+
+            transaction.set_rollback(True)
+
+        for title, queries in results:
+            self.stdout.write(f'{title}: {queries} запр.')
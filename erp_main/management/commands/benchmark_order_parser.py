@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook, load_workbook
+
+from erp_main.services.order_processor import OrderProcessor
+
+
+def build_blank(path, positions, extra_glass_rows=1):
+    """Создает синтетический бланк заказа с указанным количеством позиций"""
+    wb = Workbook()
+    sheet = wb.active
+    sheet.cell(row=1, column=3, value="Бланк №")
+    row = OrderProcessor.FIRST_ROW
+    for num in range(1, positions + 1):
+        values = [num, 'Дверь ДМП EI-60-м' if num % 2 else 'Люк тех.', 2050, 950 + num % 50, None, 'R',
+                  600, 400, 'наличник', '01-01-01', 'доводчик', 'порог', 7035, 1, 'комментарий']
+        for column, value in enumerate(values, start=1):
+            sheet.cell(row=row, column=column, value=value)
+        row += 1
+        for _ in range(extra_glass_rows):
+            sheet.cell(row=row, column=7, value=300)
+            sheet.cell(row=row, column=8, value=300)
+            row += 1
+    sheet.cell(row=row, column=OrderProcessor.LAST_COLUMN, value='шт.')
+    wb.save(path)
+
+
+def legacy_parse(path):
+    """Прежний разбор: бланк открывается дважды и читается по ячейкам"""
+    wb = load_workbook(path)
+    if wb.active.cell(row=1, column=3).value != "Бланк №":
+        return []
+    wb = load_workbook(path)
+    sheet = wb.active
+
+    cur_row, cur_column = 9, 15
+    while sheet.cell(row=cur_row, column=cur_column).value != 'шт.':
+        cur_row += 1
+    max_row = cur_row
+
+    seq = [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 15, 7, 8]
+    positions = []
+    line = []
+    for row in range(8, max_row):
+        if sheet.cell(row=row, column=2).value:
+            if line:
+                positions.append(line)
+            line = [sheet.cell(row=row, column=column).value for column in seq]
+        else:
+            line.extend([sheet.cell(row=row, column=7).value, sheet.cell(row=row, column=8).value])
+    if line:
+        positions.append(line)
+    return positions
+
+
+def streaming_parse(path):
+    return list(OrderProcessor.read_blank(path))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время и пиковую память разбора бланка: прежний разбор и потоковый read_only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, nargs='+', default=[100, 500, 2000])
+        parser.add_argument('--glass-rows', type=int, default=1,
+                            help='Дополнительных строк со стеклом на позицию')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def measure(self, parse, path, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = parse(path)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        tracemalloc.start()
+        parse(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, best, peak
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'позиций':>8} {'прежний, с':>11} {'потоковый, с':>13} "
+                          f"{'прежний, МБ':>12} {'потоковый, МБ':>14}")
+
+        for positions in options['positions']:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'blank.xlsx')
+                build_blank(path, positions, options['glass_rows'])
+
+                legacy, legacy_time, legacy_peak = self.measure(legacy_parse, path, options['repeat'])
+                streamed, stream_time, stream_peak = self.measure(streaming_parse, path, options['repeat'])
+
+            if legacy != streamed:
+                self.stderr.write(f'{positions}: результаты разбора не совпадают')
+
+            self.stdout.write(f"{positions:>8} {legacy_time:>11.3f} {stream_time:>13.3f} "
+                              f"{legacy_peak / 2 ** 20:>12.1f} {stream_peak / 2 ** 20:>14.1f}")
@@ -0,0 +1,73 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from erp_main.furniture import DoorLock
+from erp_main.models import StockOperation, StockOperationItem
+from erp_main.services.warehouse import WarehouseService
+
+
+@transaction.atomic
+def legacy_reserve_items(user, items, comment=""):
+    """Прежнее резервирование: проверка по экземплярам в памяти, INSERT и save() на каждую строку"""
+    for item_data in items:
+        if not item_data['item'].can_reserve(item_data['quantity']):
+            raise ValueError(f"Недостаточно {item_data['item'].name} на складе")
+    operation = StockOperation.objects.create(operation_type='reservation', created_by=user, comment=comment)
+    for item_data in items:
+        item = item_data['item']
+        StockOperationItem.objects.create(
+            operation=operation,
+            content_type=ContentType.objects.get_for_model(item),
+            object_id=item.id,
+            quantity=item_data['quantity'],
+        )
+        item.reserved_quantity += item_data['quantity']
+        item.save()
+    return operation
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость и число запросов резервирования большой операции: до и после. '
+            'Все изменения, включая тестовые замки, откатываются. '
+            'Отсутствие потерянных обновлений при параллельной работе проверяет WarehouseConcurrencyTests')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000, help='Строк в одной операции')
+        parser.add_argument('--items', type=int, default=200, help='Тестовых замков')
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('Нужен хотя бы один пользователь для автора операций')
+
+        with transaction.atomic():
+            prefix = f'benchmark-{uuid.uuid4().hex[:8]}'
+            DoorLock.objects.bulk_create([
+                DoorLock(name='тестовый замок', code=f'{prefix}-{n}', quantity_in_stock=options['lines'])
+                for n in range(options['items'])
+            ])
+            items = list(DoorLock.objects.filter(code__startswith=prefix))
+
+            for title, reserve in (('прежняя реализация', legacy_reserve_items),
+                                   ('текущая реализация', WarehouseService.reserve_items)):
+                lines = [{'item': random.choice(items), 'quantity': 1} for _ in range(options['lines'])]
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        reserve(user, lines, comment='benchmark_warehouse')
+                        elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                for item in items:
+                    item.refresh_from_db(fields=['quantity_in_stock', 'reserved_quantity'])
+                self.stdout.write(
+                    f'Резерв {options["lines"]} строк, {title}: {elapsed:.3f} с, '
+                    f'{len(queries.captured_queries)} запр., {options["lines"] / elapsed:.0f} строк/с'
+                )
+            transaction.set_rollback(True)
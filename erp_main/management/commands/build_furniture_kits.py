@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from erp_main.models import Order
+from erp_main.services.furniture_kits import FurnitureKitImportService
+
+
+class Command(BaseCommand):
+    help = 'Создает комплекты фурнитуры по кодам p_furniture для позиций без комплекта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order', type=int, action='append', help='id заказа (можно несколько), по умолчанию все')
+        parser.add_argument('--rebuild', action='store_true', help='Пересоздать существующие комплекты')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.order_by('pk')
+        if options['order']:
+            orders = orders.filter(pk__in=options['order'])
+
+        created = 0
+        for order in orders.iterator():
+            rebuild = order.items.filter(furniture_kit__isnull=False).values_list('pk', flat=True) \
+                if options['rebuild'] else ()
+            result = FurnitureKitImportService.build_kits(order, rebuild=list(rebuild))
+            created += result['created']
+            for position, codes in result['unresolved'].items():
+                self.stdout.write(self.style.WARNING(
+                    f"Заказ {order.pk}, поз. {position}: не найдены коды фурнитуры {', '.join(codes)}"
+                ))
+
+        self.stdout.write(self.style.SUCCESS(f'Создано комплектов: {created}'))
@@ -0,0 +1,33 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_main.services.order_processor import OrderProcessor
+from erp_main.services.product_classifier import product_classifier
+
+
+class Command(BaseCommand):
+    help = 'Показывает, как классифицируются наименования изделий из бланков и какие правила сработали'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Файлы бланков .xlsx')
+        parser.add_argument('--unmatched', action='store_true',
+                            help='Только наименования, для которых не определен вид или тип')
+
+    def handle(self, *args, **options):
+        names = Counter()
+        for path in options['files']:
+            positions, error = OrderProcessor.parse_blank_file(path)
+            if error:
+                raise CommandError(f'{path}: {error}')
+            names.update(str(data[1]) for data in positions)
+
+        for name, count in names.most_common():
+            product = product_classifier.classify(name)
+            if options['unmatched'] and product.kind and product.type:
+                continue
+            rules = ', '.join(f'{dimension}: "{pattern}"' for dimension, pattern in product.matched) or 'нет'
+            self.stdout.write(f'{name} (x{count}): {product.kind} / {product.type} / {product.construction}; '
+                              f'правила: {rules}')
+
+        self.stdout.write(self.style.SUCCESS(f'Наименований: {len(names)}; кэш: {product_classifier.cache_info()}'))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from erp_main.models import Organization
+from erp_main.services.organization_similarity import OrganizationSimilarity
+
+
+class Command(BaseCommand):
+    help = ('Отчет о возможных дубликатах контрагентов: группы контрагентов с похожими наименованиями '
+            'по триграммному индексу, без попарного сравнения всей базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=OrganizationSimilarity.THRESHOLD,
+                            help='Минимальная схожесть наименований, от 0 до 1')
+        parser.add_argument('--max-postings', type=int, default=OrganizationSimilarity.MAX_POSTINGS,
+                            help='Триграммы, встречающиеся у большего числа контрагентов, не используются для пар')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        clusters = OrganizationSimilarity.clusters(options['threshold'], max_postings=options['max_postings'])
+        organizations = Organization.objects.filter(
+            pk__in=[pk for cluster in clusters for pk in cluster]
+        ).select_related('user').with_subtypes().with_stats().in_bulk()
+
+        for number, cluster in enumerate(clusters, 1):
+            self.stdout.write(f'Группа {number}:')
+            for pk in cluster:
+                organization = organizations.get(pk)
+                if organization is None:
+                    continue
+                self.stdout.write(
+                    f'  #{pk} {organization.display_name} ({organization.get_type_display()}, '
+                    f'{organization.inn or organization.phone or "без ИНН"}), менеджер {organization.user.username}, '
+                    f'счетов на {organization.invoices_total}, заказов {organization.orders_count}'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Групп: {len(clusters)}, контрагентов в них: {sum(len(cluster) for cluster in clusters)}, '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
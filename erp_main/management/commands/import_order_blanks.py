@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_main.models import Invoice
+from erp_main.services.order_batch_import import OrderBatchImportService
+
+
+class Command(BaseCommand):
+    help = 'Пакетная загрузка бланков заказов из ZIP-архива или папки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Путь к ZIP-архиву или папке с бланками .xlsx')
+        parser.add_argument('--invoice', type=int, required=True, help='id счета, к которому относятся заказы')
+        parser.add_argument('--due-date', default=None, help='Дата готовности (ГГГГ-ММ-ДД)')
+        parser.add_argument('--comment', default='')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Количество процессов разбора (по умолчанию - число ядер)')
+
+    def handle(self, *args, **options):
+        try:
+            invoice = Invoice.objects.get(pk=options['invoice'])
+        except Invoice.DoesNotExist:
+            raise CommandError(f"Счет {options['invoice']} не найден")
+
+        report = OrderBatchImportService.import_source(
+            options['source'], invoice=invoice, due_date=options['due_date'],
+            comment=options['comment'], workers=options['workers'],
+        )
+
+        for result in report:
+            if result['success']:
+                self.stdout.write(f"{result['file']}: заказ {result['order_id']}, позиций {result['positions']}")
+                for position, codes in result['unresolved_furniture'].items():
+                    self.stdout.write(self.style.WARNING(f"  поз. {position}: не найдены коды фурнитуры {', '.join(codes)}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{result['file']}: {result['error']}"))
+
+        created = sum(1 for result in report if result['success'])
+        self.stdout.write(self.style.SUCCESS(f'Создано заказов: {created} из {len(report)}'))
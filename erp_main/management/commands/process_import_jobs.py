@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from erp_main.services.order_import_jobs import OrderImportJobService
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает задания загрузки бланков заказов, оставшиеся в очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Максимум заданий за один проход')
+        parser.add_argument('--loop', action='store_true',
+                            help='Работать постоянно, опрашивая очередь (отдельный процесс-обработчик)')
+        parser.add_argument('--interval', type=float, default=2.0, help='Пауза между опросами очереди, сек.')
+
+    def handle(self, *args, **options):
+        while True:
+            count = OrderImportJobService.run_pending(limit=options['limit'])
+            if count:
+                self.stdout.write(self.style.SUCCESS(f'Обработано заданий: {count}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from erp_main.services.order_summary import OrderSummaryService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки по заказам (OrderSummary) с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только сравнить сохраненные сводки с пересчитанными, ничего не записывая')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = OrderSummaryService.diff(batch_size=options['batch_size'])
+            for order_id, fields in mismatches:
+                details = ', '.join(f'{field}: {old} -> {new}' for field, (old, new) in fields.items())
+                self.stdout.write(f'Заказ {order_id}: {details}')
+            if mismatches:
+                self.stdout.write(self.style.WARNING(f'Расхождений: {len(mismatches)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Сводки совпадают с позициями заказов'))
+            return
+
+        count = OrderSummaryService.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано сводок: {count}'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from erp_main.models import IndividualEntrepreneur, LegalEntity, Organization, PhysicalPerson
+from erp_main.services.organization_search import OrganizationSearch
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает display_name и search_text контрагентов и пересоздает полнотекстовый индекс. '
+            'Нужен после массовых изменений через queryset.update() и после миграций, '
+            'пересобирающих таблицу контрагентов на SQLite (при этом удаляются триггеры FTS5)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Псевдоним базы данных')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Строк в одном UPDATE')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        batch_size = options['batch_size']
+        changed = 0
+        with transaction.atomic(using=using):
+            for model in (LegalEntity, IndividualEntrepreneur, PhysicalPerson):
+                rows = []
+                for obj in model.objects.using(using).iterator(chunk_size=2000):
+                    columns = OrganizationSearch.columns(obj)
+                    if columns != (obj.display_name, obj.search_text):
+                        obj.display_name, obj.search_text = columns
+                        rows.append(Organization(pk=obj.pk, display_name=obj.display_name,
+                                                 search_text=obj.search_text))
+                Organization.objects.using(using).bulk_update(rows, ['display_name', 'search_text'],
+                                                              batch_size=batch_size)
+                changed += len(rows)
+            OrganizationSearch.install_index(connections[using])
+        self.stdout.write(self.style.SUCCESS(f'Обновлено контрагентов: {changed}, индекс пересоздан'))
@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_main.services.stock_ledger import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = 'Сверяет итоги складского журнала со счетчиками остатков и резерва товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Записать расхождения в журнал операцией корректировки (начальные остатки)')
+        parser.add_argument('--user', default=None, help='Логин автора корректировки (по умолчанию - первый суперпользователь)')
+
+    def handle(self, *args, **options):
+        discrepancies = StockLedgerService.reconcile()
+        for model, pk, name, counters, journal in discrepancies:
+            title = f'{model._meta.verbose_name if model else "?"} #{pk} {name or "(удален)"}'
+            self.stdout.write(
+                f'{title}: счетчики {counters[0]}/{counters[1]}, журнал {journal[0]}/{journal[1]} (остаток/резерв)'
+            )
+
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS('Журнал совпадает со счетчиками'))
+            return
+        self.stdout.write(self.style.WARNING(f'Расхождений: {len(discrepancies)}'))
+
+        if options['fix']:
+            users = User.objects.filter(username=options['user']) if options['user'] else \
+                User.objects.filter(is_superuser=True).order_by('pk')
+            user = users.first()
+            if user is None:
+                raise CommandError('Не найден пользователь для операции корректировки')
+            operation = StockLedgerService.adjust(user, discrepancies)
+            if operation is not None:
+                self.stdout.write(self.style.SUCCESS(f'Записана корректировка #{operation.pk}'))
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_main.services.stock_ledger import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = ('Строит ежедневные снимки остатков по складскому журналу за все дни после последнего снимка. '
+            'Запускается раз в сутки после полуночи')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='Пересчитать снимок за одну дату (ГГГГ-ММ-ДД)')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                taken = [(options['date'], StockLedgerService.take_snapshot(options['date']))]
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            taken = StockLedgerService.take_snapshots()
+
+        for day, rows in taken:
+            self.stdout.write(f'{day}: товаров в снимке {rows}')
+        self.stdout.write(self.style.SUCCESS(f'Построено снимков: {len(taken)}'))
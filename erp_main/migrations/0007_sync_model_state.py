@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0006_doorhandle_doorlock_lockcylinder_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doorhandle',
+            name='anti_fire',
+            field=models.BooleanField(default='False'),
+        ),
+        migrations.AddField(
+            model_name='doorlock',
+            name='security_class',
+            field=models.CharField(blank=True, default='None', max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='doorhandle',
+            name='color',
+            field=models.CharField(blank=True, default='стандарт', max_length=30, null=True, verbose_name='Цвет'),
+        ),
+        migrations.AlterField(
+            model_name='doorhandle',
+            name='fireproof',
+            field=models.BooleanField(blank=True, default=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='doorlock',
+            name='fireproof',
+            field=models.BooleanField(blank=True, default=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='glassinfo',
+            name='order_items',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='glasses', to='erp_main.orderitem'),
+        ),
+        migrations.AlterField(
+            model_name='lockcylinder',
+            name='fireproof',
+            field=models.BooleanField(blank=True, default=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='p_kind',
+            field=models.CharField(choices=[('door', 'Дверь'), ('gate', 'Ворота'), ('hatch', 'Люк'), ('transom', 'Фрамуга'), ('dobor', 'Добор'), ('others', 'Прочее'), ('wickit', 'Калитка')], max_length=15, null=True, verbose_name='вид изделия'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0007_sync_model_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='erp_main.order', verbose_name='заказ')),
+                ('doors_1_nk', models.IntegerField(default=0)),
+                ('doors_2_nk', models.IntegerField(default=0)),
+                ('hatch_nk', models.IntegerField(default=0)),
+                ('doors_1_sk', models.IntegerField(default=0)),
+                ('doors_2_sk', models.IntegerField(default=0)),
+                ('hatch_sk', models.IntegerField(default=0)),
+                ('transom', models.IntegerField(default=0)),
+                ('gate', models.IntegerField(default=0)),
+                ('gate_3000', models.IntegerField(default=0)),
+                ('glass', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('in_query', models.IntegerField(default=0, verbose_name='в очереди')),
+                ('product', models.IntegerField(default=0, verbose_name='запущено')),
+                ('ready', models.IntegerField(default=0, verbose_name='готово')),
+                ('shipped', models.IntegerField(default=0, verbose_name='отгружено')),
+                ('stopped', models.IntegerField(default=0, verbose_name='остановлено')),
+                ('canceled', models.IntegerField(default=0, verbose_name='отменено')),
+                ('workshop_1', models.IntegerField(default=0, verbose_name='в цехе №1')),
+                ('workshop_2', models.IntegerField(default=0, verbose_name='остановлено в цехе')),
+                ('workshop_3', models.IntegerField(default=0, verbose_name='в цехе №3')),
+                ('status', models.CharField(db_index=True, max_length=20, verbose_name='статус заказа')),
+                ('workshop_icon', models.CharField(max_length=50, verbose_name='иконка цеха')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Сводка по заказу',
+                'verbose_name_plural': 'Сводки по заказам',
+            },
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='due_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
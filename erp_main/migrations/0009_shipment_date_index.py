@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0008_ordersummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shipment',
+            name='date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0009_shipment_date_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_file', models.FileField(blank=True, null=True, upload_to='uploads/', verbose_name='предыдущий файл')),
+                ('is_update', models.BooleanField(default=False, verbose_name='повторная загрузка')),
+                ('status', models.CharField(choices=[('queued', 'в очереди'), ('parsing', 'разбор бланка'), ('diffing', 'сравнение позиций'), ('saving', 'сохранение'), ('done', 'готово'), ('failed', 'ошибка')], db_index=True, default='queued', max_length=10, verbose_name='статус')),
+                ('positions', models.IntegerField(default=0, verbose_name='позиций в бланке')),
+                ('error', models.TextField(blank=True, default='', verbose_name='ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='загрузил')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='erp_main.order', verbose_name='заказ')),
+            ],
+            options={
+                'verbose_name': 'Загрузка бланка',
+                'verbose_name_plural': 'Загрузки бланков',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+import ast
+
+from django.db import migrations, models
+
+
+def glass_to_json(apps, schema_editor):
+    """str(dict) {(высота, ширина): количество} -> [[высота, ширина, количество], ...]"""
+    OrderItem = apps.get_model('erp_main', 'OrderItem')
+    items = []
+    for item in OrderItem.objects.only('pk', 'p_glass').iterator(chunk_size=2000):
+        try:
+            counted = ast.literal_eval(item.p_glass) if item.p_glass else {}
+        except (ValueError, SyntaxError):
+            counted = {}
+        item.glass_json = [[height, width, quantity] for (height, width), quantity in counted.items()]
+        item.glass_quantity = sum(counted.values())
+        items.append(item)
+    OrderItem.objects.bulk_update(items, ['glass_json', 'glass_quantity'], batch_size=1000)
+
+
+def glass_to_str(apps, schema_editor):
+    OrderItem = apps.get_model('erp_main', 'OrderItem')
+    items = []
+    for item in OrderItem.objects.only('pk', 'glass_json').iterator(chunk_size=2000):
+        item.p_glass = str({(height, width): quantity for height, width, quantity in item.glass_json or []})
+        items.append(item)
+    OrderItem.objects.bulk_update(items, ['p_glass'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0010_orderimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='glass_json',
+            field=models.JSONField(default=list, blank=True),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='glass_quantity',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='количество стекол'),
+        ),
+        migrations.RunPython(glass_to_json, glass_to_str),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='p_glass',
+        ),
+        migrations.RenameField(
+            model_name='orderitem',
+            old_name='glass_json',
+            new_name='p_glass',
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='p_glass',
+            field=models.JSONField(blank=True, default=list, verbose_name='остекление'),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0011_orderitem_glass_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosingCoordinator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Наименование')),
+                ('code', models.CharField(blank=True, max_length=30, null=True, unique=True, verbose_name='Код для счета и заявки')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('retail_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Розничная цена')),
+                ('base_order_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена в заказе')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='furniture/%Y/%m/%d/', verbose_name='изображение')),
+                ('fireproof', models.BooleanField(blank=True, default=False, null=True)),
+                ('vendor_number', models.CharField(blank=True, max_length=20, null=True, verbose_name='Артикул')),
+                ('supplier', models.CharField(blank=True, max_length=50, null=True, verbose_name='Поставщик')),
+                ('purchase_price', models.IntegerField(blank=True, null=True, verbose_name='Закупочная цена')),
+                ('quantity_in_stock', models.PositiveIntegerField(default=0, verbose_name='Количество на складе')),
+                ('reserved_quantity', models.PositiveIntegerField(default=0, verbose_name='Зарезервировано')),
+                ('min_stock', models.PositiveIntegerField(default=10, verbose_name='Минимальный запас')),
+            ],
+            options={
+                'verbose_name': 'Координатор закрывания',
+                'verbose_name_plural': 'Координаторы закрывания',
+            },
+        ),
+        migrations.CreateModel(
+            name='DoorCloser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Наименование')),
+                ('code', models.CharField(blank=True, max_length=30, null=True, unique=True, verbose_name='Код для счета и заявки')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('retail_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Розничная цена')),
+                ('base_order_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена в заказе')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='furniture/%Y/%m/%d/', verbose_name='изображение')),
+                ('fireproof', models.BooleanField(blank=True, default=False, null=True)),
+                ('vendor_number', models.CharField(blank=True, max_length=20, null=True, verbose_name='Артикул')),
+                ('supplier', models.CharField(blank=True, max_length=50, null=True, verbose_name='Поставщик')),
+                ('purchase_price', models.IntegerField(blank=True, null=True, verbose_name='Закупочная цена')),
+                ('quantity_in_stock', models.PositiveIntegerField(default=0, verbose_name='Количество на складе')),
+                ('reserved_quantity', models.PositiveIntegerField(default=0, verbose_name='Зарезервировано')),
+                ('min_stock', models.PositiveIntegerField(default=10, verbose_name='Минимальный запас')),
+                ('door_weight', models.IntegerField(blank=True, default=60, null=True)),
+                ('delay_action', models.BooleanField(blank=True, default=False, null=True, verbose_name='задержка закрывания')),
+                ('hold_open', models.BooleanField(blank=True, default=False, null=True, verbose_name='фиксация открытого положения')),
+                ('frost_resistance', models.BooleanField(blank=True, default=False, null=True, verbose_name='морозоустойчивость')),
+                ('color', models.CharField(blank=True, max_length=10, null=True, verbose_name='цвет')),
+                ('dc_plate', models.BooleanField(default=True, verbose_name='закладная')),
+            ],
+            options={
+                'verbose_name': 'Доводчик',
+                'verbose_name_plural': 'Доводчики',
+            },
+        ),
+        migrations.CreateModel(
+            name='Metal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MountingPlates',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('height', models.IntegerField(default=50)),
+                ('width', models.IntegerField(default=200)),
+                ('comment', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RAL',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ral_exterior', models.CharField(blank=True, max_length=10, null=True)),
+                ('ral_interior', models.CharField(blank=True, max_length=10, null=True)),
+                ('moire', models.BooleanField(default=False)),
+                ('priming', models.BooleanField(default=False)),
+                ('varnish', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentGrate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Наименование')),
+                ('code', models.CharField(blank=True, max_length=30, null=True, unique=True, verbose_name='Код для счета и заявки')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('retail_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Розничная цена')),
+                ('base_order_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена в заказе')),
+                ('image', models.ImageField(blank=True, null=True, upload_to='furniture/%Y/%m/%d/', verbose_name='изображение')),
+                ('fireproof', models.BooleanField(blank=True, default=False, null=True)),
+                ('vendor_number', models.CharField(blank=True, max_length=20, null=True, verbose_name='Артикул')),
+                ('supplier', models.CharField(blank=True, max_length=50, null=True, verbose_name='Поставщик')),
+                ('purchase_price', models.IntegerField(blank=True, null=True, verbose_name='Закупочная цена')),
+                ('quantity_in_stock', models.PositiveIntegerField(default=0, verbose_name='Количество на складе')),
+                ('reserved_quantity', models.PositiveIntegerField(default=0, verbose_name='Зарезервировано')),
+                ('min_stock', models.PositiveIntegerField(default=10, verbose_name='Минимальный запас')),
+                ('height', models.IntegerField(blank=True, null=True)),
+                ('width', models.IntegerField(blank=True, null=True)),
+                ('comment', models.TextField(blank=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0012_product_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderimportjob',
+            name='report',
+            field=models.JSONField(blank=True, default=dict, verbose_name='отчет'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('erp_main', '0013_orderimportjob_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('receipt', 'Приход'), ('reservation', 'Резервирование'), ('consumption', 'Списание'), ('cancel_reservation', 'Отмена резерва')], max_length=20, verbose_name='Тип операции')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата операции')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Комментарий')),
+                ('invoice_number', models.CharField(blank=True, max_length=50, null=True, verbose_name='Номер накладной')),
+                ('supplier', models.CharField(blank=True, max_length=100, null=True, verbose_name='Поставщик')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='Создал')),
+            ],
+            options={
+                'verbose_name': 'Операция со складом',
+                'verbose_name_plural': 'Операции со складом',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockOperationItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('purchase_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Цена закупки')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('operation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='erp_main.stockoperation', verbose_name='Операция')),
+            ],
+            options={
+                'verbose_name': 'Позиция операции',
+                'verbose_name_plural': 'Позиции операций',
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='erp_main_st_content_3cdcc2_idx')],
+            },
+        ),
+    ]
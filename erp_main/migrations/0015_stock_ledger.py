@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('erp_main', '0014_stock_operations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockoperation',
+            name='operation_type',
+            field=models.CharField(choices=[('receipt', 'Приход'), ('reservation', 'Резервирование'), ('consumption', 'Списание'), ('cancel_reservation', 'Отмена резерва'), ('adjustment', 'Корректировка остатков')], max_length=20, verbose_name='Тип операции'),
+        ),
+        migrations.CreateModel(
+            name='StockLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('stock_delta', models.IntegerField(default=0, verbose_name='Изменение остатка')),
+                ('reserved_delta', models.IntegerField(default=0, verbose_name='Изменение резерва')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='contenttypes.contenttype')),
+                ('operation', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='erp_main.stockoperation', verbose_name='Операция')),
+            ],
+            options={
+                'verbose_name': 'Запись складского журнала',
+                'verbose_name_plural': 'Складской журнал',
+                'indexes': [models.Index(fields=['content_type', 'object_id', 'created_at'], name='erp_main_st_content_a2ae1a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('quantity_in_stock', models.IntegerField(verbose_name='Количество на складе')),
+                ('reserved_quantity', models.IntegerField(verbose_name='Зарезервировано')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Снимок остатков',
+                'verbose_name_plural': 'Снимки остатков',
+                'indexes': [models.Index(fields=['date'], name='erp_main_st_date_a642f2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'date'), name='unique_stock_snapshot')],
+            },
+        ),
+    ]
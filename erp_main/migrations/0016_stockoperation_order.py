@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0015_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockoperation',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_operations', to='erp_main.order', verbose_name='Заказ'),
+        ),
+    ]
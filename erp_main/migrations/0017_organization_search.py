@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+from erp_main.services.organization_search import OrganizationSearch
+
+
+def fill_search_columns(apps, schema_editor):
+    """display_name и search_text для существующих юрлиц, ИП и физлиц"""
+    for model_name in OrganizationSearch.FIELDS:
+        model = apps.get_model('erp_main', model_name)
+        rows = []
+        for obj in model.objects.iterator(chunk_size=2000):
+            obj.display_name, obj.search_text = OrganizationSearch.columns(obj)
+            rows.append(obj)
+        model.objects.bulk_update(rows, ['display_name', 'search_text'], batch_size=1000)
+
+
+def create_index(apps, schema_editor):
+    OrganizationSearch.install_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    OrganizationSearch.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0016_stockoperation_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='display_name',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255, verbose_name='Наименование'),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Строка поиска'),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:07
+
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+from erp_main.services.organization_search import OrganizationSearch
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def explode_history(apps, schema_editor):
+    """Записи JSON-поля history переносятся в OrganizationHistory в исходном порядке"""
+    Organization = apps.get_model('erp_main', 'Organization')
+    OrganizationHistory = apps.get_model('erp_main', 'OrganizationHistory')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    user_ids = dict(User.objects.values_list('username', 'id'))
+
+    rows = []
+    organizations = Organization.objects.order_by('id').values_list('id', 'history', 'created_at')
+    for organization_id, history, created_at in organizations.iterator(chunk_size=2000):
+        for entry in history or []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                # Метки писались из timezone.now(), то есть в UTC
+                timestamp = datetime.strptime(entry.get('timestamp') or '', TIMESTAMP_FORMAT).replace(
+                    tzinfo=dt_timezone.utc)
+            except ValueError:
+                timestamp = created_at
+            username = entry.get('user') or ''
+            rows.append(OrganizationHistory(
+                organization_id=organization_id,
+                user_id=user_ids.get(username),
+                username=username[:150],
+                action=(entry.get('action') or '')[:255],
+                old_value=entry.get('old_value'),
+                new_value=entry.get('new_value'),
+                created_at=timestamp,
+            ))
+        if len(rows) >= 1000:
+            OrganizationHistory.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    OrganizationHistory.objects.bulk_create(rows, batch_size=1000)
+
+
+def implode_history(apps, schema_editor):
+    """Обратный перенос: записи OrganizationHistory собираются обратно в JSON-поле history"""
+    Organization = apps.get_model('erp_main', 'Organization')
+    OrganizationHistory = apps.get_model('erp_main', 'OrganizationHistory')
+
+    histories = {}
+    entries = OrganizationHistory.objects.order_by('id').values_list(
+        'organization_id', 'username', 'action', 'old_value', 'new_value', 'created_at')
+    for organization_id, username, action, old_value, new_value, created_at in entries.iterator(chunk_size=2000):
+        histories.setdefault(organization_id, []).append({
+            'timestamp': created_at.astimezone(dt_timezone.utc).strftime(TIMESTAMP_FORMAT),
+            'user': username,
+            'action': action,
+            'old_value': old_value,
+            'new_value': new_value,
+        })
+    organizations = [Organization(id=pk, history=history) for pk, history in histories.items()]
+    Organization.objects.bulk_update(organizations, ['history'], batch_size=1000)
+
+
+def install_search_index(apps, schema_editor):
+    # На SQLite изменение таблицы контрагентов пересоздает ее вместе с удалением триггеров FTS5
+    OrganizationSearch.install_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0017_organization_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(blank=True, default='', max_length=150, verbose_name='Имя пользователя')),
+                ('action', models.CharField(max_length=255, verbose_name='Действие')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Было')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='Стало')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history_entries', to='erp_main.organization', verbose_name='Контрагент')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись истории контрагента',
+                'verbose_name_plural': 'История контрагентов',
+            },
+        ),
+        migrations.RunPython(explode_history, implode_history),
+        migrations.RunPython(migrations.RunPython.noop, install_search_index),
+        migrations.RemoveField(
+            model_name='organization',
+            name='history',
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from erp_main.services.organization_identifiers import OrganizationIdentifiers
+
+
+def fill_identifiers(apps, schema_editor):
+    """Реестр идентификаторов для существующих юрлиц, ИП и физлиц"""
+    OrganizationIdentifier = apps.get_model('erp_main', 'OrganizationIdentifier')
+    rows = []
+    for model_name in OrganizationIdentifiers.FIELDS:
+        model = apps.get_model('erp_main', model_name)
+        for obj in model.objects.iterator(chunk_size=2000):
+            rows.extend(
+                OrganizationIdentifier(organization_id=obj.pk, kind=kind, value=value)
+                for kind, value in OrganizationIdentifiers.identifiers(obj)
+            )
+            if len(rows) >= 1000:
+                OrganizationIdentifier.objects.bulk_create(rows, batch_size=1000)
+                rows = []
+    OrganizationIdentifier.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0018_organization_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationIdentifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('inn', 'ИНН'), ('ogrn', 'ОГРН/ОГРНИП'), ('kpp_inn', 'ИНН и КПП'), ('phone', 'Телефон'), ('email', 'E-mail')], max_length=10, verbose_name='Вид')),
+                ('value', models.CharField(max_length=255, verbose_name='Нормализованное значение')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiers', to='erp_main.organization', verbose_name='Контрагент')),
+            ],
+            options={
+                'verbose_name': 'Идентификатор контрагента',
+                'verbose_name_plural': 'Идентификаторы контрагентов',
+                'indexes': [models.Index(fields=['kind', 'value'], name='erp_main_or_kind_c60d0e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'kind', 'value'), name='unique_organization_identifier')],
+            },
+        ),
+        migrations.RunPython(fill_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from erp_main.services.organization_similarity import OrganizationSimilarity
+
+SUBTYPES = ('LegalEntity', 'IndividualEntrepreneur', 'PhysicalPerson')
+
+
+def fill_trigrams(apps, schema_editor):
+    """Триграммы наименований существующих юрлиц, ИП и физлиц"""
+    OrganizationNameTrigram = apps.get_model('erp_main', 'OrganizationNameTrigram')
+    rows = []
+    for model_name in SUBTYPES:
+        model = apps.get_model('erp_main', model_name)
+        for pk, display_name in model.objects.values_list('pk', 'display_name').iterator(chunk_size=2000):
+            rows.extend(
+                OrganizationNameTrigram(organization_id=pk, trigram=trigram)
+                for trigram in OrganizationSimilarity.trigrams(display_name)
+            )
+            if len(rows) >= 1000:
+                OrganizationNameTrigram.objects.bulk_create(rows, batch_size=1000)
+                rows = []
+    OrganizationNameTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0019_organization_identifiers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Триграмма')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='erp_main.organization', verbose_name='Контрагент')),
+            ],
+            options={
+                'verbose_name': 'Триграмма наименования',
+                'verbose_name_plural': 'Триграммы наименований',
+                'indexes': [models.Index(fields=['trigram', 'organization'], name='erp_main_or_trigram_34523e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('organization', 'trigram'), name='unique_organization_trigram')],
+            },
+        ),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
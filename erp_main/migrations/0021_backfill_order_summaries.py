@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+COUNTERS = [
+    'doors_1_nk', 'doors_2_nk', 'hatch_nk', 'doors_1_sk', 'doors_2_sk', 'hatch_sk',
+    'transom', 'gate', 'gate_3000', 'glass', 'quantity',
+    'in_query', 'product', 'ready', 'shipped', 'stopped', 'canceled',
+    'workshop_1', 'workshop_2', 'workshop_3',
+]
+
+
+def item_counters(item):
+    """Счетчики сводки, в которые попадает позиция (копия OrderQuerySet.with_rollups на момент миграции)"""
+    kind, construction = item['p_kind'], item['p_construction']
+    two_leaf = item['p_active_trim'] is not None
+    counters = []
+    if kind == 'door' and construction == 'NK':
+        counters.append('doors_2_nk' if two_leaf else 'doors_1_nk')
+    if kind == 'door' and construction == 'SK':
+        counters.append('doors_2_sk' if two_leaf else 'doors_1_sk')
+    if kind == 'hatch' and construction == 'NK':
+        counters.append('hatch_nk')
+    if kind == 'hatch' and construction == 'SK':
+        counters.append('hatch_sk')
+    if kind == 'transom':
+        counters.append('transom')
+    if kind == 'gate':
+        width, height = item['p_width'], item['p_height']
+        if width is not None and height is not None and width < 3000 and height < 3000:
+            counters.append('gate')
+        if (width is not None and width >= 3000) or (height is not None and height >= 3000):
+            counters.append('gate_3000')
+    if (item['glass_quantity'] or 0) > 0:
+        counters.append('glass')
+    if (item['p_quantity'] or 0) > 0:
+        counters.append('quantity')
+    if item['p_status'] in ('in_query', 'product', 'ready', 'shipped', 'stopped', 'canceled'):
+        counters.append(item['p_status'])
+    if item['workshop'] in (1, 2, 3):
+        counters.append(f"workshop_{item['workshop']}")
+    return counters
+
+
+def order_status(totals):
+    """Копия Order.status_from_totals"""
+    in_query, product, ready, shipped = (totals['in_query'], totals['product'], totals['ready'],
+                                         totals['shipped'])
+    if in_query > 0 and product == 0 and ready == 0 and shipped == 0:
+        return 'в очереди'
+    elif in_query == 0 and product > 0 and ready == 0 and shipped == 0:
+        return 'запущен'
+    elif in_query == 0 and product == 0 and ready > 0 and shipped == 0:
+        return 'готов'
+    elif in_query == 0 and product == 0 and ready == 0 and shipped > 0:
+        return 'отгружен'
+    elif totals['stopped'] > 0 and product == 0 and ready == 0 and shipped == 0:
+        return 'остановлен'
+    elif totals['canceled'] > 0 and product == 0 and ready == 0 and shipped == 0:
+        return 'отменен'
+    return 'частично не готов'
+
+
+def workshop_icon(totals):
+    """Копия Order.workshop_icon_from_totals"""
+    icon_path = 'erp_main/images/icon_play.png'
+    if totals['workshop_1']:
+        icon_path = 'erp_main/images/icon_play1.png'
+    if totals['workshop_3']:
+        icon_path = 'erp_main/images/icon_play3.png'
+    if totals['workshop_1'] and totals['workshop_3']:
+        icon_path = 'erp_main/images/icon_play13.png'
+    if totals['workshop_2']:
+        icon_path = 'erp_main/images/pause.png'
+    return icon_path
+
+
+def rebuild_summaries(apps, schema_editor):
+    """
+    Сводки для заказов, созданных до появления OrderSummary (0008): без них overdue() и with_status()
+    не находят существующие заказы. Считается по историческим моделям этой миграции, без сервисов и кэша.
+    """
+    Order = apps.get_model('erp_main', 'Order')
+    OrderItem = apps.get_model('erp_main', 'OrderItem')
+    OrderSummary = apps.get_model('erp_main', 'OrderSummary')
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    items = OrderItem.objects.exclude(p_status='changed').values(
+        'order_id', 'p_kind', 'p_construction', 'p_active_trim', 'p_status', 'p_width', 'p_height',
+        'p_quantity', 'glass_quantity', 'workshop',
+    )
+    for item in items.iterator(chunk_size=2000):
+        order_totals = totals[item['order_id']]
+        for counter in item_counters(item):
+            order_totals[counter] += item['p_quantity'] or 0
+
+    OrderSummary.objects.all().delete()
+    summaries = []
+    for order_id in Order.objects.values_list('pk', flat=True).iterator(chunk_size=2000):
+        order_totals = totals[order_id]
+        summaries.append(OrderSummary(
+            order_id=order_id,
+            status=order_status(order_totals),
+            workshop_icon=workshop_icon(order_totals),
+            **order_totals,
+        ))
+    OrderSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0020_organization_name_trigrams'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0021_backfill_order_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderimportjob',
+            name='order_file',
+            field=models.FileField(blank=True, default='', upload_to='uploads/', verbose_name='файл бланка'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from erp_main.services.organization_search import OrganizationSearch
+
+
+def refresh_phone_search_text(apps, schema_editor):
+    """search_text физлиц: телефон индексируется как 7XXXXXXXXXX и 10 цифр без кода страны"""
+    model = apps.get_model('erp_main', 'PhysicalPerson')
+    rows = []
+    for obj in model.objects.exclude(phone='').iterator(chunk_size=2000):
+        obj.display_name, obj.search_text = OrganizationSearch.columns(obj)
+        rows.append(obj)
+    model.objects.bulk_update(rows, ['display_name', 'search_text'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_main', '0022_orderimportjob_order_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_phone_search_text, migrations.RunPython.noop),
+    ]
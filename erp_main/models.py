@@ -1,14 +1,18 @@
-import ast
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Q, Sum
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.query import ModelIterable
+from django.db.models.functions import Coalesce
 from django.templatetags.static import static
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 
+from erp_main.services.organization_identifiers import OrganizationIdentifiers
+from erp_main.services.organization_similarity import OrganizationSimilarity
 from erp_main.furniture import FurnitureKit, FurnitureKitLock, FurnitureKitHandle, FurnitureKitCylinder
+from erp_main.product_options import RAL, Metal, VentGrate, MountingPlates, DoorCloser, ClosingCoordinator  # noqa: F401
 
 
 # def validate_numeric_only(value):
@@ -165,6 +169,85 @@ class InternalLegalEntity(models.Model):
         verbose_name_plural = 'Внутренние юридические лица'
 
 
+def load_organization_subtypes(organizations, using=None):
+    """
+    Подгружает конкретные экземпляры (юрлицо, ИП, физлицо) для списка базовых Organization:
+    по одному запросу на каждый встретившийся тип, результат кладется в кеш обратной связи
+    (organization.legalentity и т.д.), поэтому свойства контрагента больше не обращаются к БД.
+    Экземпляры подтипов и уже загруженные связи пропускаются.
+    """
+    pending = {}
+    for organization in organizations:
+        if not isinstance(organization, Organization) or organization._meta.model is not Organization:
+            continue
+        accessor = Organization.SUBTYPES.get(organization.type)
+        if accessor is None:
+            continue
+        relation = Organization._meta.get_field(accessor)
+        if not relation.is_cached(organization):
+            pending.setdefault(relation, {})[organization.pk] = organization
+
+    for relation, by_pk in pending.items():
+        queryset = relation.related_model._base_manager.db_manager(using).filter(pk__in=list(by_pk))
+        children = {child.pk: child for child in queryset}
+        for pk, organization in by_pk.items():
+            relation.set_cached_value(organization, children.get(pk))
+
+
+class OrganizationSubtypeIterable(ModelIterable):
+    """Итерация по контрагентам с подгрузкой подтипов: весь результат или порциями по chunk_size для iterator()"""
+
+    def __iter__(self):
+        using = self.queryset.db
+        batch = []
+        for organization in super().__iter__():
+            batch.append(organization)
+            if self.chunked_fetch and len(batch) >= self.chunk_size:
+                load_organization_subtypes(batch, using)
+                yield from batch
+                batch = []
+        load_organization_subtypes(batch, using)
+        yield from batch
+
+
+class OrganizationQuerySet(models.QuerySet):
+    def search(self, query):
+        """Поиск по наименованию, ИНН, ОГРН, КПП, руководителю, телефону и e-mail (см. OrganizationSearch)"""
+        from erp_main.services.organization_search import OrganizationSearch
+        return self.filter(OrganizationSearch.condition(query, using=self.db))
+
+    def with_stats(self):
+        """
+        Счетчики контрагента коррелированными подзапросами в том же SELECT:
+        last_order_at, orders_count, invoices_total, paid_total и debt (выставлено - оплачено)
+        """
+        orders = Order.objects.filter(invoice__organization=OuterRef('pk'))
+        invoices = Invoice.objects.filter(organization=OuterRef('pk')).values('organization')
+
+        def total(queryset, aggregate):
+            return Coalesce(Subquery(queryset.annotate(total=aggregate).values('total')), 0)
+
+        return self.annotate(
+            last_order_at=Subquery(orders.order_by('-created_at').values('created_at')[:1]),
+            orders_count=total(orders.values('invoice__organization'), Count('pk')),
+            invoices_total=total(invoices, Sum('amount')),
+            paid_total=total(invoices, Sum('payed_amount')),
+        ).annotate(debt=F('invoices_total') - F('paid_total'))
+
+    def with_subtypes(self):
+        """Контрагенты вместе с юрлицом / ИП / физлицом: по запросу на тип вместо запроса на каждое свойство"""
+        clone = self._chain()
+        clone._iterable_class = OrganizationSubtypeIterable
+        return clone
+
+
+def prefetch_organization_subtypes(lookup='organization', queryset=None):
+    """Prefetch связанного контрагента вместе с подтипом, например для списка счетов"""
+    if queryset is None:
+        queryset = Organization.objects.all()
+    return Prefetch(lookup, queryset=queryset.with_subtypes())
+
+
 class Organization(models.Model):
     """Базовая модель контрагента - теперь НЕ абстрактная"""
     TYPES = [
@@ -173,6 +256,13 @@ class Organization(models.Model):
         ('PERSON', 'Физическое лицо'),
     ]
 
+    # Тип контрагента -> обратная связь на таблицу подтипа
+    SUBTYPES = {
+        'LEGAL': 'legalentity',
+        'INDIVIDUAL': 'individualentrepreneur',
+        'PERSON': 'physicalperson',
+    }
+
     type = models.CharField(max_length=20, choices=TYPES)
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Менеджер")
 
@@ -185,119 +275,105 @@ class Organization(models.Model):
         blank=True  # Разрешаем пустое значение в формах
     )
 
-    history = models.JSONField(default=list, verbose_name="История изменений")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    # Денормализованные наименование и строка поиска, заполняются при сохранении подтипа
+    display_name = models.CharField(max_length=255, blank=True, default='', db_index=True,
+                                    verbose_name="Наименование")
+    search_text = models.TextField(blank=True, default='', editable=False, verbose_name="Строка поиска")
+
+    objects = OrganizationQuerySet.as_manager()
+
    # Связь с документами
     documents = GenericRelation(Documents, verbose_name="Документы по контрагенту")
 
     @property
     def last_order(self):
+        """Дата последнего заказа: из with_stats() без запроса, иначе одним запросом"""
+        if hasattr(self, 'last_order_at'):
+            return self.last_order_at
         return (
             Order.objects.filter(invoice__organization=self.id)
             .order_by('-created_at')
-            .first().created_at if Order.objects.filter(invoice__organization=self.id).exists() else None
+            .values_list('created_at', flat=True)
+            .first()
         )
 
+    @property
+    def subtype(self):
+        """
+        Конкретный экземпляр контрагента (юрлицо, ИП, физлицо) или None.
+        Для экземпляра подтипа - он сам; для загруженных через with_subtypes() - без запроса к БД.
+        """
+        if self._meta.model is not Organization:
+            return self
+        accessor = self.SUBTYPES.get(self.type)
+        return getattr(self, accessor, None) if accessor else None
+
+    def _subtype_value(self, name, types=('LEGAL', 'INDIVIDUAL', 'PERSON')):
+        """Значение поля подтипа для перечисленных типов контрагента, иначе None"""
+        if self.type not in types:
+            return None
+        subtype = self.subtype
+        # У экземпляра подтипа без такого поля свойство не должно вызывать само себя
+        if subtype is None or subtype is self:
+            return None
+        return getattr(subtype, name)
+
     @property
     def bank_name(self):
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.bank_name
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.bank_name
-        return None
+        return self._subtype_value('bank_name', ('LEGAL', 'INDIVIDUAL'))
+
     @property
     def account_number(self):
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.account_number
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.account_number
-        return None
+        return self._subtype_value('account_number', ('LEGAL', 'INDIVIDUAL'))
 
     @property
     def correspondent_account(self):
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.correspondent_account
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.correspondent_account
-        return None
+        return self._subtype_value('correspondent_account', ('LEGAL', 'INDIVIDUAL'))
 
     def bik(self):
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.bik
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.bik
-        return None
-
-    @property
-    def display_name(self):
-        """Возвращает отображаемое имя в зависимости от типа"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.name
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.full_name
-        elif self.type == 'PERSON' and hasattr(self, 'physicalperson'):
-            return self.physicalperson.full_name
-        return f"Контрагент {self.id}"
+        return self._subtype_value('bik', ('LEGAL', 'INDIVIDUAL'))
 
     @property
     def legal_form(self):
-        """Возвращает ОГРН/ОГРНИП"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.legal_form_display
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
+        """Возвращает организационно-правовую форму"""
+        if self.type == 'INDIVIDUAL':
             return 'ИП'
-        return None
+        return self._subtype_value('legal_form_display', ('LEGAL',))
 
     @property
     def inn(self):
         """Возвращает ИНН для юрлиц и ИП"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.inn
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.inn
-        return None
+        return self._subtype_value('inn', ('LEGAL', 'INDIVIDUAL'))
 
     @property
     def kpp(self):
         """Возвращает КПП для юрлиц"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.kpp
-        return None
+        return self._subtype_value('kpp', ('LEGAL',))
 
     @property
     def ogrn(self):
         """Возвращает ОГРН/ОГРНИП"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.ogrn
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.ogrn
-        return None
+        return self._subtype_value('ogrn', ('LEGAL', 'INDIVIDUAL'))
 
     @property
     def email(self):
-        """Возвращает ОГРН/ОГРНИП"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.email
-        elif self.type == 'INDIVIDUAL' and hasattr(self, 'individualentrepreneur'):
-            return self.individualentrepreneur.email
-        elif self.type == 'PERSON' and hasattr(self, 'physicalperson'):
-            return self.physicalperson.email
-        return None
+        """Возвращает e-mail"""
+        return self._subtype_value('email')
 
     @property
     def phone(self):
         """Возвращает телефон для физлиц"""
-        if self.type == 'PERSON' and hasattr(self, 'physicalperson'):
-            return self.physicalperson.phone
-        return None
+        return self._subtype_value('phone', ('PERSON',))
 
     @property
     def legal_form_display(self):
         """Возвращает отображаемое название организационно-правовой формы"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.get_legal_form_display()
+        if self.type == 'LEGAL':
+            subtype = self.subtype
+            return subtype.get_legal_form_display() if subtype is not None else ""
         elif self.type == 'INDIVIDUAL':
             return "Индивидуальный предприниматель"
         elif self.type == 'PERSON':
@@ -307,9 +383,7 @@ class Organization(models.Model):
     @property
     def leader_name(self):
         """Возвращает ФИО руководителя для юрлиц"""
-        if self.type == 'LEGAL' and hasattr(self, 'legalentity'):
-            return self.legalentity.leader_name
-        return None
+        return self._subtype_value('leader_name', ('LEGAL',))
 
 
     class Meta:
@@ -331,22 +405,28 @@ class Organization(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.refresh_search_columns()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'display_name', 'search_text'}
         super().save(*args, **kwargs)
+        OrganizationIdentifiers.sync(self)
+        OrganizationSimilarity.sync(self)
+
+    def refresh_search_columns(self):
+        """Пересчитывает display_name и search_text из полей подтипа (у базового Organization не меняются)"""
+        from erp_main.services.organization_search import OrganizationSearch
+        columns = OrganizationSearch.columns(self)
+        if columns is not None:
+            self.display_name, self.search_text = columns
 
     def add_history_entry(self, user, action, old_value=None, new_value=None):
-        """Добавление записи в историю изменений"""
-        entry = {
-            'timestamp': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'user': user.username,
-            'action': action,
-            'old_value': str(old_value) if old_value else None,
-            'new_value': str(new_value) if new_value else None
-        }
-        self.history.append(entry)
-        self.save()
+        """Добавление записи в историю изменений: одна вставка в OrganizationHistory, контрагент не сохраняется"""
+        entry = OrganizationHistory.entry(self, user, action, old_value, new_value)
+        entry.save()
+        return entry
 
     def __str__(self):
-        return self.display_name
+        return self.display_name or f"Контрагент {self.id}"
 
 
 class LegalEntity(Organization):
@@ -487,6 +567,119 @@ class PhysicalPerson(Organization):
         verbose_name = "Физическое лицо"
         verbose_name_plural = "Физические лица"
 
+
+class OrganizationIdentifier(models.Model):
+    """Идентификатор контрагента в реестре (см. OrganizationIdentifiers): ИНН, ОГРН, КПП+ИНН, телефон, e-mail"""
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='identifiers',
+        verbose_name="Контрагент"
+    )
+    kind = models.CharField(max_length=10, choices=OrganizationIdentifiers.KINDS, verbose_name="Вид")
+    value = models.CharField(max_length=255, verbose_name="Нормализованное значение")
+
+    class Meta:
+        verbose_name = "Идентификатор контрагента"
+        verbose_name_plural = "Идентификаторы контрагентов"
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'kind', 'value'], name='unique_organization_identifier'),
+        ]
+        indexes = [models.Index(fields=['kind', 'value'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.value}"
+
+
+class OrganizationNameTrigram(models.Model):
+    """Триграмма нормализованного наименования контрагента (см. OrganizationSimilarity)"""
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='name_trigrams',
+        verbose_name="Контрагент"
+    )
+    trigram = models.CharField(max_length=3, verbose_name="Триграмма")
+
+    class Meta:
+        verbose_name = "Триграмма наименования"
+        verbose_name_plural = "Триграммы наименований"
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'trigram'], name='unique_organization_trigram'),
+        ]
+        indexes = [models.Index(fields=['trigram', 'organization'])]
+
+    def __str__(self):
+        return f"{self.organization_id}: {self.trigram!r}"
+
+
+class OrganizationHistoryQuerySet(models.QuerySet):
+    def page(self, before=None, limit=10):
+        """
+        Страница истории, новые записи сверху: (записи, id для следующей страницы или None).
+        Постраничность по ключу (id < before), поэтому стоимость не зависит от длины истории.
+        Нечисловое before игнорируется.
+        """
+        queryset = self.order_by('-id')
+        if before and str(before).isdigit():
+            queryset = queryset.filter(id__lt=int(before))
+        entries = list(queryset[:limit + 1])
+        next_before = entries[limit - 1].id if len(entries) > limit else None
+        return entries[:limit], next_before
+
+
+class OrganizationHistory(models.Model):
+    """
+    Запись истории изменений контрагента. История только дополняется;
+    для выборки по контрагенту используется индекс внешнего ключа (с id в составе ключа).
+    """
+    BATCH_SIZE = 1000
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='history_entries',
+        verbose_name="Контрагент"
+    )
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="Пользователь")
+    # Имя пользователя на момент записи: сохраняется и после удаления пользователя
+    username = models.CharField(max_length=150, blank=True, default='', verbose_name="Имя пользователя")
+    action = models.CharField(max_length=255, verbose_name="Действие")
+    old_value = models.TextField(blank=True, null=True, verbose_name="Было")
+    new_value = models.TextField(blank=True, null=True, verbose_name="Стало")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата")
+
+    objects = OrganizationHistoryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Запись истории контрагента"
+        verbose_name_plural = "История контрагентов"
+
+    @classmethod
+    def entry(cls, organization, user, action, old_value=None, new_value=None):
+        """Несохраненная запись истории; для массовой вставки - OrganizationHistory.bulk_add"""
+        return cls(
+            organization=organization,
+            user=user,
+            username=user.username if user else '',
+            action=action,
+            old_value=str(old_value) if old_value else None,
+            new_value=str(new_value) if new_value else None,
+        )
+
+    @classmethod
+    def bulk_add(cls, entries):
+        """Вставка записей, созданных через entry(), пачками по BATCH_SIZE"""
+        return cls.objects.bulk_create(entries, batch_size=cls.BATCH_SIZE)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Записи истории контрагента нельзя изменять')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.organization_id}: {self.action}"
+
 class ContractTemplate(models.Model):
     CONTRACT_TYPE_CHOICES = (
         ('legal_entity', 'Юридическое лицо'),
@@ -549,100 +742,174 @@ class Invoice(models.Model):
     def percent(self):
         return int(self.payed_amount * 100 / self.amount)
 
+class OrderQuerySet(models.QuerySet):
+    """QuerySet заказов с агрегатами по позициям"""
+
+    def with_rollups(self):
+        """
+        Добавляет к заказам все счетчики позиций (виды изделий, статусы, цеха)
+        одним запросом с условной агрегацией. Измененные позиции не учитываются.
+        """
+        active = ~Q(items__p_status='changed')
+
+        def total(condition=Q()):
+            return Coalesce(Sum('items__p_quantity', filter=active & condition), 0)
+
+        return self.annotate(
+            rollup_doors_1_nk=total(Q(items__p_kind='door', items__p_construction='NK',
+                                      items__p_active_trim__isnull=True)),
+            rollup_doors_2_nk=total(Q(items__p_kind='door', items__p_construction='NK',
+                                      items__p_active_trim__isnull=False)),
+            rollup_hatch_nk=total(Q(items__p_kind='hatch', items__p_construction='NK')),
+            rollup_doors_1_sk=total(Q(items__p_kind='door', items__p_construction='SK',
+                                      items__p_active_trim__isnull=True)),
+            rollup_doors_2_sk=total(Q(items__p_kind='door', items__p_construction='SK',
+                                      items__p_active_trim__isnull=False)),
+            rollup_hatch_sk=total(Q(items__p_kind='hatch', items__p_construction='SK')),
+            rollup_transom=total(Q(items__p_kind='transom')),
+            rollup_gate=total(Q(items__p_kind='gate', items__p_width__lt=3000, items__p_height__lt=3000)),
+            rollup_gate_3000=total(Q(items__p_kind='gate') &
+                                   (Q(items__p_width__gte=3000) | Q(items__p_height__gte=3000))),
+            rollup_glass=total(Q(items__glass_quantity__gt=0)),
+            rollup_quantity=total(Q(items__p_quantity__gt=0)),
+            rollup_in_query=total(Q(items__p_status='in_query')),
+            rollup_product=total(Q(items__p_status='product')),
+            rollup_ready=total(Q(items__p_status='ready')),
+            rollup_shipped=total(Q(items__p_status='shipped')),
+            rollup_stopped=total(Q(items__p_status='stopped')),
+            rollup_canceled=total(Q(items__p_status='canceled')),
+            rollup_workshop_1=total(Q(items__workshop='1')),
+            rollup_workshop_2=total(Q(items__workshop='2')),
+            rollup_workshop_3=total(Q(items__workshop='3')),
+        )
+
+    def with_status(self, *statuses):
+        """Заказы с указанными статусами (индексный поиск по OrderSummary)"""
+        return self.filter(summary__status__in=statuses)
+
+    def overdue(self, date=None):
+        """Просроченные заказы: срок прошел, а заказ все еще в очереди или запущен"""
+        date = date or timezone.localdate()
+        return self.filter(due_date__lt=date).with_status('в очереди', 'запущен')
+
+
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     order_file = models.FileField(upload_to='uploads/')
     invoice = models.ForeignKey(Invoice, related_name='invoice', blank=True, null=True, on_delete=models.CASCADE)
-    due_date = models.DateField(null=True, blank=True)
+    due_date = models.DateField(null=True, blank=True, db_index=True)
     comment = models.TextField(blank=True, null=True)
 
+    objects = OrderQuerySet.as_manager()
+
     def get_items_filtered(self):
         return self.items.exclude(p_status__in=['changed',])
 
+    def _rollup(self, name, items):
+        """Значение из with_rollups(), если оно есть, иначе отдельный запрос по позициям"""
+        value = getattr(self, f'rollup_{name}', None)
+        if value is not None:
+            return value
+        return items.aggregate(total=Sum('p_quantity'))['total'] or 0
+
     @property
     def doors_1_nk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('doors_1_nk', self.get_items_filtered().filter(
             p_kind='door',
             p_construction='NK',
             p_active_trim=None,
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def doors_2_nk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('doors_2_nk', self.get_items_filtered().filter(
             p_kind='door',
             p_construction='NK',
             p_active_trim__isnull=False,
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def hatch_nk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('hatch_nk', self.get_items_filtered().filter(
             p_kind='hatch',
             p_construction='NK',
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def doors_1_sk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('doors_1_sk', self.get_items_filtered().filter(
             p_kind='door',
             p_construction='SK',
             p_active_trim=None,
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def doors_2_sk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('doors_2_sk', self.get_items_filtered().filter(
             p_kind='door',
             p_construction='SK',
             p_active_trim__isnull=False,
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def hatch_sk(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('hatch_sk', self.get_items_filtered().filter(
             p_kind='hatch',
             p_construction='SK',
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def transom(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('transom', self.get_items_filtered().filter(
             p_kind='transom',
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def gate(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('gate', self.get_items_filtered().filter(
             p_kind='gate',
             p_width__lt=3000,
             p_height__lt=3000,
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def gate_3000(self):
-        return self.get_items_filtered().filter(
+        return self._rollup('gate_3000', self.get_items_filtered().filter(
             Q(p_kind='gate') & (Q(p_width__gte=3000) | Q(p_height__gte=3000)),
-        ).aggregate(total=Sum('p_quantity'))['total'] or 0
+        ))
 
     @property
     def glass(self):
-        return self.get_items_filtered().filter(Q(p_glass__isnull=False) &
-                                                ~Q(p_glass={})).aggregate(total=Sum('p_quantity'))['total'] or 0
+        return self._rollup('glass', self.get_items_filtered().filter(glass_quantity__gt=0))
 
     @property
     def quantity(self):
-        return self.get_items_filtered().filter(p_quantity__gt=0).aggregate(total=Sum('p_quantity'))['total'] or 0
+        return self._rollup('quantity', self.get_items_filtered().filter(p_quantity__gt=0))
 
     @property
     def status(self):
-        in_query = self.get_items_filtered().filter(p_status='in_query').aggregate(total=Sum('p_quantity'))['total'] or 0
-        product = self.get_items_filtered().filter(p_status='product').aggregate(total=Sum('p_quantity'))['total'] or 0
-        ready = self.get_items_filtered().filter(p_status='ready').aggregate(total=Sum('p_quantity'))['total'] or 0
-        shipped = self.get_items_filtered().filter(p_status='shipped').aggregate(total=Sum('p_quantity'))['total'] or 0
-        stopped = self.get_items_filtered().filter(p_status='stopped').aggregate(total=Sum('p_quantity'))['total'] or 0
-        canceled = self.get_items_filtered().filter(p_status='canceled').aggregate(total=Sum('p_quantity'))['total'] or 0
+        items = self.get_items_filtered()
+        return self.status_from_totals(
+            in_query=self._rollup('in_query', items.filter(p_status='in_query')),
+            product=self._rollup('product', items.filter(p_status='product')),
+            ready=self._rollup('ready', items.filter(p_status='ready')),
+            shipped=self._rollup('shipped', items.filter(p_status='shipped')),
+            stopped=self._rollup('stopped', items.filter(p_status='stopped')),
+            canceled=self._rollup('canceled', items.filter(p_status='canceled')),
+        )
 
+    @property
+    def workshop(self):
+        items = self.get_items_filtered()
+        return static(self.workshop_icon_from_totals(
+            ws_1=self._rollup('workshop_1', items.filter(workshop='1')),
+            ws_3=self._rollup('workshop_3', items.filter(workshop='3')),
+            stopped=self._rollup('workshop_2', items.filter(workshop='2')),
+        ))
+
+    @staticmethod
+    def status_from_totals(in_query, product, ready, shipped, stopped, canceled):
+        """Статус заказа по количеству изделий в каждом статусе"""
         if in_query > 0 and product == 0 and ready == 0 and shipped == 0:
             return f'в очереди'
         elif in_query == 0 and product > 0 and ready == 0 and shipped == 0:
@@ -658,24 +925,76 @@ class Order(models.Model):
         else:
             return f'частично не готов'
 
-    @property
-    def workshop(self):
-        ws_1 = self.get_items_filtered().filter(workshop='1').aggregate(total=Sum('p_quantity'))['total'] or 0
-        ws_3 = self.get_items_filtered().filter(workshop='3').aggregate(total=Sum('p_quantity'))['total'] or 0
-        stopped = self.get_items_filtered().filter(workshop='2').aggregate(total=Sum('p_quantity'))['total'] or 0
-        icon_path = static('erp_main/images/icon_play.png')
+    @staticmethod
+    def workshop_icon_from_totals(ws_1, ws_3, stopped):
+        """Путь к иконке цеха (относительно static) по количеству изделий в цехах"""
+        icon_path = 'erp_main/images/icon_play.png'
         if ws_1:
-            icon_path = static('erp_main/images/icon_play1.png')
+            icon_path = 'erp_main/images/icon_play1.png'
         if ws_3:
-            icon_path = static('erp_main/images/icon_play3.png')
+            icon_path = 'erp_main/images/icon_play3.png'
         if ws_1 and ws_3:
-            icon_path = static('erp_main/images/icon_play13.png')
+            icon_path = 'erp_main/images/icon_play13.png'
         if stopped:
-            icon_path = static('erp_main/images/pause.png')
+            icon_path = 'erp_main/images/pause.png'
 
         return icon_path
 
 
+class OrderSummary(models.Model):
+    """
+    Денормализованные счетчики заказа. Пересчитывается при изменении позиций
+    (см. OrderSummaryService), чтобы фильтровать заказы по статусу через индекс.
+    """
+    COUNTERS = [
+        'doors_1_nk', 'doors_2_nk', 'hatch_nk', 'doors_1_sk', 'doors_2_sk', 'hatch_sk',
+        'transom', 'gate', 'gate_3000', 'glass', 'quantity',
+        'in_query', 'product', 'ready', 'shipped', 'stopped', 'canceled',
+        'workshop_1', 'workshop_2', 'workshop_3',
+    ]
+
+    order = models.OneToOneField(Order, primary_key=True, related_name='summary', on_delete=models.CASCADE,
+                                 verbose_name='заказ')
+
+    doors_1_nk = models.IntegerField(default=0)
+    doors_2_nk = models.IntegerField(default=0)
+    hatch_nk = models.IntegerField(default=0)
+    doors_1_sk = models.IntegerField(default=0)
+    doors_2_sk = models.IntegerField(default=0)
+    hatch_sk = models.IntegerField(default=0)
+    transom = models.IntegerField(default=0)
+    gate = models.IntegerField(default=0)
+    gate_3000 = models.IntegerField(default=0)
+    glass = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    in_query = models.IntegerField(default=0, verbose_name='в очереди')
+    product = models.IntegerField(default=0, verbose_name='запущено')
+    ready = models.IntegerField(default=0, verbose_name='готово')
+    shipped = models.IntegerField(default=0, verbose_name='отгружено')
+    stopped = models.IntegerField(default=0, verbose_name='остановлено')
+    canceled = models.IntegerField(default=0, verbose_name='отменено')
+
+    workshop_1 = models.IntegerField(default=0, verbose_name='в цехе №1')
+    workshop_2 = models.IntegerField(default=0, verbose_name='остановлено в цехе')
+    workshop_3 = models.IntegerField(default=0, verbose_name='в цехе №3')
+
+    status = models.CharField(max_length=20, db_index=True, verbose_name='статус заказа')
+    workshop_icon = models.CharField(max_length=50, verbose_name='иконка цеха')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Сводка по заказу'
+        verbose_name_plural = 'Сводки по заказам'
+
+    def __str__(self):
+        return f"Заказ {self.order_id}: {self.status}"
+
+    @property
+    def workshop_icon_url(self):
+        return static(self.workshop_icon)
+
+
 class OrderChangeHistory(models.Model):
     order = models.ForeignKey(Order, related_name='changes', on_delete=models.CASCADE)
     order_file = models.FileField(upload_to='uploads/', blank=True, null=True)
@@ -683,6 +1002,51 @@ class OrderChangeHistory(models.Model):
     changed_by = models.ForeignKey(User, on_delete=models.CASCADE)
     comment = models.TextField(blank=True, null=True)
 
+
+class OrderImportJob(models.Model):
+    """Фоновая обработка загруженного бланка заказа"""
+    STATUS_CHOICE = (
+        ('queued', 'в очереди'),
+        ('parsing', 'разбор бланка'),
+        ('diffing', 'сравнение позиций'),
+        ('saving', 'сохранение'),
+        ('done', 'готово'),
+        ('failed', 'ошибка'),
+    )
+    # Процент выполнения для каждого этапа
+    PROGRESS = {'queued': 0, 'parsing': 10, 'diffing': 40, 'saving': 70, 'done': 100, 'failed': 100}
+
+    order = models.ForeignKey(Order, related_name='import_jobs', on_delete=models.CASCADE, verbose_name='заказ')
+    order_file = models.FileField(upload_to='uploads/', blank=True, default='', verbose_name='файл бланка')
+    old_file = models.FileField(upload_to='uploads/', blank=True, null=True, verbose_name='предыдущий файл')
+    is_update = models.BooleanField(default=False, verbose_name='повторная загрузка')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICE, default='queued', db_index=True,
+                              verbose_name='статус')
+    positions = models.IntegerField(default=0, verbose_name='позиций в бланке')
+    error = models.TextField(blank=True, default='', verbose_name='ошибка')
+    report = models.JSONField(default=dict, blank=True, verbose_name='отчет')  # Например, ненайденные коды фурнитуры
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='загрузил')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Загрузка бланка'
+        verbose_name_plural = 'Загрузки бланков'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Загрузка бланка заказа {self.order_id}: {self.get_status_display()}"
+
+    @property
+    def progress(self):
+        return self.PROGRESS[self.status]
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+
 class Certificate(models.Model):
     KIND_CHOICE = (
         ('door', 'Дверь'),
@@ -768,7 +1132,8 @@ class OrderItem(models.Model):
 
     p_plate = models.CharField(max_length=100, blank=True, null=True, verbose_name='отбойная пластина')
 
-    p_glass = models.CharField(max_length=100, blank=True, null=True, verbose_name='остекление')
+    p_glass = models.JSONField(default=list, blank=True, verbose_name='остекление')  # [[высота, ширина, кол-во], ...]
+    glass_quantity = models.PositiveIntegerField(default=0, db_index=True, verbose_name='количество стекол')
 
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE, verbose_name='заказ')
     position_num = models.CharField(max_length=5, verbose_name='номер позиции')
@@ -780,71 +1145,21 @@ class OrderItem(models.Model):
                                        verbose_name='монтажные уши')
     workshop = models.IntegerField(default=0, verbose_name='цех')
 
+
     def __str__(self):
         return f"{self.order.id} - {self.position_num} - {self.get_p_kind_display()} {self.p_width}x{self.p_height}"
 
     def generate_furniture_codes_string(self):
-        def format_furniture_items(items, item_attr_name):
-            """Форматирует элементы фурнитуры одного типа"""
-            if not items.exists():
-                return "00"
-
-            codes = []
-            for item in items.order_by('id'):
-                # Получаем объект фурнитуры через указанный атрибут
-                furniture_item = getattr(item, item_attr_name, None)
-                if not furniture_item:
-                    codes.append("00")
-                    continue
-
-                # Пытаемся получить код через метод get_code() если он есть
-                if hasattr(furniture_item, 'get_code'):
-                    code = furniture_item.get_code()
-                # Иначе берем поле code или name
-                elif hasattr(furniture_item, 'code') and furniture_item.code:
-                    code = furniture_item.code
-                elif hasattr(furniture_item, 'name') and furniture_item.name:
-                    code = furniture_item.name
-                else:
-                    code = "00"
-
-                codes.append(str(code))
-
-            return ".".join(codes)
-
+        """Пересчитывает коды по комплекту фурнитуры и записывает их в p_furniture одним UPDATE"""
         try:
-            # Получаем связанный комплект фурнитуры
             furniture_kit = self.furniture_kit
-
-            # Форматируем каждый тип фурнитуры
-            lock_str = format_furniture_items(
-                furniture_kit.furniturekitlock_set.all(),
-                'door_lock'
-            )
-            handle_str = format_furniture_items(
-                furniture_kit.furniturekithandle_set.all(),
-                'door_handle'
-            )
-            # Исправляем имя атрибута для цилиндров (согласно исправленной модели)
-            cylinder_str = format_furniture_items(
-                furniture_kit.furniturekitcylinder_set.all(),
-                'lock_cylinder'
-            )
-
-            result = f"{lock_str}-{handle_str}-{cylinder_str}"
-
-            # Сохраняем сгенерированную строку в поле p_furniture
-            self.p_furniture = result
-            # Сохраняем только поле p_furniture, чтобы не трогать другие поля
-            self.save(update_fields=['p_furniture'])
-
-            return result
-
-        except (FurnitureKit.DoesNotExist, AttributeError):
+        except FurnitureKit.DoesNotExist:
             # Если комплекта нет, возвращаем текущее значение из p_furniture или дефолтную строку
-            if self.p_furniture:
-                return self.p_furniture
-            return "00-00-00"
+            return self.p_furniture or "00-00-00"
+
+        self.p_furniture = furniture_kit.codes_string()
+        OrderItem.objects.filter(pk=self.pk).update(p_furniture=self.p_furniture)
+        return self.p_furniture
 
     def update_furniture_codes(self):
         """Обновляет поле p_furniture на основе данных из комплекта фурнитуры"""
@@ -852,15 +1167,15 @@ class OrderItem(models.Model):
 
     @property
     def furniture_codes(self):
-        """Свойство для удобного доступа к кодам фурнитуры"""
-        # Если есть данные в p_furniture, возвращаем их
+        """
+        Коды фурнитуры без записи в БД: p_furniture, а если оно пустое - расчет по комплекту.
+        p_furniture поддерживается сигналами строк комплекта и командой backfill_furniture_codes.
+        """
         if self.p_furniture:
             return self.p_furniture
-
-        # Иначе пытаемся сгенерировать и сохранить
         try:
-            return self.generate_furniture_codes_string()
-        except:
+            return self.furniture_kit.codes_string()
+        except FurnitureKit.DoesNotExist:
             return "00-00-00"
 
     def get_furniture_items(self):
@@ -921,8 +1236,8 @@ class OrderItem(models.Model):
                 defaults={'quantity': quantity}
             )
 
-        # Автоматически обновляем поле p_furniture после добавления
-        self.update_furniture_codes()
+        # p_furniture пересчитывается сигналом строки комплекта
+        self.refresh_from_db(fields=['p_furniture'])
 
     def remove_furniture_item(self, item_type, item_object):
         """
@@ -949,8 +1264,8 @@ class OrderItem(models.Model):
                 lock_cylinder=item_object
             ).delete()
 
-        # Автоматически обновляем поле p_furniture после удаления
-        self.update_furniture_codes()
+        # p_furniture пересчитывается сигналом строки комплекта
+        self.refresh_from_db(fields=['p_furniture'])
 
     def clear_furniture_kit(self):
         """Очищает весь комплект фурнитуры"""
@@ -958,32 +1273,50 @@ class OrderItem(models.Model):
             self.furniture_kit.furniturekitlock_set.all().delete()
             self.furniture_kit.furniturekithandle_set.all().delete()
             self.furniture_kit.furniturekitcylinder_set.all().delete()
-            self.update_furniture_codes()
+            self.refresh_from_db(fields=['p_furniture'])
 
-    def save(self, *args, **kwargs):
-        """Переопределяем save для автоматического обновления p_furniture при изменении комплекта"""
-        # Сначала сохраняем объект
-        super().save(*args, **kwargs)
+    # Поля, от которых зависит сводка заказа (OrderSummary)
+    SUMMARY_FIELDS = ('order_id', 'p_kind', 'p_construction', 'p_active_trim', 'p_status', 'p_width', 'p_height',
+                      'p_quantity', 'glass_quantity', 'workshop')
 
-        # Если есть комплект фурнитуры, обновляем p_furniture
-        if self.has_furniture_kit():
-            # Обновляем только если еще не обновляли в этом же save
-            if 'update_fields' not in kwargs or 'p_furniture' not in kwargs.get('update_fields', []):
-                self.update_furniture_codes()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_summary = instance._summary_values()
+        return instance
+
+    def _summary_values(self):
+        return tuple(self.__dict__.get(name) for name in self.SUMMARY_FIELDS)
+
+    def summary_changed(self):
+        """Новая позиция или изменилось поле, влияющее на счетчики заказа"""
+        return getattr(self, '_loaded_summary', None) != self._summary_values()
+
+    def mark_summary_saved(self):
+        self._loaded_summary = self._summary_values()
 
     class Meta:
         verbose_name = 'Позиция заказа'
         verbose_name_plural = 'Позиции заказа'
         ordering = ['order', 'position_num']
 
+    def set_glass(self, counted_glass):
+        """
+        Остекление из словаря {(высота, ширина): количество} (OrderProcessor.count_glass_data).
+        Размеры - сырые значения ячеек бланка: все, кроме чисел и строк (дата, время), сохраняются строкой,
+        иначе JSONField не сериализует значение
+        """
+        def cell(value):
+            return value if value is None or isinstance(value, (int, float, str)) else str(value)
+
+        self.p_glass = [[cell(height), cell(width), quantity] for (height, width), quantity in counted_glass.items()]
+        self.glass_quantity = sum(counted_glass.values())
+
     @property
     def d_glass(self):
-        if self.p_glass != '{}':
-            data = ast.literal_eval(self.p_glass)
-            result = '<br>'.join(f"({key[0]}x{key[1]}): {value}" for key, value in data.items())
-            return result
-        else:
-            return 'нет'
+        if self.p_glass:
+            return '<br>'.join(f"({height}x{width}): {quantity}" for height, width, quantity in self.p_glass)
+        return 'нет'
 
 class GlassInfo(models.Model):
     KIND_CHOICE = (
@@ -1081,7 +1414,7 @@ class Shipment(models.Model):
     user = models.ForeignKey(User, related_name='shipments', on_delete=models.CASCADE)
     order = models.ForeignKey(Order, related_name='shipments', on_delete=models.CASCADE)
     workshop = models.IntegerField(blank=True, null=True)
-    date = models.DateField(blank=True, null=True)
+    date = models.DateField(blank=True, null=True, db_index=True)
     time = models.TimeField(blank=True, null=True)
     address = models.CharField(max_length=100, blank=True, null=True)
     comments = models.CharField(max_length=100, blank=True, null=True)
@@ -1095,81 +1428,152 @@ class Shipment(models.Model):
         return user.is_superuser or self.user == user
 
 
-# class StockOperation(models.Model):
-#     """Операция со складом (приход/резерв/списание)"""
-#     OPERATION_TYPES = [
-#         ('receipt', 'Приход'),
-#         ('reservation', 'Резервирование'),
-#         ('consumption', 'Списание'),
-#         ('cancel_reservation', 'Отмена резерва'),
-#     ]
-#
-#     operation_type = models.CharField(
-#         max_length=20,
-#         choices=OPERATION_TYPES,
-#         verbose_name='Тип операции'
-#     )
-#     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата операции')
-#     created_by = models.ForeignKey(
-#         User,
-#         on_delete=models.PROTECT,
-#         verbose_name='Создал'
-#     )
-#     comment = models.TextField(blank=True, null=True, verbose_name='Комментарий')
-#
-#     # Для приходов
-#     invoice_number = models.CharField(
-#         max_length=50,
-#         blank=True,
-#         null=True,
-#         verbose_name='Номер накладной'
-#     )
-#     supplier = models.CharField(
-#         max_length=100,
-#         blank=True,
-#         null=True,
-#         verbose_name='Поставщик'
-#     )
-#
-#     class Meta:
-#         verbose_name = 'Операция со складом'
-#         verbose_name_plural = 'Операции со складом'
-#         ordering = ['-created_at']
-#
-#     def __str__(self):
-#         return f"{self.get_operation_type_display()} от {self.created_at.date()}"
-
-
-# class StockOperationItem(models.Model):
-#     """Позиция в операции со складом"""
-#     operation = models.ForeignKey(
-#         StockOperation,
-#         on_delete=models.CASCADE,
-#         related_name='items',
-#         verbose_name='Операция'
-#     )
-#
-#     # Универсальная связь с любой моделью фурнитуры
-#     content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
-#     object_id = models.PositiveIntegerField()
-#     item = models.GenericForeignKey('content_type', 'object_id')
-#
-#     quantity = models.PositiveIntegerField(
-#         verbose_name='Количество'
-#     )
-    #
-    # # Для приходов - цена закупки
-    # purchase_price = models.DecimalField(
-    #     max_digits=10,
-    #     decimal_places=2,
-    #     blank=True,
-    #     null=True,
-    #     verbose_name='Цена закупки'
-    # )
-    #
-    # class Meta:
-    #     verbose_name = 'Позиция операции'
-    #     verbose_name_plural = 'Позиции операций'
-    #
-    # def __str__(self):
-    #     return f"{self.item}: {self.quantity} шт."
\ No newline at end of file
+class StockOperation(models.Model):
+    """Операция со складом (приход/резерв/списание)"""
+    OPERATION_TYPES = [
+        ('receipt', 'Приход'),
+        ('reservation', 'Резервирование'),
+        ('consumption', 'Списание'),
+        ('cancel_reservation', 'Отмена резерва'),
+        ('adjustment', 'Корректировка остатков'),
+    ]
+
+    operation_type = models.CharField(
+        max_length=20,
+        choices=OPERATION_TYPES,
+        verbose_name='Тип операции'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата операции')
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        verbose_name='Создал'
+    )
+    comment = models.TextField(blank=True, null=True, verbose_name='Комментарий')
+
+    # Для приходов
+    invoice_number = models.CharField(
+        max_length=50,
+        blank=True,
+        null=True,
+        verbose_name='Номер накладной'
+    )
+    supplier = models.CharField(
+        max_length=100,
+        blank=True,
+        null=True,
+        verbose_name='Поставщик'
+    )
+
+    # Для резервов под заказ
+    order = models.ForeignKey(
+        'Order',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='stock_operations',
+        verbose_name='Заказ'
+    )
+
+    class Meta:
+        verbose_name = 'Операция со складом'
+        verbose_name_plural = 'Операции со складом'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_operation_type_display()} от {self.created_at.date()}"
+
+
+class StockOperationItem(models.Model):
+    """Позиция в операции со складом"""
+    operation = models.ForeignKey(
+        StockOperation,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name='Операция'
+    )
+
+    # Универсальная связь с любой моделью фурнитуры
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+
+    quantity = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    # Для приходов - цена закупки
+    purchase_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        verbose_name='Цена закупки'
+    )
+
+    class Meta:
+        verbose_name = 'Позиция операции'
+        verbose_name_plural = 'Позиции операций'
+        indexes = [models.Index(fields=['content_type', 'object_id'])]
+
+    def __str__(self):
+        return f"{self.item}: {self.quantity} шт."
+
+
+class StockLedgerEntry(models.Model):
+    """
+    Запись складского журнала: знаковое изменение остатка и резерва одного товара.
+    Журнал только дополняется; сумма записей по товару равна его счетчикам
+    quantity_in_stock и reserved_quantity.
+    """
+    operation = models.ForeignKey(
+        StockOperation,
+        on_delete=models.PROTECT,
+        related_name='ledger_entries',
+        verbose_name='Операция'
+    )
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.PROTECT)
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+
+    stock_delta = models.IntegerField(default=0, verbose_name='Изменение остатка')
+    reserved_delta = models.IntegerField(default=0, verbose_name='Изменение резерва')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Дата')
+
+    class Meta:
+        verbose_name = 'Запись складского журнала'
+        verbose_name_plural = 'Складской журнал'
+        indexes = [models.Index(fields=['content_type', 'object_id', 'created_at'])]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Записи складского журнала нельзя изменять')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Записи складского журнала нельзя удалять')
+
+    def __str__(self):
+        return f"{self.item}: остаток {self.stock_delta:+}, резерв {self.reserved_delta:+}"
+
+
+class StockSnapshot(models.Model):
+    """Остаток и резерв товара на конец дня, рассчитанные по складскому журналу"""
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.PROTECT)
+    object_id = models.PositiveIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+
+    date = models.DateField(verbose_name='Дата')
+    quantity_in_stock = models.IntegerField(verbose_name='Количество на складе')
+    reserved_quantity = models.IntegerField(verbose_name='Зарезервировано')
+
+    class Meta:
+        verbose_name = 'Снимок остатков'
+        verbose_name_plural = 'Снимки остатков'
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'date'], name='unique_stock_snapshot'),
+        ]
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f"{self.item} на {self.date}: {self.quantity_in_stock} шт."
\ No newline at end of file
@@ -11,10 +11,17 @@ class UserSerializer(serializers.ModelSerializer):
 
 class OrganizationSerializer(serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
+    # Заполняются из Organization.objects.with_stats(), без аннотаций поля не выводятся
+    last_order_at = serializers.DateTimeField(read_only=True)
+    orders_count = serializers.IntegerField(read_only=True)
+    invoices_total = serializers.IntegerField(read_only=True)
+    paid_total = serializers.IntegerField(read_only=True)
+    debt = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Organization
-        fields = '__all__'
+        # search_text - служебная строка полнотекстового поиска (ИНН, ОГРН, КПП, телефоны, e-mail)
+        exclude = ['search_text']
 
 
 class InternalLegalEntitySerializer(serializers.ModelSerializer):
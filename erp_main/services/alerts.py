@@ -0,0 +1,45 @@
+import datetime
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from erp_main.models import Order, Shipment
+
+
+class OrderAlertService:
+    """Сервис уведомлений по заказам: срок сегодня, просроченные и отгрузки на сегодня"""
+
+    CACHE_KEY = 'erp_main:order_alerts:{date}'
+    CACHE_TIMEOUT = 60  # секунд
+
+    @classmethod
+    def get_alerts(cls, date=None):
+        """
+        Возвращает {'today': {pk: url}, 'overdue': {pk: url}, 'ships': {pk: url}}.
+        Считается тремя запросами по индексам и кэшируется на CACHE_TIMEOUT секунд.
+        """
+        date = date or datetime.date.today()
+        key = cls.CACHE_KEY.format(date=date.isoformat())
+
+        alerts = cache.get(key)
+        if alerts is None:
+            alerts = cls._build(date)
+            cache.set(key, alerts, cls.CACHE_TIMEOUT)
+        return alerts
+
+    @classmethod
+    def invalidate(cls, date=None):
+        """Сбрасывает кэш уведомлений (при изменении сроков, статусов позиций или отгрузок)"""
+        date = date or datetime.date.today()
+        cache.delete(cls.CACHE_KEY.format(date=date.isoformat()))
+
+    @staticmethod
+    def _build(date):
+        today = Order.objects.filter(due_date=date).values_list('pk', flat=True)
+        overdue = Order.objects.overdue(date).values_list('pk', flat=True)
+        ships = Shipment.objects.filter(date=date).values_list('order_id', flat=True).distinct()
+
+        def links(order_ids):
+            return {pk: reverse('order_detail', args=[pk]) for pk in sorted(order_ids)}
+
+        return {'today': links(today), 'overdue': links(overdue), 'ships': links(ships)}
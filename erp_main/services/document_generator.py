@@ -1,79 +1,60 @@
 import os
-import pymorphy3
 from docx import Document
 from django.conf import settings
 from datetime import datetime
 
+from .morphology import Morphology
+
 
 class ContractGenerator:
     """Генератор договоров"""
 
     def __init__(self):
-        self.morph = pymorphy3.MorphAnalyzer()
         self.months_ru = [
             "января", "февраля", "марта", "апреля", "мая", "июня",
             "июля", "августа", "сентября", "октября", "ноября", "декабря"
         ]
 
+    @property
+    def morph(self):
+        return Morphology.analyzer()
+
     def genitive_case(self, word):
         """Склонение слова в родительный падеж"""
-        if not word:
-            return ""
-
-        try:
-            words = word.split()
-            modified_words = []
-
-            for w in words:
-                parsed_word = self.morph.parse(w)[0]
-                if "NOUN" in parsed_word.tag or "ADJF" in parsed_word.tag:
-                    genitive = parsed_word.inflect({"gent"}).word
-                    modified_words.append(genitive)
-                else:
-                    modified_words.append(w)
-
-            if len(words) == 3:
-                if 'уляшва' in modified_words:
-                    modified_words[0] = 'уляшова'
-                capitalized_words = [word.capitalize() for word in modified_words]
-                return " ".join(capitalized_words)
-            else:
-                return " ".join(modified_words)
-
-        except Exception as e:
-            print(f"Ошибка при склонении слова '{word}': {e}")
-            return word
+        return Morphology.genitive_case(word)
 
     def format_full_name(self, surname, name, patronymic):
         """Форматирование ФИО в формате 'Фамилия И.О.'"""
-        return f"{surname.capitalize()} {name[0].upper()}. {patronymic[0].upper()}."
+        return Morphology.format_full_name(surname, name, patronymic)
 
     def get_workday_phrase(self, number):
         """Формирование фразы о рабочих днях"""
-        # Определение формы слова "рабочий"
-        if number % 10 == 1 and number % 100 != 11:
-            workday_form = self.morph.parse('рабочий')[0].inflect(
-                {'nomn', 'sing'}).word  # Именительный падеж, единственное число
-        elif number % 10 in [2, 3, 4] and not (number % 100 in [12, 13, 14]):
-            workday_form = self.morph.parse('рабочий')[0].inflect(
-                {'gent', 'plur'}).word  # Родительный падеж, множественное число
-        else:
-            workday_form = self.morph.parse('рабочий')[0].inflect(
-                {'gent', 'plur'}).word  # Родительный падеж, множественное число
-
-        # Определение формы слова "день"
-        if number % 10 == 1 and number % 100 != 11:
-            day_form = 'день'  # 1, 21
-        elif number % 10 in [2, 3, 4] and not (number % 100 in [12, 13, 14]):
-            day_form = 'дня'  # 2, 3, 4, 22, 23, 24
-        else:
-            day_form = 'дней'  # 5-20, 25-31
-
-        # Формируем строку
-        return f"{number} {workday_form} {day_form}"
+        return Morphology.get_workday_phrase(number)
 
     def generate_contract(self, legal_entity, organization, timeframe=21):
         """Генерация договора"""
+        data = self.contract_data(legal_entity, organization, timeframe)
+        c_number = data['номер_договора']
+
+        # Полный путь к шаблону
+        file_path = os.path.join(settings.BASE_DIR, 'media/contracts/contract.docx')
+        doc = Document(file_path)
+
+        # Заменяем метки в документе
+        self._replace_placeholders(doc, data)
+
+        # Определяем путь, по которому будет сохраняться новый документ
+        num = c_number.replace("/", '')
+        new_file_path = os.path.join(settings.MEDIA_ROOT, f'contracts/договор_{num}.docx')
+        os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
+
+        # Сохраняем изменённый документ
+        doc.save(new_file_path)
+
+        return new_file_path, c_number
+
+    def contract_data(self, legal_entity, organization, timeframe=21):
+        """Значения плейсхолдеров договора и его номер (ключ 'номер_договора')"""
         now = datetime.now()
         day_of_month = now.day
         month_num = now.month
@@ -123,22 +104,7 @@ class ContractGenerator:
             'номер_договора': c_number
         }
 
-        # Полный путь к шаблону
-        file_path = os.path.join(settings.BASE_DIR, 'media/contracts/contract.docx')
-        doc = Document(file_path)
-
-        # Заменяем метки в документе
-        self._replace_placeholders(doc, data)
-
-        # Определяем путь, по которому будет сохраняться новый документ
-        num = c_number.replace("/", '')
-        new_file_path = os.path.join(settings.MEDIA_ROOT, f'contracts/договор_{num}.docx')
-        os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
-
-        # Сохраняем изменённый документ
-        doc.save(new_file_path)
-
-        return new_file_path, c_number
+        return data
 
     def _replace_placeholders(self, doc, data):
         """Замена плейсхолдеров в документе Word"""
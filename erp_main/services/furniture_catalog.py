@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+import uuid
+from itertools import combinations
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from erp_main.furniture import DoorLock, DoorHandle, LockCylinder
+from erp_main.product_options import DoorCloser, VentGrate, ClosingCoordinator
+
+EMPTY_CODE = '00'  # Пустая часть в строке кодов фурнитуры
+
+logger = logging.getLogger(__name__)
+
+
+class KitEntry(NamedTuple):
+    """Разобранная строка кодов 'замки-ручки-ц/м'"""
+    locks: tuple
+    handles: tuple
+    cylinders: tuple
+    unresolved: tuple  # Коды, которых нет в каталоге
+
+    @property
+    def resolved(self):
+        return not self.unresolved
+
+    @property
+    def is_empty(self):
+        return not (self.locks or self.handles or self.cylinders or self.unresolved)
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога фурнитуры с индексами по коду и артикулу"""
+
+    # Модели частей строки кодов в порядке 'замки-ручки-ц/м'
+    KIT_PARTS = (DoorLock, DoorHandle, LockCylinder)
+    KITS_CACHE_SIZE = 10000
+
+    def __init__(self, version, items):
+        self.version = version
+        self.built_at = self.checked_at = time.monotonic()
+        self.by_model_code = {}
+        self.by_code = {}
+        self.by_vendor_number = {}
+        self._kits = {}
+
+        for obj in items:
+            code = str(obj.get_code()).strip()
+            self.by_model_code.setdefault(type(obj), {})[code] = obj
+            self.by_code.setdefault(code, []).append(obj)
+            if obj.vendor_number:
+                self.by_vendor_number.setdefault(obj.vendor_number.strip(), []).append(obj)
+
+    def get(self, model, code):
+        """Элемент фурнитуры модели по коду (или наименованию, если кода нет, как в get_code())"""
+        return self.by_model_code.get(model, {}).get(str(code).strip())
+
+    def find_by_code(self, code):
+        """Все элементы любых моделей с таким кодом"""
+        return tuple(self.by_code.get(str(code).strip(), ()))
+
+    def find_by_vendor_number(self, vendor_number):
+        return tuple(self.by_vendor_number.get(str(vendor_number).strip(), ()))
+
+    def _resolve_parts(self, parts):
+        resolved, unresolved = [], []
+        for model, part in zip(self.KIT_PARTS, parts):
+            objects = []
+            for code in part.split('.') if part.strip() else ():
+                code = code.strip()
+                if code == EMPTY_CODE:
+                    continue
+                obj = self.get(model, code)
+                if obj is None:
+                    unresolved.append(code)
+                else:
+                    objects.append(obj)
+            resolved.append(tuple(objects))
+        return KitEntry(*resolved, unresolved=tuple(dict.fromkeys(unresolved)))
+
+    def resolve_kit(self, codes_string):
+        """
+        KitEntry для строки кодов. Коды сами могут содержать '-', поэтому перебираются
+        все разбиения строки на три части и выбирается первое полностью найденное в каталоге
+        (иначе - с наименьшим числом ненайденных кодов).
+        """
+        codes_string = str(codes_string or '').strip()
+        if codes_string in self._kits:
+            return self._kits[codes_string]
+
+        tokens = codes_string.split('-')
+        best = None
+        for first, second in combinations(range(1, len(tokens)), 2):
+            entry = self._resolve_parts(['-'.join(tokens[:first]), '-'.join(tokens[first:second]),
+                                         '-'.join(tokens[second:])])
+            if best is None or len(entry.unresolved) < len(best.unresolved):
+                best = entry
+            if entry.resolved:
+                break
+        if best is None:  # Меньше трех частей - это не строка кодов
+            best = KitEntry((), (), (), unresolved=(codes_string,) if codes_string else ())
+
+        if len(self._kits) >= self.KITS_CACHE_SIZE:
+            self._kits.clear()
+        self._kits[codes_string] = best
+        return best
+
+
+class FurnitureCatalog:
+    """
+    Каталог фурнитуры в памяти процесса: замки, ручки, ц/м, доводчики, вент. решетки и координаторы.
+    Снимок строится одним запросом на модель и живет, пока не изменится версия в общем кэше
+    (алиас FURNITURE_CATALOG_CACHE, в продакшене - Redis, общий для всех воркеров), но не дольше SNAPSHOT_TTL секунд:
+    если кэш не общий (LocMem в разработке), недоступен или версия пропала, устаревший снимок все равно перестроится.
+    Версия меняется сигналами при сохранении и удалении элементов фурнитуры, поэтому
+    все процессы перестраивают снимок после изменения каталога. Версия читается из кэша
+    не чаще раза в VERSION_CHECK_INTERVAL секунд, а не при каждом обращении к каталогу.
+    Остатки на складе берите из БД: изменения остатков через update() снимок не обновляют.
+    """
+
+    MODELS = (DoorLock, DoorHandle, LockCylinder, DoorCloser, VentGrate, ClosingCoordinator)
+    VERSION_KEY = 'erp_main:furniture_catalog:version'
+    SNAPSHOT_TTL = 300  # секунд
+    VERSION_CHECK_INTERVAL = 5  # секунд
+
+    _snapshot = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def cache():
+        return caches[getattr(settings, 'FURNITURE_CATALOG_CACHE', 'default')]
+
+    @classmethod
+    def version(cls):
+        """Версия каталога из общего кэша; None, если кэш недоступен (тогда действует только SNAPSHOT_TTL)"""
+        try:
+            cache = cls.cache()
+            version = cache.get(cls.VERSION_KEY)
+            if version is None:
+                cache.add(cls.VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(cls.VERSION_KEY)
+            return version
+        except Exception as e:
+            logger.warning("Кэш версии каталога фурнитуры недоступен: %s", e)
+            return None
+
+    @classmethod
+    def get(cls):
+        """Актуальный снимок каталога (перестраивается только после изменения версии или по таймауту)"""
+        snapshot = cls._snapshot
+        now = time.monotonic()
+        if (snapshot is not None and now - snapshot.checked_at < cls.VERSION_CHECK_INTERVAL
+                and now - snapshot.built_at <= cls.SNAPSHOT_TTL):
+            return snapshot
+
+        version = cls.version()
+        if cls._stale(snapshot, version):
+            with cls._lock:
+                snapshot = cls._snapshot
+                if cls._stale(snapshot, version):
+                    items = [obj for model in cls.MODELS for obj in model.objects.all()]
+                    snapshot = cls._snapshot = CatalogSnapshot(version, items)
+        else:
+            snapshot.checked_at = now
+        return snapshot
+
+    @classmethod
+    def _stale(cls, snapshot, version):
+        return (snapshot is None or snapshot.version != version
+                or time.monotonic() - snapshot.built_at > cls.SNAPSHOT_TTL)
+
+    @classmethod
+    def invalidate(cls):
+        cls._snapshot = None
+        try:
+            cls.cache().set(cls.VERSION_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            logger.warning("Не удалось обновить версию каталога фурнитуры: %s", e)
+
+    @classmethod
+    def get_by_code(cls, code, model=None):
+        """Элемент модели model по коду, без model - кортеж совпадений во всех моделях"""
+        snapshot = cls.get()
+        return snapshot.get(model, code) if model else snapshot.find_by_code(code)
+
+    @classmethod
+    def get_by_vendor_number(cls, vendor_number):
+        return cls.get().find_by_vendor_number(vendor_number)
+
+    @classmethod
+    def resolve_kits(cls, codes_strings):
+        """
+        {строка кодов: KitEntry} для набора строк 'замки-ручки-ц/м'.
+        Ключи - строки без пробелов по краям, как их нормализует resolve_kit()
+        """
+        snapshot = cls.get()
+        codes_strings = {str(codes_string or '').strip() for codes_string in codes_strings}
+        return {codes_string: snapshot.resolve_kit(codes_string) for codes_string in codes_strings}
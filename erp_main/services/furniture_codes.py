@@ -0,0 +1,52 @@
+from erp_main.furniture import FurnitureKit
+from erp_main.models import OrderItem
+
+
+class FurnitureCodesService:
+    """Пересчет кодов фурнитуры (OrderItem.p_furniture) по комплектам"""
+
+    @staticmethod
+    def refresh(kit_ids):
+        """
+        Пересчитывает и записывает p_furniture позиций указанных комплектов.
+        Комплекты загружаются одним набором запросов, позиции обновляются без вызова save().
+        Возвращает {id позиции: коды}.
+        """
+        kits = FurnitureKit.objects.with_items().filter(pk__in=[pk for pk in kit_ids if pk]).only('pk', 'order_item')
+        items = [OrderItem(pk=kit.order_item_id, p_furniture=kit.codes_string()) for kit in kits]
+
+        if len(items) == 1:
+            OrderItem.objects.filter(pk=items[0].pk).update(p_furniture=items[0].p_furniture)
+        elif items:
+            OrderItem.objects.bulk_update(items, ['p_furniture'])
+        return {item.pk: item.p_furniture for item in items}
+
+    @staticmethod
+    def backfill(batch_size=500):
+        """
+        Пересчитывает p_furniture всех позиций с комплектами фурнитуры пачками по batch_size
+        и записывает только отличающиеся значения. Возвращает (проверено, обновлено).
+        """
+        checked = updated = 0
+        last_pk = 0
+        while True:
+            kits = list(
+                FurnitureKit.objects.with_items().select_related('order_item')
+                .filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', 'order_item__id', 'order_item__p_furniture')[:batch_size]
+            )
+            if not kits:
+                break
+            last_pk = kits[-1].pk
+
+            changed = []
+            for kit in kits:
+                codes = kit.codes_string()
+                if kit.order_item.p_furniture != codes:
+                    kit.order_item.p_furniture = codes
+                    changed.append(kit.order_item)
+            OrderItem.objects.bulk_update(changed, ['p_furniture'])
+
+            checked += len(kits)
+            updated += len(changed)
+        return checked, updated
@@ -0,0 +1,64 @@
+from collections import Counter
+
+from django.db import transaction
+
+from erp_main.furniture import FurnitureKit, FurnitureKitLock, FurnitureKitHandle, FurnitureKitCylinder
+from erp_main.models import OrderItem
+from erp_main.services.furniture_catalog import FurnitureCatalog
+
+
+class FurnitureKitImportService:
+    """Создание комплектов фурнитуры по строкам кодов p_furniture из бланка"""
+
+    # (модель строки комплекта, поле элемента фурнитуры, часть KitEntry)
+    ROW_MODELS = (
+        (FurnitureKitLock, 'door_lock', 'locks'),
+        (FurnitureKitHandle, 'door_handle', 'handles'),
+        (FurnitureKitCylinder, 'lock_cylinder', 'cylinders'),
+    )
+
+    @classmethod
+    @transaction.atomic
+    def build_kits(cls, order, rebuild=()):
+        """
+        Создает комплекты для позиций заказа без комплекта, а для позиций из rebuild (id)
+        пересоздает существующие. Комплекты и их строки создаются через bulk_create,
+        повторяющийся код в строке дает количество 2 и т.д. p_furniture не меняется.
+        Возвращает {'created': число комплектов, 'unresolved': {номер позиции: [коды]}}.
+        """
+        rebuild = set(rebuild)
+        if rebuild:
+            FurnitureKit.objects.filter(order_item__order=order, order_item__in=rebuild).delete()
+
+        items = [
+            item for item in OrderItem.objects.filter(order=order).exclude(p_status='changed')
+            .filter(furniture_kit__isnull=True)
+            if item.p_furniture
+        ]
+        entries = FurnitureCatalog.resolve_kits(item.p_furniture.strip() for item in items)
+
+        kits, unresolved = [], {}
+        for item in items:
+            item.order = order
+            entry = entries[item.p_furniture.strip()]
+            if entry.unresolved:
+                unresolved[item.position_num] = list(entry.unresolved)
+            if entry.locks or entry.handles or entry.cylinders:
+                kits.append((FurnitureKit(order_item=item, name=f'Комплект для {item}'), entry))
+
+        FurnitureKit.objects.bulk_create([kit for kit, _ in kits])
+        if any(kit.pk is None for kit, _ in kits):
+            # MySQL не возвращает id после bulk_create: комплект однозначно определяется позицией
+            pks = dict(FurnitureKit.objects.filter(order_item__in=[kit.order_item_id for kit, _ in kits])
+                       .values_list('order_item_id', 'pk'))
+            for kit, _ in kits:
+                kit.pk = pks[kit.order_item_id]
+
+        for row_model, item_field, part in cls.ROW_MODELS:
+            row_model.objects.bulk_create([
+                row_model(furniture_kit=kit, quantity=quantity, **{item_field: furniture_item})
+                for kit, entry in kits
+                for furniture_item, quantity in Counter(getattr(entry, part)).items()
+            ])
+
+        return {'created': len(kits), 'unresolved': unresolved}
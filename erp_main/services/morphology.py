@@ -0,0 +1,121 @@
+import logging
+import threading
+from functools import lru_cache
+
+import pymorphy3
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Morphology:
+    """
+    Склонение для документов (договоры): один морфологический анализатор pymorphy3 на процесс
+    и LRU-кэш готовых результатов.
+
+    Анализатор создается при первом обращении (загрузка словарей - самая дорогая часть)
+    и дальше используется всеми генераторами и потоками процесса. preload() создает его заранее -
+    при старте веб-воркера (вызывается из Journal_4_0/wsgi.py и asgi.py, см. CONTRACT_MORPHOLOGY_PRELOAD);
+    команды manage.py и фоновые процессы словари не загружают.
+    Должности и ФИО повторяются от договора к договору, поэтому результаты склонения кэшируются.
+    """
+
+    CACHE_SIZE = 4096
+
+    _analyzer = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def analyzer(cls):
+        if cls._analyzer is None:
+            with cls._lock:
+                if cls._analyzer is None:
+                    cls._analyzer = pymorphy3.MorphAnalyzer()
+        return cls._analyzer
+
+    @classmethod
+    def warm_up(cls):
+        """Загружает словари и прогревает разбор типовых слов договора"""
+        cls.analyzer()
+        cls.genitive_case('генеральный директор')
+        cls.get_workday_phrase(21)
+
+    @classmethod
+    def preload(cls):
+        """Прогрев при старте веб-сервера, если включен CONTRACT_MORPHOLOGY_PRELOAD"""
+        if getattr(settings, 'CONTRACT_MORPHOLOGY_PRELOAD', False):
+            cls.warm_up()
+
+    @classmethod
+    def cache_clear(cls):
+        for func in (cls.genitive_case, cls.format_full_name, cls.get_workday_phrase):
+            func.cache_clear()
+
+    @classmethod
+    def cache_info(cls):
+        return {
+            'genitive_case': cls.genitive_case.cache_info(),
+            'format_full_name': cls.format_full_name.cache_info(),
+            'get_workday_phrase': cls.get_workday_phrase.cache_info(),
+        }
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def genitive_case(word):
+        """Склонение слова или словосочетания в родительный падеж"""
+        if not word:
+            return ""
+
+        try:
+            morph = Morphology.analyzer()
+            words = word.split()
+            modified_words = []
+
+            for w in words:
+                parsed_word = morph.parse(w)[0]
+                if "NOUN" in parsed_word.tag or "ADJF" in parsed_word.tag:
+                    genitive = parsed_word.inflect({"gent"}).word
+                    modified_words.append(genitive)
+                else:
+                    modified_words.append(w)
+
+            if len(words) == 3:
+                if 'уляшва' in modified_words:
+                    modified_words[0] = 'уляшова'
+                capitalized_words = [word.capitalize() for word in modified_words]
+                return " ".join(capitalized_words)
+            else:
+                return " ".join(modified_words)
+
+        except Exception as e:
+            logger.warning("Ошибка при склонении слова '%s': %s", word, e)
+            return word
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def format_full_name(surname, name, patronymic):
+        """Форматирование ФИО в формате 'Фамилия И.О.'"""
+        return f"{surname.capitalize()} {name[0].upper()}. {patronymic[0].upper()}."
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def get_workday_phrase(number):
+        """Фраза о рабочих днях: '21 рабочий день', '10 рабочих дней'"""
+        morph = Morphology.analyzer()
+        # Определение формы слова "рабочий"
+        if number % 10 == 1 and number % 100 != 11:
+            workday_form = morph.parse('рабочий')[0].inflect(
+                {'nomn', 'sing'}).word  # Именительный падеж, единственное число
+        else:
+            workday_form = morph.parse('рабочий')[0].inflect(
+                {'gent', 'plur'}).word  # Родительный падеж, множественное число
+
+        # Определение формы слова "день"
+        if number % 10 == 1 and number % 100 != 11:
+            day_form = 'день'  # 1, 21
+        elif number % 10 in [2, 3, 4] and not (number % 100 in [12, 13, 14]):
+            day_form = 'дня'  # 2, 3, 4, 22, 23, 24
+        else:
+            day_form = 'дней'  # 5-20, 25-31
+
+        return f"{number} {workday_form} {day_form}"
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files import File
+from django.db import transaction
+
+from erp_main.models import Order
+from erp_main.services.furniture_kits import FurnitureKitImportService
+from erp_main.services.order_import import OrderImportService
+from erp_main.services.order_processor import OrderProcessor
+
+
+class OrderBatchImportService:
+    """
+    Пакетная загрузка бланков заказов из ZIP-архива или папки.
+    Бланки разбираются без обращения к БД, затем каждый заказ создается в своей транзакции:
+    ошибка в одном файле не отменяет остальные. Пул процессов для разбора запускает только
+    команда import_order_blanks; веб-загрузка передает workers=1 и разбирает файлы в своем процессе.
+    """
+
+    EXTENSIONS = ('.xlsx', '.xlsm')
+
+    @classmethod
+    def _is_blank_name(cls, name):
+        base = os.path.basename(name)
+        # Временные файлы Excel (~$...) и служебные папки архиваторов пропускаются
+        return (base.lower().endswith(cls.EXTENSIONS) and not base.startswith('~$')
+                and '__MACOSX' not in name)
+
+    @classmethod
+    def extract_zip(cls, archive, target_dir):
+        """Распаковывает бланки из архива в target_dir без вложенных путей. Возвращает [(имя, путь)]"""
+        files = []
+        with zipfile.ZipFile(archive) as zf:
+            for index, info in enumerate(zf.infolist()):
+                if info.is_dir() or not cls._is_blank_name(info.filename):
+                    continue
+                name = os.path.basename(info.filename)
+                path = os.path.join(target_dir, f'{index}_{name}')
+                with zf.open(info) as src, open(path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                files.append((name, path))
+        return files
+
+    @classmethod
+    def list_directory(cls, directory):
+        """Бланки из папки (без подпапок), отсортированные по имени"""
+        return [
+            (name, os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if cls._is_blank_name(name) and os.path.isfile(os.path.join(directory, name))
+        ]
+
+    @staticmethod
+    def parse_files(paths, workers=None):
+        """
+        Разбор файлов, результаты в порядке paths. При workers > 1 - в пуле процессов spawn
+        (дочерним процессам не передаются соединения с БД); workers=None - по числу ядер.
+        """
+        workers = min(workers or os.cpu_count() or 1, len(paths))
+        if workers <= 1:
+            return [OrderProcessor.parse_blank_file(path) for path in paths]
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            return list(pool.map(OrderProcessor.parse_blank_file, paths))
+
+    @staticmethod
+    def create_order(name, path, positions, invoice, due_date=None, comment=''):
+        """Создает заказ с файлом бланка и позициями в отдельной транзакции"""
+        with transaction.atomic():
+            order = Order(invoice=invoice, due_date=due_date, comment=comment)
+            with open(path, 'rb') as f:
+                order.order_file.save(name, File(f), save=False)
+            order.save()
+            OrderImportService.create_items(order, positions)
+            kits = FurnitureKitImportService.build_kits(order)
+        return order, kits
+
+    @classmethod
+    def import_files(cls, files, invoice, due_date=None, comment='', workers=None):
+        """
+        Загружает бланки [(имя, путь)] и возвращает отчет по каждому файлу:
+        {'file', 'success', 'order_id', 'positions', 'error', 'unresolved_furniture'}
+        """
+        if not files:
+            return []
+
+        parsed = cls.parse_files([path for _, path in files], workers=workers)
+        report = []
+        for (name, path), (positions, error) in zip(files, parsed):
+            result = {'file': name, 'success': False, 'order_id': None, 'positions': 0, 'error': error,
+                      'unresolved_furniture': {}}
+            if positions:
+                try:
+                    order, kits = cls.create_order(name, path, positions, invoice, due_date, comment)
+                except Exception as e:
+                    result['error'] = f'Ошибка сохранения заказа: {e}'
+                else:
+                    result.update(success=True, order_id=order.pk, positions=len(positions),
+                                  unresolved_furniture=kits['unresolved'])
+            report.append(result)
+        return report
+
+    @classmethod
+    def import_source(cls, source, invoice, due_date=None, comment='', workers=None):
+        """Загрузка из ZIP-архива (путь или файл) или из папки"""
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            return cls.import_files(cls.list_directory(source), invoice, due_date, comment, workers)
+
+        with tempfile.TemporaryDirectory(prefix='order_batch_') as target_dir:
+            files = cls.extract_zip(source, target_dir)
+            return cls.import_files(files, invoice, due_date, comment, workers)
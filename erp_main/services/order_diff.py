@@ -0,0 +1,193 @@
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from erp_main.models import OrderItem, GlassInfo
+from erp_main.services.order_import import OrderImportService
+from erp_main.services.order_summary import OrderSummaryService
+
+
+@dataclass
+class FieldChange:
+    """Изменение одного поля позиции"""
+    name: str
+    old: object
+    new: object
+
+    def render(self):
+        model_field = OrderItem._meta.get_field(self.name)
+        choices = dict(model_field.flatchoices)
+        old, new = choices.get(self.old, self.old), choices.get(self.new, self.new)
+        if old in (None, ''):
+            return f'добавлен {model_field.verbose_name} "{new}";'
+        return f'{model_field.verbose_name} с "{old}" на "{new}";'
+
+
+@dataclass
+class GlassChange:
+    """Изменение остекления позиции: словари {(высота, ширина): количество}"""
+    old: dict
+    new: dict
+
+    @staticmethod
+    def _format(glass):
+        return ", ".join(f"{h}x{w} ({q} шт.)" for (h, w), q in glass.items()) if glass else "нет"
+
+    def render(self):
+        return f'изменено стекло с "{self._format(self.old)}" на "{self._format(self.new)}";'
+
+
+@dataclass
+class PositionChange:
+    """Изменения существующей позиции заказа"""
+    item: OrderItem
+    fields: list = field(default_factory=list)
+    glass: GlassChange = None
+
+    def __bool__(self):
+        return bool(self.fields or self.glass)
+
+    def render(self):
+        parts = [change.render() for change in self.fields]
+        if self.glass:
+            parts.append(self.glass.render())
+        return f'поз. {self.item.position_num}: ' + ' '.join(parts)
+
+
+@dataclass
+class OrderChangeset:
+    """Набор изменений заказа при повторной загрузке бланка"""
+    added: list = field(default_factory=list)
+    modified: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def furniture_changed(self):
+        """id позиций, у которых изменилась строка кодов фурнитуры"""
+        return [change.item.pk for change in self.modified
+                if any(field_change.name == 'p_furniture' for field_change in change.fields)]
+
+    def render(self):
+        """Комментарий для истории изменений заказа"""
+        lines = [change.render() for change in self.modified]
+        lines += [f'поз. {item.position_num}: добавлена позиция;' for item, _ in self.added]
+        lines += [f'поз. {item.position_num}: позиция удалена из бланка;' for item in self.removed]
+        return '<br>'.join(lines)
+
+
+class OrderDiffService:
+    """
+    Сравнение позиций заказа с повторно загруженным бланком.
+    diff() строит OrderChangeset по одному снимку позиций и стекол, apply() применяет его
+    числом запросов, не зависящим от количества позиций.
+    """
+
+    # Поля, которые сравниваются построчно (стекло сравнивается отдельно по GlassInfo)
+    COMPARED_FIELDS = [
+        'p_kind', 'p_type', 'p_construction', 'p_height', 'p_width', 'p_active_trim', 'p_open',
+        'p_platband', 'p_furniture', 'p_door_closer', 'p_step', 'p_ral', 'p_quantity', 'p_comment',
+    ]
+
+    @staticmethod
+    def _same(old, new):
+        """Значения из бланка и из БД сравниваются как строки, пустые значения равны"""
+        return ('' if old is None else str(old)) == ('' if new is None else str(new))
+
+    @staticmethod
+    def _valid_glass(glass):
+        return {(h, w): q for (h, w), q in glass.items() if h and w}
+
+    @classmethod
+    def diff(cls, order, positions):
+        """OrderChangeset для заказа и позиций из OrderProcessor.read_blank"""
+        current = {
+            item.position_num: item
+            for item in OrderItem.objects.filter(order=order).prefetch_related('glasses')
+        }
+        changeset = OrderChangeset()
+        seen = set()
+
+        for data in positions:
+            num = str(data[0])
+            fields = OrderImportService.position_fields(data)
+            new_glass = fields.pop('p_glass')
+            item = current.get(num)
+
+            if item is None:
+                item = OrderItem(order=order, position_num=num, p_status='in_query', **fields)
+                item.set_glass(new_glass)
+                changeset.added.append((item, new_glass))
+                continue
+
+            seen.add(num)
+            change = PositionChange(item=item)
+            for name in cls.COMPARED_FIELDS:
+                old = getattr(item, name)
+                if not cls._same(old, fields[name]):
+                    change.fields.append(FieldChange(name, old, fields[name]))
+
+            # Позиция, ранее снятая с заказа, возвращается в очередь
+            if item.p_status == 'changed':
+                change.fields.append(FieldChange('p_status', item.p_status, 'in_query'))
+
+            old_glass = {(g.height, g.width): g.quantity for g in item.glasses.all()}
+            if cls._valid_glass(old_glass) != cls._valid_glass(new_glass):
+                change.glass = GlassChange(old_glass, new_glass)
+
+            if change:
+                changeset.modified.append(change)
+
+        changeset.removed = [
+            item for num, item in current.items()
+            if num not in seen and item.p_status != 'changed'
+        ]
+        return changeset
+
+    @classmethod
+    @transaction.atomic
+    def apply(cls, order, changeset):
+        """
+        Применяет OrderChangeset: bulk_update измененных позиций, одно удаление их стекол,
+        bulk_create новых позиций и стекол. Удаленные из бланка позиции получают статус 'changed'
+        и перестают учитываться в счетчиках заказа.
+        Позиции заказа блокируются до конца транзакции, а каждая позиция записывает только свои
+        измененные поля (по одному UPDATE на набор полей): параллельная смена статуса или цеха
+        пользователем между diff() и apply() не затирается значениями из снимка.
+        """
+        list(OrderItem.objects.select_for_update().filter(order=order).order_by('pk').values_list('pk', flat=True))
+
+        groups = {}
+        for change in changeset.modified:
+            fields = set()
+            for field_change in change.fields:
+                setattr(change.item, field_change.name, field_change.new)
+                fields.add(field_change.name)
+            if change.glass:
+                change.item.set_glass(change.glass.new)
+                fields.update(['p_glass', 'glass_quantity'])
+            groups.setdefault(tuple(sorted(fields)), []).append(change.item)
+
+        for fields, items in groups.items():
+            OrderItem.objects.bulk_update(items, list(fields))
+
+        glass_changed = [change for change in changeset.modified if change.glass]
+        if glass_changed:
+            GlassInfo.objects.filter(order_items__in=[change.item for change in glass_changed]).delete()
+
+        if changeset.added:
+            OrderImportService.bulk_create_items(order, [item for item, _ in changeset.added])
+
+        GlassInfo.objects.bulk_create(
+            [row for change in glass_changed
+             for row in OrderImportService.glass_rows(change.item, change.glass.new)] +
+            [row for item, new_glass in changeset.added
+             for row in OrderImportService.glass_rows(item, new_glass)]
+        )
+
+        if changeset.removed:
+            OrderItem.objects.filter(pk__in=[item.pk for item in changeset.removed]).update(p_status='changed')
+
+        OrderSummaryService.refresh([order.pk])
+        return changeset
@@ -0,0 +1,82 @@
+from django.db import transaction
+
+from erp_main.models import OrderItem, GlassInfo
+from erp_main.services.order_processor import OrderProcessor
+from erp_main.services.order_summary import OrderSummaryService
+from erp_main.services.product_classifier import product_classifier
+
+
+class OrderImportService:
+    """Сервис для создания позиций заказа из разобранного бланка"""
+
+    @staticmethod
+    def position_fields(data):
+        """Поля OrderItem по строке позиции из OrderProcessor.iter_positions"""
+        product = product_classifier.classify(data[1])
+        return {
+            'p_kind': product.kind,
+            'p_type': product.type,
+            'p_construction': product.construction,
+            'p_height': data[2],
+            'p_width': data[3],
+            'p_active_trim': data[4],
+            'p_open': data[5],
+            'p_platband': data[6],
+            'p_furniture': data[7],
+            'p_door_closer': data[8],
+            'p_step': data[9],
+            'p_ral': data[10],
+            'p_quantity': data[11],
+            'p_comment': data[12],
+            'p_glass': OrderProcessor.count_glass_data(data[13:]),
+        }
+
+    @staticmethod
+    def glass_rows(item, counted_glass):
+        """Записи GlassInfo для позиции по словарю {(высота, ширина): количество}"""
+        return [
+            GlassInfo(order_items=item, height=height, width=width, quantity=quantity)
+            for (height, width), quantity in counted_glass.items()
+            if height and width
+        ]
+
+    @staticmethod
+    def bulk_create_items(order, items):
+        """
+        bulk_create позиций заказа с гарантированно проставленными id.
+        MySQL не возвращает id после bulk_create, поэтому они дочитываются одним запросом:
+        только что вставленные позиции - последние по id в этом заказе.
+        """
+        OrderItem.objects.bulk_create(items)
+
+        if any(item.pk is None for item in items):
+            pks = OrderItem.objects.filter(order=order).order_by('-pk').values_list('pk', flat=True)[:len(items)]
+            for item, pk in zip(items, reversed(list(pks))):
+                item.pk = pk
+                item._state.adding = False
+        return items
+
+    @classmethod
+    @transaction.atomic
+    def create_items(cls, order, positions):
+        """
+        Создает позиции нового заказа и их стекла через bulk_create.
+        OrderItem.save() не вызывается: у новых позиций нет комплектов фурнитуры,
+        а сводка заказа пересчитывается один раз в конце.
+        """
+        items, glass = [], []
+        for data in positions:
+            fields = cls.position_fields(data)
+            counted_glass = fields.pop('p_glass')
+            item = OrderItem(order=order, position_num=data[0], p_status='in_query', **fields)
+            item.set_glass(counted_glass)
+            items.append(item)
+            glass.append(counted_glass)
+
+        cls.bulk_create_items(order, items)
+        GlassInfo.objects.bulk_create([
+            row for item, counted_glass in zip(items, glass) for row in cls.glass_rows(item, counted_glass)
+        ])
+
+        OrderSummaryService.refresh([order.pk])
+        return items
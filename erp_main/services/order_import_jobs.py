@@ -0,0 +1,190 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from erp_main.models import OrderImportJob, OrderChangeHistory
+from erp_main.services.furniture_kits import FurnitureKitImportService
+from erp_main.services.order_diff import OrderDiffService
+from erp_main.services.order_import import OrderImportService
+from erp_main.services.order_processor import OrderProcessor
+from erp_main.services.order_reservation import OrderReservationService
+
+logger = logging.getLogger(__name__)
+
+
+class OrderImportJobService:
+    """
+    Очередь фоновой обработки бланков заказов.
+    Задания хранятся в OrderImportJob, выполняются локальным пулом потоков после коммита
+    транзакции загрузки. Незавершенные задания дообрабатывает команда process_import_jobs:
+    оставшиеся в очереди и прерванные (например, перезапуском сервера) - начатые давно и не завершенные.
+    Сохранение позиций и статус 'done' фиксируются одной транзакцией, поэтому повторная обработка
+    прерванного задания не создает позиции дважды.
+
+    Настройки:
+        ORDER_IMPORT_ASYNC - выполнять задания в фоне (по умолчанию True), иначе сразу в запросе
+        ORDER_IMPORT_WORKERS - количество потоков обработки (по умолчанию 2)
+        ORDER_IMPORT_STALE_MINUTES - через сколько минут начатое задание считается прерванным (по умолчанию 10)
+    """
+
+    IN_PROGRESS = ('parsing', 'diffing', 'saving')
+
+    _executor = None
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ORDER_IMPORT_WORKERS', 2),
+                thread_name_prefix='order-import',
+            )
+        return cls._executor
+
+    @classmethod
+    def enqueue(cls, order, user, is_update=False, old_file=None):
+        """
+        Создает задание на обработку только что загруженного файла заказа и ставит его в очередь.
+        Файл запоминается в задании: следующая загрузка до обработки не подменит его
+        """
+        job = OrderImportJob.objects.create(
+            order=order,
+            order_file=order.order_file.name,
+            old_file=old_file.name if old_file else None,
+            is_update=is_update,
+            created_by=user,
+        )
+        if getattr(settings, 'ORDER_IMPORT_ASYNC', True):
+            transaction.on_commit(lambda: cls.executor().submit(cls.run_in_thread, job.pk))
+        else:
+            transaction.on_commit(lambda: cls.run(job.pk))
+        return job
+
+    @classmethod
+    def run_in_thread(cls, job_id):
+        """Точка входа потока пула: у каждого потока свое соединение с БД"""
+        close_old_connections()
+        try:
+            cls.run(job_id)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _set_status(job, status, **fields):
+        job.status = status
+        for name, value in fields.items():
+            setattr(job, name, value)
+        OrderImportJob.objects.filter(pk=job.pk).update(status=status, **fields)
+
+    @classmethod
+    def run(cls, job_id):
+        """
+        Выполняет задание, если оно еще в очереди.
+        Задание захватывается условным UPDATE, поэтому одно задание не обработают дважды.
+        """
+        claimed = OrderImportJob.objects.filter(pk=job_id, status='queued').update(
+            status='parsing', started_at=timezone.now()
+        )
+        if not claimed:
+            return None
+
+        job = OrderImportJob.objects.select_related('order', 'created_by').get(pk=job_id)
+        try:
+            cls.process(job)
+        except Exception as e:
+            logger.exception(f"Ошибка обработки бланка заказа {job.order_id}")
+            cls._set_status(job, 'failed', error=str(e), finished_at=timezone.now())
+        return job
+
+    @classmethod
+    def process(cls, job):
+        """Разбор бланка, сравнение с текущими позициями и сохранение"""
+        order = job.order
+        # Задания, созданные до появления OrderImportJob.order_file, читают текущий файл заказа
+        order_file = job.order_file or order.order_file
+
+        with order_file.open('rb') as file:
+            positions = list(OrderProcessor.read_blank(file))
+        cls._set_status(job, 'diffing', positions=len(positions))
+
+        changeset = OrderDiffService.diff(order, positions) if job.is_update else None
+        cls._set_status(job, 'saving')
+
+        comment = None
+        with transaction.atomic():
+            if job.is_update:
+                kits = {'created': 0, 'unresolved': {}}
+                if changeset:
+                    OrderDiffService.apply(order, changeset)
+                    comment = changeset.render()
+                    OrderChangeHistory.objects.create(order=order, order_file=job.old_file,
+                                                      changed_by=job.created_by, comment=comment)
+                    kits = FurnitureKitImportService.build_kits(order, rebuild=changeset.furniture_changed())
+                    # Снятые с заказа позиции, новые количества и комплекты меняют резерв запущенных позиций.
+                    # Недостающее резервируется при следующем запуске, чтобы нехватка не срывала загрузку
+                    OrderReservationService.sync_orders([order.pk], job.created_by)
+            else:
+                OrderImportService.create_items(order, positions)
+                kits = FurnitureKitImportService.build_kits(order)
+
+            # Статус 'done' фиксируется вместе с позициями: прерванное задание можно безопасно повторить
+            cls._set_status(job, 'done', finished_at=timezone.now(),
+                            report={'furniture_kits': kits['created'], 'unresolved_furniture': kits['unresolved']})
+
+        if comment:
+            cls.write_comment(order_file, comment)
+
+    @staticmethod
+    def write_comment(order_file, comment):
+        """Запись комментария об изменениях в ячейку K3 обработанного файла заказа"""
+        try:
+            wb = load_workbook(order_file.path)
+            sheet = wb.active
+            sheet['K3'] = comment.replace('<br>', ' ')
+            wb.save(order_file.path)
+        except Exception as e:
+            logger.error(f"Ошибка при записи комментария в файл: {e}")
+
+    @classmethod
+    def requeue_stale(cls):
+        """
+        Возвращает в очередь задания, прерванные на середине: начаты раньше ORDER_IMPORT_STALE_MINUTES назад
+        и не завершены. Незафиксированное сохранение откатилось вместе с процессом. Возвращает число заданий
+        """
+        minutes = getattr(settings, 'ORDER_IMPORT_STALE_MINUTES', 10)
+        return OrderImportJob.objects.filter(
+            status__in=cls.IN_PROGRESS, started_at__lt=timezone.now() - timedelta(minutes=minutes),
+        ).update(status='queued')
+
+    @classmethod
+    def run_pending(cls, limit=None):
+        """
+        Синхронно обрабатывает задания из очереди, старые первыми, вместе с прерванными.
+        Возвращает число заданий
+        """
+        requeued = cls.requeue_stale()
+        if requeued:
+            logger.warning(f"Возвращено в очередь прерванных заданий загрузки бланков: {requeued}")
+        job_ids = OrderImportJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True)
+        if limit:
+            job_ids = job_ids[:limit]
+        return sum(1 for job_id in list(job_ids) if cls.run(job_id))
+
+    @staticmethod
+    def as_dict(job):
+        """Состояние задания для JSON-ответа"""
+        return {
+            'id': job.pk,
+            'order_id': job.order_id,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'positions': job.positions,
+            'finished': job.is_finished,
+            'error': job.error,
+            'report': job.report,
+        }
@@ -1,61 +1,114 @@
-import re
 from collections import Counter
+from contextlib import contextmanager
 from openpyxl import load_workbook
 from django.core.exceptions import ValidationError
 
+from erp_main.services.product_classifier import product_classifier
+
 
 class OrderProcessor:
     """Сервис для обработки заказов из файлов"""
 
-    @staticmethod
-    def validate_file_header(sheet):
-        """Проверка заголовка файла"""
-        return sheet.cell(row=1, column=3).value == "Бланк №"
+    FIRST_ROW = 8  # Первая строка с позициями в бланке
+    LAST_COLUMN = 15  # Последний столбец бланка (в нем же 'шт.' в строке итогов)
+    SEQ = [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 15, 7, 8]  # Последовательность чтения столбцов из бланка
 
     @staticmethod
-    def process_file_data(sheet):
-        """Обработка данных из файла Excel"""
-        cur_row, cur_column = 9, 15
-        while sheet.cell(row=cur_row, column=cur_column).value != 'шт.':
-            cur_row += 1
-        max_row = cur_row  # кол-во строк(позиций) в заказе
-
-        seq = [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 15, 7, 8]  # Последовательность чтения столбцов из бланка
-        positions = []  # Все позиции из заказа
-        line = []  # Текущая обрабатываемая позиция
-
-        for row in range(8, max_row):  # Цикл по строкам заказа
-            if sheet.cell(row=row, column=2).value:  # Если ячейка в столбце "Наименование" текущей строки не пустая
-                if line:  # Если список line не пустой
-                    positions.append(line)  # Добавляем список line в список positions
-                line = [sheet.cell(row=row, column=column).value for column in seq]
-            else:
-                line.extend([sheet.cell(row=row, column=7).value, sheet.cell(row=row, column=8).value])
+    def is_blank_header(values):
+        """Проверка заголовка по значениям первой строки"""
+        return len(values) >= 3 and values[2] == "Бланк №"
 
-        if line:
-            positions.append(line)
+    @classmethod
+    @contextmanager
+    def _blank_rows(cls, file):
+        """
+        Открывает бланк в режиме только для чтения и отдает итератор строк (кортежи значений) со второй строки.
+        ValidationError, если первая строка - не заголовок бланка.
+        """
+        wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(max_col=cls.LAST_COLUMN, values_only=True)
+            if not cls.is_blank_header(next(rows, ())):
+                raise ValidationError('Выберите правильный файл заказа')
+            yield rows
+        finally:
+            wb.close()
+
+    @classmethod
+    def check_blank(cls, file):
+        """
+        Быстрая проверка загружаемого файла: читается только первая строка, позиции разбирает
+        read_blank в задании загрузки. ValidationError, если файл не бланк.
+        """
+        try:
+            with cls._blank_rows(file):
+                pass
+        finally:
+            if hasattr(file, 'seek'):
+                file.seek(0)
+
+    @classmethod
+    def read_blank(cls, file):
+        """
+        Читает бланк заказа за один проход и отдает позиции по одной - единственный разбор бланка
+        для загрузки, обновления и пакетной загрузки заказов.
+        Заголовок проверяется при получении первой позиции: ValidationError, если файл не бланк.
+        """
+        with cls._blank_rows(file) as rows:
+            yield from cls.iter_positions(rows, first_row=2)
 
-        return positions
+    @classmethod
+    def parse_blank_file(cls, path):
+        """
+        read_blank для пакетной загрузки: (позиции, None) или (None, текст ошибки).
+        Не обращается к БД и возвращает только простые значения, поэтому может выполняться
+        в отдельном процессе (модуль не импортирует модели).
+        """
+        try:
+            positions = list(cls.read_blank(path))
+        except ValidationError as e:
+            return None, e.messages[0]
+        except Exception as e:
+            return None, f'Ошибка разбора файла: {e}'
+        if not positions:
+            return None, 'В бланке нет позиций'
+        return positions, None
+
+    @classmethod
+    def iter_positions(cls, rows, first_row=1):
+        """
+        Разбирает строки бланка (кортежи значений) на позиции.
+        rows - строки начиная с first_row, чтение идет до строки итогов со 'шт.'
+        """
+        line = None  # Текущая обрабатываемая позиция
+
+        for row_num, values in enumerate(rows, start=first_row):
+            if row_num < cls.FIRST_ROW:
+                continue
+            if len(values) < cls.LAST_COLUMN:
+                values = tuple(values) + (None,) * (cls.LAST_COLUMN - len(values))
+            if row_num > cls.FIRST_ROW and values[cls.LAST_COLUMN - 1] == 'шт.':
+                break
+
+            if values[1]:  # Если ячейка в столбце "Наименование" текущей строки не пустая
+                if line:
+                    yield line
+                line = [values[column - 1] for column in cls.SEQ]
+            elif line is not None:  # Строка с дополнительным стеклом текущей позиции
+                line.extend([values[6], values[7]])
+
+        if line:
+            yield line
 
     @staticmethod
     def get_product_kind(name):
         """Определение типа продукта"""
-        kind_mapping = {
-            'дверь': 'door', 'люк': 'hatch', 'ворота': 'gate',
-            'калитка': 'door', 'фрамуга': 'transom'
-        }
-        return next((value for key, value in kind_mapping.items()
-                     if re.search(key, name, re.IGNORECASE)), None)
+        return product_classifier.classify(name).kind
 
     @staticmethod
     def get_product_type(name):
         """Определение вида продукта"""
-        type_mapping = {
-            'ei-60': 'ei-60', 'eis-60': 'eis-60', 'eiws-60': 'eiws-60',
-            'тех': 'tech', 'ревиз': 'revision'
-        }
-        return next((value for key, value in type_mapping.items()
-                     if re.search(key, name, re.IGNORECASE)), None)
+        return product_classifier.classify(name).type
 
     @staticmethod
     def count_glass_data(glass_data):
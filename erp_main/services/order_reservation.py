@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Sum
+
+from erp_main.furniture import FurnitureKitLock, FurnitureKitHandle, FurnitureKitCylinder
+from erp_main.models import StockLedgerEntry, StockOperation
+from erp_main.services.warehouse import WarehouseService
+
+
+class OrderReservationService:
+    """
+    Резерв фурнитуры под заказ целиком, по статусам его позиций.
+    Комплекты позиций (строки комплекта x количество изделий) сворачиваются в агрегированный резерв,
+    который проводится одной операцией склада. Резерв и списание заказа считаются по складскому журналу,
+    поэтому sync() после любой смены статусов проводит только разницу:
+    запуск резервирует, отгрузка списывает зарезервированное, остановка, отмена и возврат в очередь снимают резерв.
+    Число запросов не зависит от количества позиций.
+    """
+
+    # (строка комплекта, поле элемента фурнитуры)
+    KIT_ROWS = (
+        (FurnitureKitLock, 'door_lock'),
+        (FurnitureKitHandle, 'door_handle'),
+        (FurnitureKitCylinder, 'lock_cylinder'),
+    )
+
+    # Позиции с этими статусами держат резерв, отгруженные - списывают его
+    RESERVED_STATUSES = ('product', 'ready')
+    CONSUMED_STATUSES = ('shipped',)
+
+    @staticmethod
+    def enabled():
+        """Резерв включается настройкой ORDER_FURNITURE_RESERVATION, когда остатки склада введены"""
+        return getattr(settings, 'ORDER_FURNITURE_RESERVATION', False)
+
+    @classmethod
+    def required(cls, order_id, statuses=RESERVED_STATUSES):
+        """
+        Фурнитура позиций заказа с указанными статусами: {модель: {pk: (наименование, количество)}}.
+        Один запрос на тип строк комплекта
+        """
+        required = {}
+        for row_model, item_field in cls.KIT_ROWS:
+            rows = (
+                row_model.objects
+                .filter(furniture_kit__order_item__order_id=order_id,
+                        furniture_kit__order_item__p_status__in=statuses)
+                .values(item_field, f'{item_field}__name')
+                .annotate(total=Sum(F('quantity') * F('furniture_kit__order_item__p_quantity')))
+                .values_list(item_field, f'{item_field}__name', 'total')
+            )
+            model = row_model._meta.get_field(item_field).related_model
+            for pk, name, total in rows:
+                if total and total > 0:
+                    required.setdefault(model, {})[pk] = (name, total)
+        return required
+
+    @staticmethod
+    def _journal(order_id, field, sign=1, **filters):
+        """Сумма изменений поля журнала по операциям заказа: {модель: {pk: количество}}"""
+        result = {}
+        rows = (
+            StockLedgerEntry.objects.filter(operation__order_id=order_id, **filters)
+            .values('content_type_id', 'object_id')
+            .annotate(total=Sum(field))
+            .values_list('content_type_id', 'object_id', 'total')
+        )
+        for content_type_id, object_id, total in rows:
+            if total:
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                result.setdefault(model, {})[object_id] = sign * total
+        return result
+
+    @classmethod
+    def reserved(cls, order_id):
+        """Текущий резерв заказа по журналу: {модель: {pk: количество}}"""
+        return cls._journal(order_id, 'reserved_delta')
+
+    @classmethod
+    def consumed(cls, order_id):
+        """Списанная под заказ фурнитура по журналу: {модель: {pk: количество}}"""
+        return cls._journal(order_id, 'stock_delta', sign=-1, operation__operation_type='consumption')
+
+    @staticmethod
+    def _lines(rows):
+        return [
+            {'item': model(pk=pk, name=name or f'#{pk}'), 'quantity': quantity}
+            for model, quantity_by_pk in rows.items()
+            for pk, (name, quantity) in quantity_by_pk.items()
+        ]
+
+    @classmethod
+    @transaction.atomic
+    def sync(cls, order_id, user, reserve=False, comment='резерв фурнитуры заказа'):
+        """
+        Приводит резерв заказа к текущим статусам позиций, не больше трех операций склада:
+        - фурнитура отгруженных позиций списывается из резерва заказа (списывается только зарезервированное);
+        - резерв сверх нужного позициям в работе (RESERVED_STATUSES) снимается;
+        - при reserve=True (позиции запущены в производство) недостающее резервируется.
+        При нехватке фурнитуры ValueError, ничего не меняется.
+        Возвращает (зарезервировано, снято, списано) в виде {модель: {pk: (наименование, количество)}}.
+        """
+        reserved = cls.reserved(order_id)
+        shipped = cls.required(order_id, cls.CONSUMED_STATUSES)
+        consumed = cls.consumed(order_id)
+
+        to_consume = {}
+        for model, rows in shipped.items():
+            for pk, (name, quantity) in rows.items():
+                have = reserved.get(model, {}).get(pk, 0)
+                quantity = min(quantity - consumed.get(model, {}).get(pk, 0), have)
+                if quantity > 0:
+                    to_consume.setdefault(model, {})[pk] = (name, quantity)
+                    reserved[model][pk] = have - quantity
+
+        required = cls.required(order_id)
+        to_reserve, to_release = {}, {}
+        for model in set(required) | set(reserved):
+            need, have = required.get(model, {}), reserved.get(model, {})
+            for pk in set(need) | set(have):
+                name, quantity = need.get(pk, (None, 0))
+                diff = quantity - have.get(pk, 0)
+                if diff > 0 and reserve:
+                    to_reserve.setdefault(model, {})[pk] = (name, diff)
+                elif diff < 0:
+                    to_release.setdefault(model, {})[pk] = (name, -diff)
+
+        if to_consume:
+            WarehouseService.consume_items(user, cls._lines(to_consume), comment=comment, order_id=order_id)
+        if to_release:
+            WarehouseService.cancel_reservation(user, cls._lines(to_release), comment=comment, order_id=order_id)
+        if to_reserve:
+            WarehouseService.reserve_items(user, cls._lines(to_reserve), comment=comment, order_id=order_id)
+        return to_reserve, to_release, to_consume
+
+    @classmethod
+    @transaction.atomic
+    def release_order(cls, order_id):
+        """
+        Снимает весь резерв заказа перед его удалением: после удаления операции заказа теряют order_id
+        и резерв уже нельзя сопоставить с заказом. Операция проводится от имени автора последней
+        операции заказа (в сигнале удаления пользователя нет).
+        """
+        rows = {}
+        for model, quantity_by_pk in cls.reserved(order_id).items():
+            for pk, quantity in quantity_by_pk.items():
+                if quantity > 0:
+                    rows.setdefault(model, {})[pk] = (None, quantity)
+        if not rows:
+            return rows
+        user = StockOperation.objects.filter(order_id=order_id).latest('created_at', 'pk').created_by
+        WarehouseService.cancel_reservation(user, cls._lines(rows), comment=f'снятие резерва: удален заказ №{order_id}',
+                                            order_id=order_id)
+        return rows
+
+    @classmethod
+    def sync_orders(cls, order_ids, user, reserve=False):
+        """sync() для заказов, позиции которых сменили статус; ничего не делает, если резерв выключен"""
+        if not cls.enabled():
+            return
+        for order_id in sorted(set(order_ids)):
+            cls.sync(order_id, user, reserve=reserve)
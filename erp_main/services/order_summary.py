@@ -0,0 +1,84 @@
+from django.db import transaction
+
+from erp_main.models import Order, OrderSummary
+from erp_main.services.alerts import OrderAlertService
+
+
+class OrderSummaryService:
+    """Сервис для поддержания сводок по заказам (OrderSummary) в актуальном состоянии"""
+
+    @staticmethod
+    def build(orders):
+        """
+        Считает сводки для переданных заказов одним запросом (без сохранения)
+        orders - QuerySet заказов
+        """
+        summaries = []
+        for order in orders.with_rollups().order_by():
+            summary = OrderSummary(order_id=order.pk)
+            for counter in OrderSummary.COUNTERS:
+                setattr(summary, counter, getattr(order, f'rollup_{counter}'))
+            summary.status = order.status
+            summary.workshop_icon = Order.workshop_icon_from_totals(
+                ws_1=summary.workshop_1,
+                ws_3=summary.workshop_3,
+                stopped=summary.workshop_2,
+            )
+            summaries.append(summary)
+        return summaries
+
+    @classmethod
+    def refresh(cls, order_ids):
+        """
+        Пересчитывает сводки указанных заказов: один запрос на агрегацию и один на запись.
+        order_ids - список id или QuerySet вида OrderItem.objects.filter(...).values('order_id')
+        """
+        summaries = cls.build(Order.objects.filter(pk__in=order_ids))
+        if summaries:
+            OrderSummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['order'],
+                update_fields=OrderSummary.COUNTERS + ['status', 'workshop_icon', 'updated_at'],
+            )
+            # Статус заказа мог измениться - список просроченных заказов устарел.
+            # Сброс после коммита: иначе параллельный запрос закэширует уведомления по старым данным
+            transaction.on_commit(OrderAlertService.invalidate)
+        return summaries
+
+    @classmethod
+    def rebuild(cls, batch_size=500):
+        """Полный пересчет сводок по всем заказам. Возвращает количество заказов"""
+        order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+        OrderSummary.objects.exclude(order_id__in=Order.objects.values('pk')).delete()
+        for start in range(0, len(order_ids), batch_size):
+            cls.refresh(order_ids[start:start + batch_size])
+        return len(order_ids)
+
+    @classmethod
+    def diff(cls, batch_size=500):
+        """
+        Сравнивает сохраненные сводки с пересчитанными.
+        Возвращает список (order_id, {поле: (сохранено, должно быть)})
+        """
+        mismatches = []
+        order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+        fields = OrderSummary.COUNTERS + ['status', 'workshop_icon']
+
+        for start in range(0, len(order_ids), batch_size):
+            batch = order_ids[start:start + batch_size]
+            stored = OrderSummary.objects.in_bulk(batch)
+            for expected in cls.build(Order.objects.filter(pk__in=batch)):
+                current = stored.get(expected.order_id)
+                if current is None:
+                    mismatches.append((expected.order_id, {'summary': (None, 'missing')}))
+                    continue
+                changed = {
+                    field: (getattr(current, field), getattr(expected, field))
+                    for field in fields
+                    if getattr(current, field) != getattr(expected, field)
+                }
+                if changed:
+                    mismatches.append((expected.order_id, changed))
+
+        return mismatches
@@ -0,0 +1,155 @@
+import re
+
+from django.db.models import Q
+
+
+class OrganizationIdentifiers:
+    """
+    Реестр идентификаторов контрагентов: (вид, нормализованное значение) -> контрагент.
+    Заполняется при сохранении юрлица, ИП или физлица; поиск по ИНН, ОГРН, КПП+ИНН, телефону
+    и e-mail - одно обращение к индексу (kind, value) вместо запросов к таблице каждого подтипа.
+    """
+
+    INN = 'inn'
+    OGRN = 'ogrn'
+    KPP_INN = 'kpp_inn'
+    PHONE = 'phone'
+    EMAIL = 'email'
+
+    KINDS = [
+        (INN, 'ИНН'),
+        (OGRN, 'ОГРН/ОГРНИП'),
+        (KPP_INN, 'ИНН и КПП'),
+        (PHONE, 'Телефон'),
+        (EMAIL, 'E-mail'),
+    ]
+
+    # Совпадение по этим видам считается дубликатом контрагента; e-mail бывает общим
+    DUPLICATE_KINDS = (INN, OGRN, KPP_INN, PHONE)
+
+    # Модель подтипа: виды идентификаторов
+    FIELDS = {
+        'LegalEntity': (INN, OGRN, KPP_INN, EMAIL),
+        'IndividualEntrepreneur': (INN, OGRN, EMAIL),
+        'PhysicalPerson': (PHONE, EMAIL),
+    }
+
+    BATCH_SIZE = 1000
+
+    @classmethod
+    def normalize(cls, kind, value):
+        """Нормализованное значение идентификатора или None, если оно пустое"""
+        if value is None:
+            return None
+        value = str(value).strip()
+        if kind == cls.EMAIL:
+            return value.lower() or None
+        if kind == cls.KPP_INN:
+            inn, _, kpp = value.partition(':')
+            inn, kpp = re.sub(r'\D', '', inn), re.sub(r'\D', '', kpp)
+            return f'{inn}:{kpp}' if inn and kpp else None
+
+        digits = re.sub(r'\D', '', value)
+        if kind == cls.PHONE:
+            # Российские номера приводятся к виду 7XXXXXXXXXX
+            if len(digits) == 11 and digits.startswith('8'):
+                digits = '7' + digits[1:]
+            elif len(digits) == 10:
+                digits = '7' + digits
+        return digits or None
+
+    @classmethod
+    def values(cls, model_name, fields):
+        """
+        Идентификаторы подтипа по значениям его полей: {(вид, значение)}.
+        fields - словарь полей (cleaned_data формы) или функция name -> значение.
+        """
+        get = fields if callable(fields) else fields.get
+        result = set()
+        for kind in cls.FIELDS.get(model_name, ()):
+            if kind == cls.KPP_INN:
+                raw = f"{get('inn') or ''}:{get('kpp') or ''}"
+            else:
+                raw = get(kind)
+            value = cls.normalize(kind, raw)
+            if value:
+                result.add((kind, value))
+        return result
+
+    @classmethod
+    def identifiers(cls, obj):
+        """Идентификаторы экземпляра подтипа; None для базового Organization. Работает с историческими моделями"""
+        if obj._meta.object_name not in cls.FIELDS:
+            return None
+        return cls.values(obj._meta.object_name, lambda name: getattr(obj, name, None))
+
+    @staticmethod
+    def _model():
+        from erp_main.models import OrganizationIdentifier
+        return OrganizationIdentifier
+
+    @classmethod
+    def sync(cls, organization):
+        """Приводит записи реестра контрагента к его текущим полям: чтение и запись только изменившегося"""
+        expected = cls.identifiers(organization)
+        if expected is None:
+            return
+        model = cls._model()
+        rows = model.objects.filter(organization_id=organization.pk)
+        existing = {(kind, value): pk for pk, kind, value in rows.values_list('pk', 'kind', 'value')}
+
+        stale = [pk for key, pk in existing.items() if key not in expected]
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+        model.objects.bulk_create([
+            model(organization_id=organization.pk, kind=kind, value=value)
+            for kind, value in expected - set(existing)
+        ])
+
+    @classmethod
+    def find(cls, kind, value):
+        """Контрагенты с идентификатором: QuerySet Organization (один индексный поиск)"""
+        from erp_main.models import Organization
+        value = cls.normalize(kind, value)
+        if not value:
+            return Organization.objects.none()
+        return Organization.objects.filter(identifiers__kind=kind, identifiers__value=value)
+
+    @classmethod
+    def resolve(cls, kind, values):
+        """
+        Массовое сопоставление, например ИНН из банковской выписки: {исходное значение: [id контрагентов]}.
+        Значения без совпадений в результат не попадают. Один запрос на BATCH_SIZE значений.
+        """
+        by_value = {}
+        for raw in values:
+            value = cls.normalize(kind, raw)
+            if value:
+                by_value.setdefault(value, []).append(raw)
+
+        result = {}
+        normalized = list(by_value)
+        rows = cls._model().objects.filter(kind=kind)
+        for start in range(0, len(normalized), cls.BATCH_SIZE):
+            batch = normalized[start:start + cls.BATCH_SIZE]
+            for value, organization_id in rows.filter(value__in=batch).values_list('value', 'organization_id'):
+                for raw in by_value[value]:
+                    result.setdefault(raw, []).append(organization_id)
+        return result
+
+    @classmethod
+    def duplicates(cls, identifiers, exclude=None, kinds=DUPLICATE_KINDS):
+        """
+        Контрагенты с теми же идентификаторами одним запросом: [(вид, значение, id контрагента)].
+        exclude - id проверяемого контрагента при редактировании.
+        """
+        condition = Q()
+        for kind, value in identifiers:
+            if kind in kinds:
+                condition |= Q(kind=kind, value=value)
+        if not condition:
+            return []
+        rows = cls._model().objects.filter(condition)
+        if exclude:
+            rows = rows.exclude(organization_id=exclude)
+        return list(rows.order_by('kind', 'organization_id').values_list('kind', 'value', 'organization_id'))
@@ -0,0 +1,163 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from erp_main.services.organization_identifiers import OrganizationIdentifiers
+
+
+class OrganizationSearch:
+    """
+    Общий поиск контрагентов по денормализованному столбцу Organization.search_text.
+
+    search_text заполняется при сохранении юрлица, ИП или физлица из полей ниже и индексируется
+    полнотекстовым индексом: FULLTEXT на MySQL, FTS5-таблица с триггерами на SQLite.
+    Слова запроса ищутся через индекс по началу слова. Числа (ИНН, ОГРН, КПП, телефон) ищутся
+    подстрокой, как в прежнем поиске по icontains: полнотекстовый индекс находит только начало слова.
+    Если индекса нет или слово короче минимальной длины токена MySQL, используется LIKE по search_text.
+    Телефон индексируется в нормализованном виде OrganizationIdentifiers (7XXXXXXXXXX)
+    и десятью цифрами без кода страны.
+    """
+
+    TABLE = 'erp_main_organization'
+    FTS_TABLE = 'erp_main_organization_fts'
+    FULLTEXT_INDEX = 'erp_main_organization_search_text_ft'
+
+    # innodb_ft_min_token_size по умолчанию
+    MYSQL_MIN_TOKEN = 3
+
+    # Модель подтипа: (поле наименования, поля для поиска)
+    FIELDS = {
+        'LegalEntity': ('name', ('name', 'inn', 'ogrn', 'kpp', 'leader_name', 'email')),
+        'IndividualEntrepreneur': ('full_name', ('full_name', 'inn', 'ogrn', 'email')),
+        'PhysicalPerson': ('full_name', ('full_name', 'phone', 'email')),
+    }
+
+    _fts_available = {}
+
+    @staticmethod
+    def normalize(text):
+        return ' '.join(str(text).lower().replace('ё', 'е').split())
+
+    @classmethod
+    def tokens(cls, query):
+        """Слова запроса; номер телефона с 8 приводится к виду 7XXXXXXXXXX, как в индексе"""
+        return [
+            '7' + token[1:] if token.isdigit() and len(token) == 11 and token.startswith('8') else token
+            for token in re.findall(r'\w+', cls.normalize(query))
+        ]
+
+    @staticmethod
+    def phone_forms(phone):
+        """Формы телефона для индекса: 7XXXXXXXXXX и 10 цифр без кода страны"""
+        normalized = OrganizationIdentifiers.normalize(OrganizationIdentifiers.PHONE, phone)
+        if not normalized:
+            return []
+        if len(normalized) == 11 and normalized.startswith('7'):
+            return [normalized, normalized[1:]]
+        return [normalized]
+
+    @classmethod
+    def columns(cls, obj):
+        """
+        (display_name, search_text) для экземпляра подтипа или None для базового Organization.
+        Работает и с историческими моделями миграций.
+        """
+        if obj._meta.object_name not in cls.FIELDS:
+            return None
+        name_field, fields = cls.FIELDS[obj._meta.object_name]
+        values = [getattr(obj, field, None) for field in fields]
+        # Телефон дополнительно индексируется цифрами в нормализованном виде
+        if 'phone' in fields and obj.phone:
+            values.extend(cls.phone_forms(obj.phone))
+        search_text = cls.normalize(' '.join(str(value) for value in values if value))
+        return (getattr(obj, name_field, None) or '')[:255], search_text
+
+    @classmethod
+    def fts_available(cls, using):
+        """Есть ли FTS5-таблица (SQLite): проверяется один раз на процесс"""
+        if using not in cls._fts_available:
+            cls._fts_available[using] = cls.FTS_TABLE in connections[using].introspection.table_names()
+        return cls._fts_available[using]
+
+    @classmethod
+    def condition(cls, query, using='default'):
+        """Q-условие по pk контрагента для запроса query"""
+        terms = cls.tokens(query)
+        if not terms:
+            return Q()
+
+        # Числа - подстрокой по search_text, слова - через полнотекстовый индекс
+        condition = Q()
+        for term in terms:
+            if term.isdigit():
+                condition &= Q(search_text__contains=term)
+        words = [term for term in terms if not term.isdigit()]
+
+        vendor = connections[using].vendor
+        if words and vendor == 'mysql' and all(len(term) >= cls.MYSQL_MIN_TOKEN for term in words):
+            return condition & Q(pk__in=RawSQL(
+                f'SELECT id FROM {cls.TABLE} WHERE MATCH(search_text) AGAINST (%s IN BOOLEAN MODE)',
+                [' '.join(f'+{term}*' for term in words)],
+            ))
+        if words and vendor == 'sqlite' and cls.fts_available(using):
+            return condition & Q(pk__in=RawSQL(
+                f'SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s',
+                [' '.join(f'"{term}"*' for term in words)],
+            ))
+
+        for term in words:
+            condition &= Q(search_text__contains=term)
+        return condition
+
+    @classmethod
+    def install_index(cls, connection):
+        """
+        Создает полнотекстовый индекс, если его нет. На SQLite пересоздает триггеры FTS5
+        (Django удаляет их при пересборке таблицы в миграциях) и перестраивает индекс.
+        """
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COUNT(*) FROM information_schema.statistics '
+                    'WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s',
+                    [cls.TABLE, cls.FULLTEXT_INDEX],
+                )
+                if not cursor.fetchone()[0]:
+                    cursor.execute(f'ALTER TABLE {cls.TABLE} ADD FULLTEXT INDEX {cls.FULLTEXT_INDEX} (search_text)')
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {cls.FTS_TABLE} "
+                    f"USING fts5(search_text, content='{cls.TABLE}', content_rowid='id')"
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {cls.FTS_TABLE}_ai AFTER INSERT ON {cls.TABLE} BEGIN '
+                    f'INSERT INTO {cls.FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END'
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {cls.FTS_TABLE}_ad AFTER DELETE ON {cls.TABLE} BEGIN '
+                    f"INSERT INTO {cls.FTS_TABLE}({cls.FTS_TABLE}, rowid, search_text) "
+                    f"VALUES ('delete', old.id, old.search_text); END"
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {cls.FTS_TABLE}_au AFTER UPDATE OF search_text ON {cls.TABLE} BEGIN '
+                    f"INSERT INTO {cls.FTS_TABLE}({cls.FTS_TABLE}, rowid, search_text) "
+                    f"VALUES ('delete', old.id, old.search_text); "
+                    f'INSERT INTO {cls.FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END'
+                )
+                cursor.execute(f"INSERT INTO {cls.FTS_TABLE}({cls.FTS_TABLE}) VALUES ('rebuild')")
+        cls._fts_available.pop(connection.alias, None)
+
+    @classmethod
+    def drop_index(cls, connection):
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {cls.TABLE} DROP INDEX {cls.FULLTEXT_INDEX}')
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {cls.FTS_TABLE}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {cls.FTS_TABLE}')
+        cls._fts_available.pop(connection.alias, None)
@@ -0,0 +1,170 @@
+import re
+
+from django.db import connections
+from django.db.models import Count
+
+
+class OrganizationSimilarity:
+    """
+    Поиск похожих контрагентов по триграммам нормализованного наименования.
+
+    Наименование (Organization.display_name: название юрлица, ФИО ИП или физлица) приводится к нижнему
+    регистру, из него убираются кавычки, знаки и организационно-правовые формы, после чего каждое слово
+    раскладывается на триграммы. Набор триграмм не зависит от порядка слов, поэтому "ООО Ромашка" и
+    "Ромашка ООО" совпадают полностью. Триграммы хранятся в индексированной таблице OrganizationNameTrigram,
+    схожесть - коэффициент Жаккара наборов триграмм.
+    """
+
+    STOP_WORDS = {'ооо', 'оао', 'зао', 'пао', 'ао', 'ип', 'нко', 'чп', 'llc', 'ltd'}
+
+    THRESHOLD = 0.5
+    # Триграммы, встречающиеся чаще, не используются для подбора пар в отчете о дубликатах
+    MAX_POSTINGS = 500
+    BATCH_SIZE = 1000
+
+    @classmethod
+    def normalize(cls, name):
+        words = re.findall(r'\w+', str(name or '').lower().replace('ё', 'е'))
+        return ' '.join(word for word in words if word not in cls.STOP_WORDS)
+
+    @classmethod
+    def trigrams(cls, name):
+        """Набор триграмм наименования; слово дополняется пробелами, как в pg_trgm"""
+        result = set()
+        for word in cls.normalize(name).split():
+            padded = f'  {word} '
+            result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return result
+
+    @staticmethod
+    def jaccard(first, second):
+        if not first or not second:
+            return 0.0
+        shared = len(first & second)
+        return shared / (len(first) + len(second) - shared)
+
+    @staticmethod
+    def _model():
+        from erp_main.models import OrganizationNameTrigram
+        return OrganizationNameTrigram
+
+    @classmethod
+    def sync(cls, organization):
+        """Приводит триграммы контрагента к его текущему display_name, пишутся только изменения"""
+        if organization._meta.model_name == 'organization':
+            return
+        model = cls._model()
+        expected = cls.trigrams(organization.display_name)
+        rows = model.objects.filter(organization_id=organization.pk)
+        existing = {trigram: pk for pk, trigram in rows.values_list('pk', 'trigram')}
+
+        stale = [pk for trigram, pk in existing.items() if trigram not in expected]
+        if stale:
+            model.objects.filter(pk__in=stale).delete()
+        model.objects.bulk_create([
+            model(organization_id=organization.pk, trigram=trigram)
+            for trigram in expected - set(existing)
+        ])
+
+    @classmethod
+    def _trigram_sets(cls, organization_ids):
+        """{id контрагента: набор триграмм}, один запрос на BATCH_SIZE контрагентов"""
+        organization_ids = list(organization_ids)
+        result = {}
+        rows = cls._model().objects.all()
+        for start in range(0, len(organization_ids), cls.BATCH_SIZE):
+            batch = organization_ids[start:start + cls.BATCH_SIZE]
+            for organization_id, trigram in rows.filter(organization_id__in=batch).values_list(
+                    'organization_id', 'trigram'):
+                result.setdefault(organization_id, set()).add(trigram)
+        return result
+
+    @classmethod
+    def similar(cls, name, exclude=None, threshold=THRESHOLD, limit=10, max_postings=MAX_POSTINGS):
+        """
+        Контрагенты с похожим наименованием: [(id, схожесть)] по убыванию схожести.
+        Кандидаты подбираются по индексу триграмм без частых триграмм (больше max_postings контрагентов,
+        как в candidate_pairs), точная схожесть считается для всех кандидатов: отбор по числу общих
+        триграмм до расчета схожести мог бы отбросить короткие наименования с большей схожестью.
+        """
+        trigrams = cls.trigrams(name)
+        if not trigrams:
+            return []
+        rows = cls._model().objects
+        frequent = set(
+            rows.filter(trigram__in=trigrams)
+            .values('trigram')
+            .annotate(postings=Count('id'))
+            .filter(postings__gt=max_postings)
+            .values_list('trigram', flat=True)
+        )
+        rare = trigrams - frequent
+        if not rare:
+            return []
+        # При схожести не ниже threshold общих триграмм не меньше threshold * len(trigrams),
+        # из них частыми могут быть не больше len(frequent)
+        min_shared = max(1, int(threshold * len(trigrams)) - len(frequent))
+        candidates = (
+            rows.filter(trigram__in=rare)
+            .values('organization_id')
+            .annotate(shared=Count('id'))
+            .filter(shared__gte=min_shared)
+            .values_list('organization_id', flat=True)
+        )
+        if exclude:
+            candidates = candidates.exclude(organization_id=exclude)
+
+        scored = []
+        for organization_id, other in cls._trigram_sets(candidates).items():
+            score = cls.jaccard(trigrams, other)
+            if score >= threshold:
+                scored.append((organization_id, score))
+        scored.sort(key=lambda row: (-row[1], row[0]))
+        return scored[:limit]
+
+    @classmethod
+    def candidate_pairs(cls, using='default', min_shared=2, max_postings=MAX_POSTINGS):
+        """
+        Пары контрагентов с общими триграммами одним запросом (самосоединение по индексу триграмм).
+        Частые триграммы (больше max_postings контрагентов) пропускаются, поэтому число сравнений
+        растет с числом действительно похожих пар, а не как n^2.
+        """
+        table = cls._model()._meta.db_table
+        sql = (
+            f'SELECT a.organization_id, b.organization_id FROM {table} a '
+            f'JOIN {table} b ON b.trigram = a.trigram AND b.organization_id > a.organization_id '
+            f'WHERE a.trigram NOT IN ('
+            f'    SELECT trigram FROM {table} GROUP BY trigram HAVING COUNT(*) > %s'
+            f') '
+            f'GROUP BY a.organization_id, b.organization_id HAVING COUNT(*) >= %s'
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, [max_postings, min_shared])
+            return cursor.fetchall()
+
+    @classmethod
+    def clusters(cls, threshold=THRESHOLD, using='default', max_postings=MAX_POSTINGS):
+        """
+        Группы возможных дубликатов по всей базе: [[id, ...], ...] - списки id контрагентов,
+        связанных цепочкой пар со схожестью не ниже threshold.
+        """
+        pairs = cls.candidate_pairs(using=using, max_postings=max_postings)
+        sets = cls._trigram_sets({pk for pair in pairs for pk in pair})
+
+        parent = {}
+
+        def find(pk):
+            root = pk
+            while parent.get(root, root) != root:
+                root = parent[root]
+            parent[pk] = root
+            return root
+
+        for first, second in pairs:
+            if cls.jaccard(sets.get(first, set()), sets.get(second, set())) >= threshold:
+                parent[find(first)] = find(second)
+
+        groups = {}
+        for pk in parent:
+            groups.setdefault(find(pk), []).append(pk)
+        return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: group[0])
@@ -0,0 +1,78 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class ProductClass(NamedTuple):
+    """Результат классификации наименования изделия"""
+    kind: str
+    type: str
+    construction: str
+    matched: tuple  # Сработавшие правила: ((измерение, шаблон), ...)
+
+
+class ProductClassifier:
+    """
+    Определение вида, типа и конструктива изделия по наименованию из бланка.
+    Правила каждого измерения собраны в одно регулярное выражение. При нескольких совпадениях
+    побеждает правило, стоящее раньше в таблице, как и при прежнем поиске по словарю.
+    Результаты кэшируются по исходному наименованию: в бланке наименования сильно повторяются.
+    """
+
+    # (шаблон, значение) в порядке приоритета
+    KIND_RULES = (
+        ('дверь', 'door'),
+        ('люк', 'hatch'),
+        ('ворота', 'gate'),
+        ('калитка', 'door'),
+        ('фрамуга', 'transom'),
+    )
+    TYPE_RULES = (
+        ('ei-60', 'ei-60'),
+        ('eis-60', 'eis-60'),
+        ('eiws-60', 'eiws-60'),
+        ('тех', 'tech'),
+        ('ревиз', 'revision'),
+    )
+    CONSTRUCTION_RULES = (
+        ('-м', 'NK'),
+    )
+    DEFAULT_CONSTRUCTION = 'SK'
+
+    def __init__(self, kind_rules=None, type_rules=None, construction_rules=None, cache_size=4096):
+        self.dimensions = [
+            ('kind', self._compile(kind_rules or self.KIND_RULES), None),
+            ('type', self._compile(type_rules or self.TYPE_RULES), None),
+            ('construction', self._compile(construction_rules or self.CONSTRUCTION_RULES),
+             self.DEFAULT_CONSTRUCTION),
+        ]
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def _compile(rules):
+        """
+        Одно выражение на измерение: (?=(?P<r0>...)|(?P<r1>...)|...).
+        Просмотр вперед находит совпадения во всех позициях строки, в том числе перекрывающиеся.
+        """
+        alternation = '|'.join(f'(?P<r{index}>{re.escape(pattern)})' for index, (pattern, _) in enumerate(rules))
+        return re.compile(f'(?=(?:{alternation}))', re.IGNORECASE), tuple(rules)
+
+    def _classify(self, name):
+        name = str(name or '')
+        values, matched = [], []
+
+        for dimension, (regex, rules), default in self.dimensions:
+            indexes = sorted({int(match.lastgroup[1:]) for match in regex.finditer(name)})
+            matched.extend((dimension, rules[index][0]) for index in indexes)
+            values.append(rules[indexes[0]][1] if indexes else default)
+
+        return ProductClass(*values, matched=tuple(matched))
+
+    def cache_info(self):
+        return self.classify.cache_info()
+
+    def cache_clear(self):
+        self.classify.cache_clear()
+
+
+product_classifier = ProductClassifier()
@@ -0,0 +1,116 @@
+import io
+
+from django.db import connections
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value, CharField
+from django.db.models.functions import Cast, Coalesce
+
+from openpyxl import Workbook
+
+from erp_main.services.order_reservation import OrderReservationService
+from erp_main.services.stock_ledger import StockLedgerService
+
+
+class ReorderReportService:
+    """
+    Отчет "что нужно закупить" по всем моделям фурнитуры, рассчитанный в БД.
+    Для каждой таблицы фурнитуры считаются доступный остаток (остаток - резерв), количество,
+    уже заложенное в комплекты заказов в очереди, и нехватка до минимального запаса;
+    таблицы объединяются через UNION ALL, в память попадают только строки с нехваткой.
+    Позиция попадает в отчет при нехватке >= 0, то есть как в BaseFurnitureItem.needs_reorder():
+    доступный остаток за вычетом заложенного в заказы не выше минимального запаса.
+    """
+
+    COLUMNS = [
+        'kind', 'id', 'name', 'code', 'vendor_number', 'supplier', 'purchase_price',
+        'quantity_in_stock', 'reserved_quantity', 'available', 'committed', 'min_stock', 'shortfall',
+    ]
+
+    # Заголовки XLSX в порядке COLUMNS
+    HEADERS = [
+        'Вид', 'id', 'Наименование', 'Код', 'Артикул', 'Поставщик', 'Закупочная цена',
+        'На складе', 'Зарезервировано', 'Доступно', 'В заказах в очереди', 'Минимальный запас', 'Нехватка',
+    ]
+
+    # Статус позиций, фурнитура которых уже заложена, но еще не зарезервирована
+    COMMITTED_STATUS = 'in_query'
+
+    @classmethod
+    def _committed(cls, model):
+        """Количество в комплектах позиций в очереди: подзапрос по строкам комплектов или 0"""
+        for row_model, item_field in OrderReservationService.KIT_ROWS:
+            if row_model._meta.get_field(item_field).related_model is model:
+                rows = (
+                    row_model.objects
+                    .filter(**{item_field: OuterRef('pk')},
+                            furniture_kit__order_item__p_status=cls.COMMITTED_STATUS)
+                    .values(item_field)
+                    .annotate(total=Sum(F('quantity') * F('furniture_kit__order_item__p_quantity')))
+                    .values('total')
+                )
+                return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+        return Value(0, output_field=IntegerField())
+
+    @classmethod
+    def _model_queryset(cls, model):
+        # Беззнаковые поля MySQL приводятся к знаковым, чтобы разность не выходила за диапазон
+        available = Cast('quantity_in_stock', IntegerField()) - Cast('reserved_quantity', IntegerField())
+        return (
+            model.objects
+            .annotate(
+                kind=Value(str(model._meta.verbose_name), output_field=CharField()),
+                available=available,
+                committed=cls._committed(model),
+            )
+            .annotate(shortfall=Cast('min_stock', IntegerField()) - F('available') + F('committed'))
+            .filter(shortfall__gte=0)
+            .values(*cls.COLUMNS)
+        )
+
+    @classmethod
+    def queryset(cls, supplier=None):
+        """UNION ALL по всем моделям фурнитуры, упорядоченный по поставщику и нехватке"""
+        querysets = [cls._model_queryset(model) for model in StockLedgerService.stock_models()]
+        if supplier:
+            querysets = [qs.filter(supplier=supplier) for qs in querysets]
+        first, *rest = querysets
+        return first.union(*rest, all=True).order_by('supplier', '-shortfall', 'name')
+
+    @classmethod
+    def supplier_totals(cls):
+        """
+        Итоги по поставщикам одним запросом поверх UNION:
+        [{'supplier', 'items', 'shortfall', 'amount'}], amount - нехватка по закупочной цене
+        """
+        qs = cls.queryset().order_by()
+        sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+        with connections[qs.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT report.supplier, COUNT(*), SUM(report.shortfall), '
+                f'SUM(report.shortfall * COALESCE(report.purchase_price, 0)) '
+                f'FROM ({sql}) report GROUP BY report.supplier ORDER BY report.supplier',
+                params,
+            )
+            return [
+                {'supplier': supplier, 'items': items, 'shortfall': shortfall, 'amount': amount}
+                for supplier, items, shortfall, amount in cursor.fetchall()
+            ]
+
+    @classmethod
+    def export_xlsx(cls, supplier=None):
+        """XLSX: лист с позициями отчета и лист итогов по поставщикам. Строки читаются из БД потоком"""
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Закупка')
+        sheet.append(cls.HEADERS)
+        for row in cls.queryset(supplier).iterator(chunk_size=2000):
+            sheet.append([row[column] for column in cls.COLUMNS])
+
+        totals = workbook.create_sheet('По поставщикам')
+        totals.append(['Поставщик', 'Позиций', 'Нехватка, шт.', 'Сумма по закупочной цене'])
+        for row in cls.supplier_totals():
+            if supplier and row['supplier'] != supplier:
+                continue
+            totals.append([row['supplier'] or 'не указан', row['items'], row['shortfall'], row['amount']])
+
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        return buffer
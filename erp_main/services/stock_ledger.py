@@ -0,0 +1,179 @@
+from datetime import datetime, time, timedelta
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from erp_main.furniture import BaseFurnitureItem
+from erp_main.models import StockLedgerEntry, StockOperation, StockSnapshot
+
+
+class StockLedgerService:
+    """
+    Складской журнал и ежедневные снимки остатков.
+
+    Каждая операция склада добавляет в журнал знаковые изменения остатка и резерва. Снимок на дату
+    хранит итог журнала на конец дня по каждому товару, поэтому остаток на любой момент - это
+    последний снимок до него плюс записи журнала после снимка, а не перебор всей истории.
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def stock_models():
+        """Модели товаров со складскими счетчиками"""
+        return [model for model in apps.get_app_config('erp_main').get_models()
+                if issubclass(model, BaseFurnitureItem)]
+
+    @staticmethod
+    def end_of_day(day):
+        """Начало следующего дня в текущем часовом поясе: граница снимка на дату day"""
+        return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+    @classmethod
+    def record(cls, operation, deltas):
+        """
+        Записывает изменения операции одним bulk_create.
+        deltas = {модель: {pk: (изменение остатка, изменение резерва)}}
+        """
+        content_types = ContentType.objects.get_for_models(*deltas)
+        StockLedgerEntry.objects.bulk_create([
+            StockLedgerEntry(
+                operation=operation,
+                content_type=content_types[model],
+                object_id=pk,
+                stock_delta=stock_delta,
+                reserved_delta=reserved_delta,
+                created_at=operation.created_at,
+            )
+            for model, rows in deltas.items()
+            for pk, (stock_delta, reserved_delta) in rows.items()
+            if stock_delta or reserved_delta
+        ], batch_size=cls.BATCH_SIZE)
+
+    @classmethod
+    def balances(cls, at=None, **filters):
+        """
+        Остатки по журналу на момент at (по умолчанию - сейчас): {(content_type_id, object_id): [остаток, резерв]}.
+        Берется последний снимок до даты at и добавляются записи журнала после него: два запроса.
+        filters ограничивают товары (content_type, object_id и т.п.).
+        """
+        at = at or timezone.now()
+        base_date = StockSnapshot.objects.filter(
+            date__lt=timezone.localdate(at), **filters
+        ).aggregate(date=Max('date'))['date']
+
+        result = {}
+        entries = StockLedgerEntry.objects.filter(created_at__lte=at, **filters)
+        if base_date is not None:
+            snapshots = StockSnapshot.objects.filter(date=base_date, **filters)
+            for key in snapshots.values_list('content_type_id', 'object_id', 'quantity_in_stock', 'reserved_quantity'):
+                result[key[:2]] = list(key[2:])
+            entries = entries.filter(created_at__gte=cls.end_of_day(base_date))
+
+        totals = entries.values('content_type_id', 'object_id').annotate(
+            stock=Sum('stock_delta'), reserved=Sum('reserved_delta'),
+        ).values_list('content_type_id', 'object_id', 'stock', 'reserved')
+        for content_type_id, object_id, stock, reserved in totals:
+            row = result.setdefault((content_type_id, object_id), [0, 0])
+            row[0] += stock
+            row[1] += reserved
+        return result
+
+    @classmethod
+    def balance(cls, item, at=None):
+        """Остаток и резерв товара на момент at: (остаток, резерв)"""
+        content_type = ContentType.objects.get_for_model(item)
+        balances = cls.balances(at, content_type=content_type, object_id=item.pk)
+        return tuple(balances.get((content_type.pk, item.pk), (0, 0)))
+
+    @classmethod
+    @transaction.atomic
+    def take_snapshot(cls, day):
+        """
+        Снимок на конец дня day по всем товарам из журнала. Строится от предыдущего снимка,
+        повторный вызов для той же даты пересчитывает его. Возвращает число строк снимка.
+        """
+        if day >= timezone.localdate():
+            raise ValueError(f"Снимок можно построить только за завершенный день, указано: {day}")
+
+        balances = cls.balances(cls.end_of_day(day) - timedelta(microseconds=1))
+        StockSnapshot.objects.filter(date=day).delete()
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                date=day,
+                quantity_in_stock=stock,
+                reserved_quantity=reserved,
+            )
+            for (content_type_id, object_id), (stock, reserved) in balances.items()
+        ], batch_size=cls.BATCH_SIZE)
+        return len(balances)
+
+    @classmethod
+    def take_snapshots(cls, until=None):
+        """
+        Снимки за все дни после последнего снимка до until включительно (по умолчанию - вчера).
+        Возвращает список (дата, строк).
+        """
+        until = until or timezone.localdate() - timedelta(days=1)
+        last = StockSnapshot.objects.aggregate(date=Max('date'))['date']
+        if last is not None:
+            day = last + timedelta(days=1)
+        else:
+            first = StockLedgerEntry.objects.aggregate(created_at=Min('created_at'))['created_at']
+            if first is None:
+                return []
+            day = timezone.localdate(first)
+
+        taken = []
+        while day <= until:
+            taken.append((day, cls.take_snapshot(day)))
+            day += timedelta(days=1)
+        return taken
+
+    @classmethod
+    def reconcile(cls):
+        """
+        Сверка журнала со счетчиками товаров за один проход: итоги журнала (последний снимок и записи после него)
+        и по одному запросу счетчиков на модель. Возвращает расхождения
+        [(модель, pk, наименование, (остаток, резерв) по счетчикам, (остаток, резерв) по журналу)].
+        """
+        ledger = cls.balances()
+        models = cls.stock_models()
+        content_types = ContentType.objects.get_for_models(*models)
+        discrepancies = []
+        for model in models:
+            content_type_id = content_types[model].pk
+            counters = model.objects.values_list('pk', 'name', 'quantity_in_stock', 'reserved_quantity')
+            for pk, name, stock, reserved in counters.iterator(chunk_size=2000):
+                journal = tuple(ledger.pop((content_type_id, pk), (0, 0)))
+                if journal != (stock, reserved):
+                    discrepancies.append((model, pk, name, (stock, reserved), journal))
+        # Записи журнала по удаленным товарам
+        by_id = {content_type.pk: model for model, content_type in content_types.items()}
+        for (content_type_id, pk), journal in ledger.items():
+            if tuple(journal) != (0, 0):
+                discrepancies.append((by_id.get(content_type_id), pk, None, (0, 0), tuple(journal)))
+        return discrepancies
+
+    @classmethod
+    @transaction.atomic
+    def adjust(cls, user, discrepancies, comment='Сверка журнала со счетчиками'):
+        """
+        Приводит журнал к счетчикам товаров операцией корректировки: так заводятся начальные остатки,
+        накопленные до появления журнала. Счетчики не меняются.
+        """
+        deltas = {}
+        for model, pk, _, counters, journal in discrepancies:
+            if model is None:
+                continue
+            deltas.setdefault(model, {})[pk] = (counters[0] - journal[0], counters[1] - journal[1])
+        if not deltas:
+            return None
+        operation = StockOperation.objects.create(operation_type='adjustment', created_by=user, comment=comment)
+        cls.record(operation, deltas)
+        return operation
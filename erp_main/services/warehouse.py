@@ -1,11 +1,110 @@
-from django.db import transaction
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
 from django.contrib.contenttypes.models import ContentType
 
 from erp_main.models import StockOperation, StockOperationItem
+from erp_main.services.stock_ledger import StockLedgerService
 
 
 class WarehouseService:
-    """Сервис для операций со складом"""
+    """
+    Сервис для операций со складом.
+
+    Операция любого размера выполняется фиксированным числом запросов на каждую модель фурнитуры:
+    позиции операции создаются одним bulk_create, остатки меняются одним UPDATE с F()-выражением,
+    поэтому параллельные операции не затирают изменения друг друга. Перед резервированием,
+    списанием и отменой резерва строки блокируются (select_for_update) в порядке pk,
+    а на СУБД без блокировок строк результат проверяется после UPDATE внутри той же транзакции.
+    """
+
+    # Максимум строк в одном UPDATE с CASE
+    UPDATE_BATCH_SIZE = 500
+
+    @staticmethod
+    def _group(items):
+        """
+        Суммирует количество по товарам: {модель: {pk: [экземпляр, количество, цена закупки]}}.
+        Один и тот же товар в нескольких строках операции дает одну строку.
+        """
+        grouped = defaultdict(dict)
+        for item_data in items:
+            item = item_data['item']
+            quantity = item_data['quantity']
+            if quantity <= 0:
+                raise ValueError(f"Количество {item.name} должно быть больше нуля, указано: {quantity}")
+            row = grouped[type(item)].setdefault(item.pk, [item, 0, None])
+            row[1] += quantity
+            if item_data.get('purchase_price') is not None:
+                row[2] = item_data['purchase_price']
+        return grouped
+
+    @staticmethod
+    def _create_operation(user, grouped, operation_type, delta, **fields):
+        """
+        Операция, ее позиции и записи складского журнала: по одному INSERT независимо от числа строк.
+        delta(pk, количество) -> (изменение остатка, изменение резерва) для журнала.
+        """
+        operation = StockOperation.objects.create(operation_type=operation_type, created_by=user, **fields)
+        content_types = ContentType.objects.get_for_models(*grouped)
+        StockOperationItem.objects.bulk_create([
+            StockOperationItem(
+                operation=operation,
+                content_type=content_types[model],
+                object_id=pk,
+                quantity=quantity,
+                purchase_price=purchase_price,
+            )
+            for model, rows in grouped.items()
+            for pk, (_, quantity, purchase_price) in rows.items()
+        ], batch_size=WarehouseService.UPDATE_BATCH_SIZE)
+        StockLedgerService.record(operation, {
+            model: {pk: delta(model, pk, quantity) for pk, (_, quantity, _) in rows.items()}
+            for model, rows in grouped.items()
+        })
+        return operation
+
+    @staticmethod
+    def _lock(model, rows):
+        """Блокирует строки товаров в порядке pk и возвращает {pk: (остаток, резерв)}"""
+        return {
+            pk: (stock, reserved)
+            for pk, stock, reserved in model.objects.select_for_update().filter(pk__in=rows).order_by('pk')
+            .values_list('pk', 'quantity_in_stock', 'reserved_quantity')
+        }
+
+    @staticmethod
+    def _delta(rows, pks):
+        """CASE pk WHEN ... THEN количество: значение, на которое меняется поле для каждой строки"""
+        return Case(
+            *[When(pk=pk, then=Value(rows[pk][1])) for pk in pks],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    @classmethod
+    def _update(cls, model, rows, **fields):
+        """
+        Один UPDATE на пачку строк: fields = {поле: функция(список pk) -> выражение}.
+        F()-выражения вычисляются в БД, поэтому изменения параллельных операций не теряются.
+        """
+        pks = sorted(rows)
+        for start in range(0, len(pks), cls.UPDATE_BATCH_SIZE):
+            batch = pks[start:start + cls.UPDATE_BATCH_SIZE]
+            model.objects.filter(pk__in=batch).update(**{name: build(batch) for name, build in fields.items()})
+
+    @staticmethod
+    def _check_after_update(model, rows, lookup, message):
+        """
+        Контроль на СУБД без select_for_update (SQLite): после UPDATE транзакция уже держит
+        блокировку записи, поэтому проверка видит согласованные остатки. Нарушение откатывает операцию.
+        """
+        if connection.features.has_select_for_update:
+            return
+        broken = model.objects.filter(pk__in=list(rows), **lookup).first()
+        if broken is not None:
+            raise ValueError(message(broken, rows[broken.pk][1]))
 
     @staticmethod
     @transaction.atomic
@@ -20,45 +119,33 @@ class WarehouseService:
             },
             ...
         ]
+        Экземпляры в items не обновляются, актуальные остатки нужно перечитать из БД.
         """
-        # Создаем операцию
-        operation = StockOperation.objects.create(
-            operation_type='receipt',
-            created_by=user,
+        grouped = WarehouseService._group(items)
+        operation = WarehouseService._create_operation(
+            user, grouped, 'receipt', lambda model, pk, quantity: (quantity, 0),
             invoice_number=invoice_number,
             supplier=supplier,
             comment=comment,
         )
 
-        # Обрабатываем каждую позицию
-        for item_data in items:
-            item = item_data['item']
-            quantity = item_data['quantity']
-            purchase_price = item_data.get('purchase_price')
-
-            # Создаем запись в операции
-            StockOperationItem.objects.create(
-                operation=operation,
-                content_type=ContentType.objects.get_for_model(item),
-                object_id=item.id,
-                quantity=quantity,
-                purchase_price=purchase_price,
-            )
-
-            # Обновляем остатки у товара
-            item.quantity_in_stock += quantity
-
+        for model, rows in grouped.items():
+            fields = {'quantity_in_stock': lambda pks, rows=rows: F('quantity_in_stock') + WarehouseService._delta(rows, pks)}
             # Если указана новая закупочная цена - обновляем
-            if purchase_price is not None:
-                item.purchase_price = purchase_price
-
-            item.save()
+            priced = {pk: row for pk, row in rows.items() if row[2] is not None}
+            if priced:
+                fields['purchase_price'] = lambda pks, priced=priced: Case(
+                    *[When(pk=pk, then=Value(int(priced[pk][2]))) for pk in pks if pk in priced],
+                    default=F('purchase_price'),
+                    output_field=IntegerField(),
+                )
+            WarehouseService._update(model, rows, **fields)
 
         return operation
 
     @staticmethod
     @transaction.atomic
-    def reserve_items(user, items, comment=""):
+    def reserve_items(user, items, comment="", order_id=None):
         """
         Зарезервировать товары
         items = [
@@ -68,47 +155,41 @@ class WarehouseService:
             },
             ...
         ]
+        order_id - заказ, под который резервируются товары (см. OrderReservationService)
         """
-        # Проверяем доступность перед резервированием
-        for item_data in items:
-            item = item_data['item']
-            quantity = item_data['quantity']
+        grouped = WarehouseService._group(items)
 
-            if not item.can_reserve(quantity):
-                raise ValueError(
-                    f"Недостаточно {item.name} на складе. "
-                    f"Нужно: {quantity}, доступно: {item.available_quantity}"
-                )
+        # Проверяем доступность по заблокированным строкам
+        for model in sorted(grouped, key=lambda m: m._meta.label):
+            rows = grouped[model]
+            current = WarehouseService._lock(model, rows)
+            for pk, (item, quantity, _) in rows.items():
+                stock, reserved = current.get(pk, (0, 0))
+                if stock - reserved < quantity:
+                    raise ValueError(
+                        f"Недостаточно {item.name} на складе. "
+                        f"Нужно: {quantity}, доступно: {max(0, stock - reserved)}"
+                    )
 
-        # Создаем операцию
-        operation = StockOperation.objects.create(
-            operation_type='reservation',
-            created_by=user,
-            comment=comment,
+        operation = WarehouseService._create_operation(
+            user, grouped, 'reservation', lambda model, pk, quantity: (0, quantity), comment=comment, order_id=order_id,
         )
 
-        # Резервируем товары
-        for item_data in items:
-            item = item_data['item']
-            quantity = item_data['quantity']
-
-            # Создаем запись в операции
-            StockOperationItem.objects.create(
-                operation=operation,
-                content_type=ContentType.objects.get_for_model(item),
-                object_id=item.id,
-                quantity=quantity,
+        for model, rows in grouped.items():
+            WarehouseService._update(
+                model, rows,
+                reserved_quantity=lambda pks, rows=rows: F('reserved_quantity') + WarehouseService._delta(rows, pks),
+            )
+            WarehouseService._check_after_update(
+                model, rows, {'reserved_quantity__gt': F('quantity_in_stock')},
+                lambda item, quantity: f"Недостаточно {item.name} на складе. Нужно: {quantity}",
             )
-
-            # Резервируем
-            item.reserved_quantity += quantity
-            item.save()
 
         return operation
 
     @staticmethod
     @transaction.atomic
-    def consume_items(user, items, comment=""):
+    def consume_items(user, items, comment="", order_id=None):
         """
         Списать товары со склада (после использования)
         items = [
@@ -118,81 +199,75 @@ class WarehouseService:
             },
             ...
         ]
+        Списание уменьшает остаток на все количество и в первую очередь снимает резерв:
+        резерв уменьшается на min(резерв, количество).
+        order_id - заказ, под который списываются товары
         """
-        # Создаем операцию
-        operation = StockOperation.objects.create(
-            operation_type='consumption',
-            created_by=user,
-            comment=comment,
-        )
+        grouped = WarehouseService._group(items)
+        locked = {}
 
-        # Списываем товары
-        for item_data in items:
-            item = item_data['item']
-            quantity = item_data['quantity']
+        for model in sorted(grouped, key=lambda m: m._meta.label):
+            rows = grouped[model]
+            current = locked[model] = WarehouseService._lock(model, rows)
+            for pk, (item, quantity, _) in rows.items():
+                stock, reserved = current.get(pk, (0, 0))
+                if stock < quantity:
+                    raise ValueError(
+                        f"Недостаточно {item.name} на складе. "
+                        f"Нужно: {quantity}, на складе: {stock}"
+                    )
 
-            # Проверяем доступность
-            if not item.can_consume(quantity):
-                raise ValueError(
-                    f"Недостаточно {item.name} на складе. "
-                    f"Нужно: {quantity}, доступно: {item.available_quantity}"
-                )
+        operation = WarehouseService._create_operation(
+            user, grouped, 'consumption',
+            lambda model, pk, quantity: (-quantity, -min(locked[model][pk][1], quantity)),
+            comment=comment, order_id=order_id,
+        )
 
-            # Создаем запись в операции
-            StockOperationItem.objects.create(
-                operation=operation,
-                content_type=ContentType.objects.get_for_model(item),
-                object_id=item.id,
-                quantity=quantity,
+        for model, rows in grouped.items():
+            # Без вычитания больше, чем есть: беззнаковые поля MySQL не допускают отрицательных промежуточных значений
+            WarehouseService._update(
+                model, rows,
+                quantity_in_stock=lambda pks, rows=rows: F('quantity_in_stock') - WarehouseService._delta(rows, pks),
+                reserved_quantity=lambda pks, rows=rows: Case(
+                    *[When(pk=pk, reserved_quantity__gte=rows[pk][1], then=F('reserved_quantity') - Value(rows[pk][1]))
+                      for pk in pks],
+                    *[When(pk=pk, then=Value(0)) for pk in pks],
+                    default=F('reserved_quantity'),
+                    output_field=IntegerField(),
+                ),
             )
 
-            # Сначала снимаем с резерва, если есть
-            reserved_to_release = min(item.reserved_quantity, quantity)
-            if reserved_to_release > 0:
-                item.reserved_quantity -= reserved_to_release
-                quantity -= reserved_to_release
-
-            # Остальное списываем с остатка
-            if quantity > 0:
-                item.quantity_in_stock -= quantity
-
-            item.save()
-
         return operation
 
     @staticmethod
     @transaction.atomic
-    def cancel_reservation(user, items, comment=""):
+    def cancel_reservation(user, items, comment="", order_id=None):
         """
         Отменить резервирование товаров
+        order_id - заказ, резерв которого снимается
         """
-        operation = StockOperation.objects.create(
-            operation_type='cancel_reservation',
-            created_by=user,
-            comment=comment,
-        )
+        grouped = WarehouseService._group(items)
 
-        for item_data in items:
-            item = item_data['item']
-            quantity = item_data['quantity']
+        # Проверяем, что столько зарезервировано
+        for model in sorted(grouped, key=lambda m: m._meta.label):
+            rows = grouped[model]
+            current = WarehouseService._lock(model, rows)
+            for pk, (item, quantity, _) in rows.items():
+                reserved = current.get(pk, (0, 0))[1]
+                if reserved < quantity:
+                    raise ValueError(
+                        f"Нельзя отменить резерв {item.name}. "
+                        f"Хотим отменить: {quantity}, зарезервировано: {reserved}"
+                    )
 
-            # Проверяем, что столько зарезервировано
-            if item.reserved_quantity < quantity:
-                raise ValueError(
-                    f"Нельзя отменить резерв {item.name}. "
-                    f"Хотим отменить: {quantity}, зарезервировано: {item.reserved_quantity}"
-                )
+        operation = WarehouseService._create_operation(
+            user, grouped, 'cancel_reservation', lambda model, pk, quantity: (0, -quantity), comment=comment, order_id=order_id,
+        )
 
-            # Создаем запись в операции
-            StockOperationItem.objects.create(
-                operation=operation,
-                content_type=ContentType.objects.get_for_model(item),
-                object_id=item.id,
-                quantity=quantity,
+        for model, rows in grouped.items():
+            WarehouseService._update(
+                model, rows,
+                reserved_quantity=lambda pks, rows=rows: F('reserved_quantity') - WarehouseService._delta(rows, pks),
             )
 
-            # Отменяем резерв
-            item.reserved_quantity -= quantity
-            item.save()
-
         return operation
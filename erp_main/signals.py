@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .furniture import (BaseFurnitureItem, FurnitureKitItem, FurnitureKitLock, FurnitureKitHandle,
+                        FurnitureKitCylinder)
+from .models import Order, OrderItem, Shipment
+from .services.alerts import OrderAlertService
+from .services.furniture_catalog import FurnitureCatalog
+from .services.furniture_codes import FurnitureCodesService
+from .services.order_reservation import OrderReservationService
+from .services.order_summary import OrderSummaryService
+
+FURNITURE_KIT_ITEMS = [FurnitureKitLock, FurnitureKitHandle, FurnitureKitCylinder]
+
+
+@receiver(post_save, sender=OrderItem)
+def refresh_order_summary_on_save(sender, instance, **kwargs):
+    """Пересчитывает сводку заказа, только если изменились поля, влияющие на счетчики"""
+    if instance.summary_changed():
+        OrderSummaryService.refresh([instance.order_id])
+        instance.mark_summary_saved()
+
+
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_summary_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Пересчитывает сводку заказа при удалении его позиции.
+    Позиция удаляется каскадом только вместе с заказом (при удалении заказа, счета, контрагента и т.д.) -
+    тогда сводку пересчитывать нельзя: запись сводки уже удалена и вставилась бы заново перед удалением заказа.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and not issubclass(origin_model, OrderItem):
+        return
+    OrderSummaryService.refresh([instance.order_id])
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_reservation(sender, instance, **kwargs):
+    """Резерв фурнитуры удаляемого заказа (в том числе каскадом) возвращается на склад"""
+    OrderReservationService.release_order(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Order)
+@receiver([post_save, post_delete], sender=Shipment)
+def invalidate_order_alerts(sender, instance, **kwargs):
+    """Сроки заказов и отгрузки влияют на уведомления в шапке. Кэш сбрасывается после коммита"""
+    transaction.on_commit(OrderAlertService.invalidate)
+
+
+@receiver(post_save, sender=FurnitureKitLock)
+@receiver(post_save, sender=FurnitureKitHandle)
+@receiver(post_save, sender=FurnitureKitCylinder)
+def refresh_furniture_codes_on_save(sender, instance, created, **kwargs):
+    """Пересчитывает коды фурнитуры позиции, если изменился состав комплекта"""
+    if created or instance.codes_changed():
+        FurnitureCodesService.refresh({instance.furniture_kit_id, instance.loaded_kit_id})
+        instance.mark_codes_saved()
+
+
+@receiver(post_delete, sender=FurnitureKitLock)
+@receiver(post_delete, sender=FurnitureKitHandle)
+@receiver(post_delete, sender=FurnitureKitCylinder)
+def refresh_furniture_codes_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Пересчитывает коды фурнитуры позиции после удаления строки комплекта - самой строки
+    или элемента фурнитуры из каталога. Любой другой источник удаления (комплект, позиция, заказ,
+    счет, контрагент и т.д.) удаляет комплект целиком - пересчитывать нечего.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and not issubclass(origin_model, (FurnitureKitItem, BaseFurnitureItem)):
+        return
+    FurnitureCodesService.refresh([instance.furniture_kit_id])
+
+
+def invalidate_furniture_catalog(sender, instance, **kwargs):
+    """Новая версия каталога фурнитуры после коммита: снимки во всех процессах перестроятся"""
+    transaction.on_commit(FurnitureCatalog.invalidate)
+
+
+for catalog_model in FurnitureCatalog.MODELS:
+    post_save.connect(invalidate_furniture_catalog, sender=catalog_model,
+                      dispatch_uid=f'invalidate_furniture_catalog_save_{catalog_model.__name__}')
+    post_delete.connect(invalidate_furniture_catalog, sender=catalog_model,
+                        dispatch_uid=f'invalidate_furniture_catalog_delete_{catalog_model.__name__}')
@@ -1,3 +1,898 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Group, User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .api_views import InvoiceViewSet, OrderViewSet, OrganizationViewSet
+from .forms import LegalEntityForm
+from .furniture import DoorHandle, DoorLock, FurnitureKit, LockCylinder
+from .models import (IndividualEntrepreneur, InternalLegalEntity, Invoice, LegalEntity, Order, OrderImportJob,
+                     OrderItem, OrderSummary, Organization, PhysicalPerson, StockLedgerEntry, StockSnapshot)
+from .services.alerts import OrderAlertService
+from .services.furniture_catalog import FurnitureCatalog
+from .services.furniture_codes import FurnitureCodesService
+from .services.furniture_kits import FurnitureKitImportService
+from .services.morphology import Morphology
+from .services.order_batch_import import OrderBatchImportService
+from .services.order_diff import OrderDiffService
+from .services.order_import_jobs import OrderImportJobService
+from .services.order_processor import OrderProcessor
+from .services.order_reservation import OrderReservationService
+from .services.order_summary import OrderSummaryService
+from .services.organization_search import OrganizationSearch
+from .services.organization_similarity import OrganizationSimilarity
+from .services.reorder_report import ReorderReportService
+from .services.stock_ledger import StockLedgerService
+from .services.warehouse import WarehouseService
+from .views.orders import process_order_action
+
+
+class ErpTestCase(TestCase):
+    """Общие данные: менеджер, юрлицо компании, контрагент и счет"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='manager', password='manager')
+        cls.internal_legal_entity = InternalLegalEntity.objects.create(type='LEGAL', name='Компания')
+        cls.organization = LegalEntity.objects.create(
+            type='LEGAL', user=cls.user, internal_legal_entity=cls.internal_legal_entity,
+            legal_form='OOO', name='Ромашка', inn='7700000001',
+        )
+        cls.invoice = Invoice.objects.create(
+            number='1', organization=cls.organization, date=datetime.date.today(), amount=100,
+            internal_legal_entity=cls.internal_legal_entity,
+        )
+
+    def create_order(self, items=2, **item_fields):
+        order = Order.objects.create(invoice=self.invoice, order_file='order.xlsx')
+        for number in range(items):
+            fields = {
+                'p_kind': 'door', 'p_type': 'tech', 'p_construction': 'NK', 'p_width': 1000, 'p_height': 2000,
+                'p_quantity': 1, 'p_status': 'in_query',
+            }
+            fields.update(item_fields)
+            OrderItem.objects.create(order=order, position_num=str(number + 1), **fields)
+        return order
+
+    @staticmethod
+    def blank_file(positions, name='order.xlsx'):
+        """
+        Файл бланка заказа: positions - список словарей с ключами num, name, height, width, quantity
+        и необязательными furniture и glass (список пар (высота, ширина), первая - в строке позиции)
+        """
+        wb = Workbook()
+        sheet = wb.active
+        sheet.cell(row=1, column=3, value='Бланк №')
+        row = 8
+        for position in positions:
+            glass = position.get('glass') or [(None, None)]
+            for column, value in ((1, position['num']), (2, position['name']), (3, position['height']),
+                                  (4, position['width']), (10, position.get('furniture')),
+                                  (14, position['quantity'])):
+                sheet.cell(row=row, column=column, value=value)
+            for height, width in glass:
+                sheet.cell(row=row, column=7, value=height)
+                sheet.cell(row=row, column=8, value=width)
+                row += 1
+        sheet.cell(row=row, column=15, value='шт.')
+        with tempfile.SpooledTemporaryFile() as file:
+            wb.save(file)
+            file.seek(0)
+            return SimpleUploadedFile(name, file.read())
+
+
+class OrderSummaryDeleteTests(ErpTestCase):
+    """Сводка заказа при удалении позиций и каскадном удалении заказа"""
+
+    def test_delete_item_refreshes_summary(self):
+        order = self.create_order(items=2)
+        order.items.first().delete()
+        self.assertEqual(OrderSummary.objects.get(order=order).quantity, 1)
+
+    def test_delete_order(self):
+        order = self.create_order()
+        order.delete()
+        self.assertFalse(OrderSummary.objects.filter(order_id=order.pk).exists())
+
+    def test_delete_invoice_with_orders(self):
+        order = self.create_order()
+        self.invoice.delete()
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertFalse(OrderSummary.objects.exists())
+
+    def test_delete_organization_with_orders(self):
+        self.create_order()
+        self.organization.delete()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderSummary.objects.exists())
+
+
+class OrderSummaryBackfillTests(ErpTestCase):
+    """Миграция 0021 считает сводки так же, как OrderSummaryService"""
+
+    def test_backfill_matches_service(self):
+        self.create_order(items=2, p_quantity=3, p_status='product', workshop='1')
+        self.create_order(items=1, p_kind='gate', p_width=3500, p_active_trim=300, glass_quantity=1)
+        order = self.create_order(items=2, p_kind='hatch', p_construction='SK', p_status='stopped', workshop='2')
+        OrderItem.objects.filter(order=order, position_num='1').update(p_status='changed')
+        Order.objects.create(invoice=self.invoice, order_file='order.xlsx')
+        fields = OrderSummary.COUNTERS + ['status', 'workshop_icon']
+        OrderSummaryService.rebuild()
+        expected = list(OrderSummary.objects.order_by('pk').values_list(*fields))
+
+        OrderSummary.objects.all().delete()
+        migration = importlib.import_module('erp_main.migrations.0021_backfill_order_summaries')
+        migration.rebuild_summaries(django_apps, None)
+        self.assertEqual(list(OrderSummary.objects.order_by('pk').values_list(*fields)), expected)
+
+
+class OrderAlertTests(ErpTestCase):
+    """Кэш уведомлений по заказам сбрасывается только после коммита изменений"""
+
+    def test_invalidated_on_commit(self):
+        OrderAlertService.get_alerts()
+        with self.captureOnCommitCallbacks() as callbacks:
+            order = self.create_order(items=1)
+            Order.objects.filter(pk=order.pk).update(due_date=datetime.date.today())
+            order.items.update(p_status='product')
+            OrderSummaryService.refresh([order.pk])
+            # До коммита параллельные запросы видят прежний кэш, а не пересчитывают его по незафиксированным данным
+            self.assertEqual(OrderAlertService.get_alerts()['today'], {})
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(OrderAlertService.get_alerts()['today']), [order.pk])
+
+
+class OrderItemGlassTests(ErpTestCase):
+    """Остекление позиции из сырых значений ячеек бланка"""
+
+    def test_date_and_time_cells(self):
+        order = self.create_order(items=1)
+        item = order.items.get()
+        item.set_glass({(500, 400): 2, (datetime.date(2026, 1, 5), datetime.time(4, 0)): 1})
+        item.save()
+        item.refresh_from_db()
+        self.assertEqual(item.p_glass, [[500, 400, 2], ['2026-01-05', '04:00:00', 1]])
+        self.assertEqual(item.glass_quantity, 3)
+
+
+class OrderSummaryFieldsTests(ErpTestCase):
+    """Сводка пересчитывается при изменении любого поля из OrderItem.SUMMARY_FIELDS"""
+
+    def test_active_trim_moves_doors_between_counters(self):
+        order = self.create_order(items=1, p_quantity=5, p_active_trim=None)
+        summary = OrderSummary.objects.get(order=order)
+        self.assertEqual((summary.doors_1_nk, summary.doors_2_nk), (5, 0))
+
+        item = OrderItem.objects.get(order=order)
+        item.p_active_trim = 300
+        item.save()
+        summary.refresh_from_db()
+        self.assertEqual((summary.doors_1_nk, summary.doors_2_nk), (0, 5))
+
+
+class FurnitureKitImportTests(ErpTestCase):
+    """Комплекты фурнитуры по строкам кодов из бланка"""
+
+    def setUp(self):
+        self.lock = DoorLock.objects.create(name='Замок', code='01')
+        self.handle = DoorHandle.objects.create(name='Ручка', code='01')
+        self.cylinder = LockCylinder.objects.create(name='Ц/м', code='01')
+        FurnitureCatalog.invalidate()
+
+    def test_codes_with_surrounding_whitespace(self):
+        order = self.create_order(items=2, p_furniture=' 01-01-01 ')
+        result = FurnitureKitImportService.build_kits(order)
+        self.assertEqual(result, {'created': 2, 'unresolved': {}})
+        kit = FurnitureKit.objects.filter(order_item__order=order).first()
+        self.assertEqual(kit.furniturekitlock_set.get().door_lock, self.lock)
+
+
+class FurnitureCodesDeleteTests(ErpTestCase):
+    """Коды фурнитуры позиции пересчитываются при удалении строки комплекта, но не при удалении комплекта"""
+
+    def setUp(self):
+        self.lock = DoorLock.objects.create(name='Замок', code='01')
+        self.other_lock = DoorLock.objects.create(name='Замок', code='02')
+        self.order = self.create_order(items=1)
+        kit = FurnitureKit.objects.create(order_item=self.order.items.get())
+        kit.furniturekitlock_set.create(door_lock=self.lock, quantity=1)
+        kit.furniturekitlock_set.create(door_lock=self.other_lock, quantity=1)
+
+    def deleted(self, delete):
+        with mock.patch.object(FurnitureCodesService, 'refresh', wraps=FurnitureCodesService.refresh) as refresh:
+            delete()
+        return refresh.call_count
+
+    def test_organization_cascade_skips_refresh(self):
+        self.assertEqual(self.deleted(self.organization.delete), 0)
+        self.assertFalse(FurnitureKit.objects.exists())
+
+    def test_invoice_cascade_skips_refresh(self):
+        self.assertEqual(self.deleted(self.invoice.delete), 0)
+
+    def test_catalog_item_refreshes_codes(self):
+        self.assertEqual(self.deleted(self.other_lock.delete), 1)
+        self.assertEqual(self.order.items.get().p_furniture, '01-00-00')
+
+
+class FurnitureCatalogCacheTests(TestCase):
+    """Версия каталога фурнитуры в общем кэше: редкие обращения и работа без кэша"""
+
+    def setUp(self):
+        self.lock = DoorLock.objects.create(name='Замок', code='01')
+        FurnitureCatalog.invalidate()
+
+    def test_version_checked_once_per_interval(self):
+        FurnitureCatalog.get()
+        with mock.patch.object(FurnitureCatalog, 'version', wraps=FurnitureCatalog.version) as version:
+            for _ in range(100):
+                self.assertEqual(FurnitureCatalog.get_by_code('01', DoorLock), self.lock)
+        self.assertEqual(version.call_count, 0)
+
+    def test_cache_unavailable(self):
+        broken = mock.Mock(**{'get.side_effect': ConnectionError('redis'), 'set.side_effect': ConnectionError('redis')})
+        with mock.patch.object(FurnitureCatalog, 'cache', return_value=broken), \
+                self.assertLogs('erp_main.services.furniture_catalog', level='WARNING'):
+            FurnitureCatalog.invalidate()
+            self.assertEqual(FurnitureCatalog.get_by_code('01', DoorLock), self.lock)
+            with self.captureOnCommitCallbacks(execute=True):
+                DoorLock.objects.create(name='Замок', code='02')
+            lock = FurnitureCatalog.get_by_code('02', DoorLock)
+        self.assertEqual(lock.code, '02')
+
+
+class WarehouseConcurrencyTests(TransactionTestCase):
+    """Параллельное резервирование из нескольких потоков не теряет обновлений остатков"""
+
+    THREADS = 4
+    OPERATIONS = 3
+    LINES = 100
+
+    def test_concurrent_reservations(self):
+        user = User.objects.create_user(username='warehouse')
+        stock = self.THREADS * self.OPERATIONS * self.LINES
+        DoorLock.objects.bulk_create([
+            DoorLock(name='Замок', code=f'stress-{number}', quantity_in_stock=stock) for number in range(20)
+        ])
+        pks = list(DoorLock.objects.values_list('pk', flat=True))
+        expected = Counter()
+        lock = threading.Lock()
+        failures = []
+
+        def worker():
+            try:
+                for _ in range(self.OPERATIONS):
+                    # Каждый поток работает со своими экземплярами, как отдельные запросы пользователей
+                    own = list(DoorLock.objects.filter(pk__in=pks))
+                    items = [{'item': random.choice(own), 'quantity': 1} for _ in range(self.LINES)]
+                    for attempt in range(50):
+                        try:
+                            WarehouseService.reserve_items(user, items)
+                            break
+                        except OperationalError:
+                            # SQLite: база заблокирована параллельной транзакцией
+                            time.sleep(0.02 * (attempt + 1))
+                    else:
+                        raise RuntimeError('Не удалось выполнить операцию: база занята')
+                    with lock:
+                        for row in items:
+                            expected[row['item'].pk] += row['quantity']
+            except Exception as e:
+                failures.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        actual = dict(DoorLock.objects.values_list('pk', 'reserved_quantity'))
+        self.assertEqual(sum(expected.values()), self.THREADS * self.OPERATIONS * self.LINES)
+        self.assertEqual(actual, {pk: expected[pk] for pk in pks})
+
+
+class StockLedgerTests(TestCase):
+    """Складской журнал совпадает со счетчиками товаров; снимок плюс хвост журнала равен текущему остатку"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='warehouse')
+        self.lock = DoorLock.objects.create(name='Замок', code='01')
+        self.handle = DoorHandle.objects.create(name='Ручка', code='01')
+
+    def operations(self):
+        """Приход, резерв, списание (сверх резерва) и отмена резерва"""
+        WarehouseService.add_to_stock(self.user, [{'item': self.lock, 'quantity': 10},
+                                                  {'item': self.handle, 'quantity': 5}])
+        WarehouseService.reserve_items(self.user, [{'item': self.lock, 'quantity': 4},
+                                                   {'item': self.handle, 'quantity': 2}])
+        WarehouseService.consume_items(self.user, [{'item': self.lock, 'quantity': 5}])
+        WarehouseService.cancel_reservation(self.user, [{'item': self.handle, 'quantity': 1}])
+
+    def counters(self, item):
+        item.refresh_from_db()
+        return item.quantity_in_stock, item.reserved_quantity
+
+    def test_ledger_matches_counters(self):
+        self.operations()
+        self.assertEqual(self.counters(self.lock), (5, 0))
+        self.assertEqual(self.counters(self.handle), (5, 1))
+        self.assertEqual(StockLedgerService.balance(self.lock), (5, 0))
+        self.assertEqual(StockLedgerService.balance(self.handle), (5, 1))
+        self.assertEqual(StockLedgerService.reconcile(), [])
+
+    def test_snapshot_plus_tail_equals_live_balance(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.operations()
+        StockLedgerEntry.objects.update(created_at=StockLedgerService.end_of_day(yesterday) - datetime.timedelta(hours=1))
+        self.assertEqual(StockLedgerService.take_snapshot(yesterday), 2)
+        self.assertEqual(StockSnapshot.objects.get(
+            content_type=ContentType.objects.get_for_model(DoorLock), object_id=self.lock.pk, date=yesterday,
+        ).quantity_in_stock, 5)
+
+        WarehouseService.add_to_stock(self.user, [{'item': self.lock, 'quantity': 3}])
+        WarehouseService.reserve_items(self.user, [{'item': self.lock, 'quantity': 2}])
+        with CaptureQueriesContext(connection) as queries:
+            balance = StockLedgerService.balance(self.lock)
+        self.assertEqual(balance, self.counters(self.lock))
+        self.assertEqual(balance, (8, 2))
+        # Снимок и записи журнала после него
+        self.assertEqual(len(queries.captured_queries), 3)
+        self.assertEqual(StockLedgerService.balance(self.lock, at=StockLedgerService.end_of_day(yesterday)), (5, 0))
+        self.assertEqual(StockLedgerService.reconcile(), [])
+
+    def test_adjust_brings_ledger_to_counters(self):
+        # Остатки, заведенные до появления журнала
+        DoorLock.objects.filter(pk=self.lock.pk).update(quantity_in_stock=7, reserved_quantity=1)
+        WarehouseService.add_to_stock(self.user, [{'item': self.handle, 'quantity': 2}])
+        discrepancies = StockLedgerService.reconcile()
+        self.assertEqual([(model, pk, counters, journal) for model, pk, _, counters, journal in discrepancies],
+                         [(DoorLock, self.lock.pk, (7, 1), (0, 0))])
+
+        operation = StockLedgerService.adjust(self.user, discrepancies)
+        self.assertEqual(operation.operation_type, 'adjustment')
+        self.assertEqual(StockLedgerService.reconcile(), [])
+        self.assertEqual(self.counters(self.lock), (7, 1))
+        self.assertIsNone(StockLedgerService.adjust(self.user, []))
+
+
+@override_settings(ORDER_FURNITURE_RESERVATION=True)
+class OrderReservationTests(ErpTestCase):
+    """Резерв фурнитуры заказа на всем пути: запуск, остановка, возврат в очередь, отгрузка"""
+
+    def setUp(self):
+        self.lock = DoorLock.objects.create(name='Замок', code='01', quantity_in_stock=5)
+        self.order = self.create_order(items=1, p_quantity=2)
+        kit = FurnitureKit.objects.create(order_item=self.order.items.get())
+        kit.furniturekitlock_set.create(door_lock=self.lock, quantity=1)
+
+    def act(self, action):
+        return process_order_action(OrderItem.objects.filter(order=self.order), action, self.user)
+
+    def assertStock(self, stock, reserved):
+        self.lock.refresh_from_db()
+        self.assertEqual((self.lock.quantity_in_stock, self.lock.reserved_quantity), (stock, reserved))
+
+    def test_ship_consumes_reservation(self):
+        self.assertTrue(self.act('start_1')['success'])
+        self.assertStock(5, 2)
+        self.assertTrue(self.act('ready')['success'])
+        self.assertStock(5, 2)
+        self.assertTrue(self.act('ship')['success'])
+        self.assertStock(3, 0)
+        self.assertEqual(OrderReservationService.reserved(self.order.pk), {})
+        # Повторная синхронизация ничего не списывает второй раз
+        OrderReservationService.sync(self.order.pk, self.user)
+        self.assertStock(3, 0)
+
+    def test_stop_and_to_queue_release_reservation(self):
+        self.act('start_1')
+        self.act('stop')
+        self.assertStock(5, 0)
+        self.act('start_3')
+        self.assertStock(5, 2)
+        self.act('to_queue')
+        self.assertStock(5, 0)
+
+    def test_not_enough_stock(self):
+        DoorLock.objects.filter(pk=self.lock.pk).update(quantity_in_stock=1)
+        result = self.act('start_1')
+        self.assertFalse(result['success'])
+        self.assertEqual(OrderItem.objects.get(order=self.order).p_status, 'in_query')
+        self.assertStock(1, 0)
+
+    def test_item_status_update_reserves(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        item = self.order.items.get()
+        response = self.client.post(
+            reverse('update_order_item_status'),
+            json.dumps({'updates': {item.pk: {'status': 'product', 'workshop': '1', 'path': 'order_detail'}}}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertStock(5, 2)
+
+    def test_delete_order_releases_reservation(self):
+        self.act('start_1')
+        self.assertStock(5, 2)
+        self.invoice.delete()
+        self.assertStock(5, 0)
+
+    def test_reupload_releases_removed_positions(self):
+        self.act('start_1')
+        self.assertStock(5, 2)
+        # В новом бланке позиции 1 нет: она снимается с заказа ('changed') вместе с резервом
+        blank = self.blank_file([{'num': '2', 'name': 'Дверь тех-м', 'height': 2000, 'width': 1000, 'quantity': 1}])
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            self.order.order_file = blank
+            self.order.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                job = OrderImportJobService.enqueue(self.order, self.user, is_update=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(self.order.items.get(position_num='1').p_status, 'changed')
+        self.assertStock(5, 0)
+
+    @override_settings(ORDER_FURNITURE_RESERVATION=False)
+    def test_disabled(self):
+        self.act('start_1')
+        self.assertStock(5, 0)
+
+
+class OrderDiffTests(ErpTestCase):
+    """Сравнение заказа с повторно загруженным бланком и применение изменений"""
+
+    def setUp(self):
+        self.order = self.create_order(items=3, p_active_trim=None)
+
+    @staticmethod
+    def position(num, quantity=1, glass=(), **columns):
+        """Строка позиции как из OrderProcessor.read_blank: столбцы в порядке OrderProcessor.SEQ"""
+        row = {'name': 'Дверь тех-м', 'height': 2000, 'width': 1000, 'active_trim': None, 'open': None,
+               'platband': None, 'furniture': None, 'closer': None, 'step': None, 'ral': None, 'comment': None}
+        row.update(columns)
+        return [str(num), row['name'], row['height'], row['width'], row['active_trim'], row['open'],
+                row['platband'], row['furniture'], row['closer'], row['step'], row['ral'], quantity,
+                row['comment'], *[value for pair in glass for value in pair]]
+
+    def item(self, num):
+        return self.order.items.get(position_num=str(num))
+
+    def test_diff(self):
+        changeset = OrderDiffService.diff(self.order, [
+            self.position(1),
+            self.position(2, quantity=5, glass=[(500, 400), (500, 400)]),
+            self.position(4),
+        ])
+        self.assertEqual([item.position_num for item, _ in changeset.added], ['4'])
+        self.assertEqual([item.position_num for item in changeset.removed], ['3'])
+        [change] = changeset.modified
+        self.assertEqual(change.item.position_num, '2')
+        self.assertEqual([(f.name, f.old, f.new) for f in change.fields], [('p_quantity', 1, 5)])
+        self.assertEqual(change.glass.new, {(500, 400): 2})
+        self.assertEqual(OrderDiffService.diff(self.order, [self.position(1), self.position(2),
+                                                            self.position(3)]).modified, [])
+
+    def test_apply(self):
+        changeset = OrderDiffService.diff(self.order, [
+            self.position(1, ral=7035), self.position(2, glass=[(500, 400)]), self.position(4, quantity=2),
+        ])
+        OrderDiffService.apply(self.order, changeset)
+        self.assertEqual(self.item(1).p_ral, '7035')
+        self.assertEqual(list(self.item(2).glasses.values_list('height', 'width', 'quantity')), [(500, 400, 1)])
+        self.assertEqual(self.item(2).glass_quantity, 1)
+        self.assertEqual(self.item(3).p_status, 'changed')
+        self.assertEqual((self.item(4).p_status, self.item(4).p_quantity), ('in_query', 2))
+        self.assertEqual(OrderSummary.objects.get(order=self.order).quantity, 4)
+
+        # Позиция, вернувшаяся в бланк, снова встает в очередь
+        OrderDiffService.apply(self.order, OrderDiffService.diff(self.order, [
+            self.position(1, ral=7035), self.position(2, glass=[(500, 400)]), self.position(3),
+            self.position(4, quantity=2),
+        ]))
+        self.assertEqual(self.item(3).p_status, 'in_query')
+
+    def test_apply_keeps_concurrent_changes(self):
+        OrderItem.objects.filter(pk=self.item(3).pk).update(p_status='changed')
+        changeset = OrderDiffService.diff(self.order, [
+            self.position(1, quantity=2), self.position(2, ral=9005), self.position(3),
+        ])
+        # Пока бланк обрабатывался, позицию 1 запустили в производство, а позицию 2 перевели в цех 3
+        OrderItem.objects.filter(pk=self.item(1).pk).update(p_status='product', workshop=1)
+        OrderItem.objects.filter(pk=self.item(2).pk).update(p_status='product', workshop=3)
+        OrderDiffService.apply(self.order, changeset)
+
+        self.assertEqual((self.item(1).p_quantity, self.item(1).p_status, self.item(1).workshop), (2, 'product', 1))
+        self.assertEqual((self.item(2).p_ral, self.item(2).p_status, self.item(2).workshop), ('9005', 'product', 3))
+        self.assertEqual(self.item(3).p_status, 'in_query')
+
+
+class OrderImportJobTests(ErpTestCase):
+    """Фоновая обработка бланков: свой файл у каждого задания, повтор прерванных заданий"""
+
+    DOOR = {'name': 'Дверь тех-м', 'height': 2000, 'width': 1000}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name, ORDER_IMPORT_ASYNC=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.order = Order.objects.create(invoice=self.invoice)
+
+    def upload(self, quantities, is_update=True):
+        """Загрузка бланка с позициями заданных количеств; задание в очереди, не выполняется"""
+        positions = [{'num': str(number), 'quantity': quantity, **self.DOOR}
+                     for number, quantity in enumerate(quantities, start=1)]
+        old_file = self.order.order_file if is_update else None
+        self.order.order_file = self.blank_file(positions)
+        self.order.save()
+        return OrderImportJobService.enqueue(self.order, self.user, is_update=is_update, old_file=old_file)
+
+    def quantities(self):
+        return list(self.order.get_items_filtered().order_by('position_num').values_list('p_quantity', flat=True))
+
+    def test_each_job_reads_its_own_file(self):
+        first = self.upload([1], is_update=False)
+        second = self.upload([2, 3])
+        self.assertNotEqual(first.order_file.name, second.order_file.name)
+
+        OrderImportJobService.run(first.pk)
+        self.assertEqual(self.quantities(), [1])
+        OrderImportJobService.run(second.pk)
+        self.assertEqual(self.quantities(), [2, 3])
+
+    def test_stale_job_is_retried(self):
+        job = self.upload([4], is_update=False)
+        OrderImportJob.objects.filter(pk=job.pk).update(
+            status='saving', started_at=timezone.now() - datetime.timedelta(hours=1))
+        fresh = self.upload([5])
+        OrderImportJob.objects.filter(pk=fresh.pk).update(status='parsing', started_at=timezone.now())
+
+        with self.assertLogs('erp_main.services.order_import_jobs', level='WARNING'):
+            self.assertEqual(OrderImportJobService.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(self.quantities(), [4])
+        self.assertEqual(OrderImportJob.objects.get(pk=fresh.pk).status, 'parsing')
+
+
+class OrderBlankReaderTests(ErpTestCase):
+    """Один разбор бланка - read_blank; check_blank проверяет только заголовок"""
+
+    DOOR = {'num': '1', 'name': 'Дверь тех-м', 'height': 2000, 'width': 1000, 'quantity': 2}
+
+    def not_blank(self):
+        wb = Workbook()
+        wb.active.cell(row=1, column=1, value='Счет')
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    def test_read_blank(self):
+        positions = list(OrderProcessor.read_blank(self.blank_file([self.DOOR, {**self.DOOR, 'num': '2'}])))
+        self.assertEqual([position[0] for position in positions], ['1', '2'])
+        with self.assertRaises(ValidationError):
+            list(OrderProcessor.read_blank(self.not_blank()))
+
+    def test_check_blank_rewinds_file(self):
+        blank = self.blank_file([self.DOOR])
+        OrderProcessor.check_blank(blank)
+        self.assertEqual(blank.tell(), 0)
+        self.assertEqual(len(list(OrderProcessor.read_blank(blank))), 1)
+        with self.assertRaises(ValidationError):
+            OrderProcessor.check_blank(self.not_blank())
+
+    def test_batch_parse_file_reports_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, content in (('order', self.blank_file([self.DOOR]).read()),
+                                  ('empty', self.blank_file([]).read()),
+                                  ('other', self.not_blank().read()),
+                                  ('broken', b'not a workbook')):
+                paths[name] = f'{directory}/{name}.xlsx'
+                with open(paths[name], 'wb') as file:
+                    file.write(content)
+            positions, error = OrderProcessor.parse_blank_file(paths['order'])
+            self.assertEqual((len(positions), error), (1, None))
+            self.assertEqual(OrderProcessor.parse_blank_file(paths['empty']), (None, 'В бланке нет позиций'))
+            self.assertEqual(OrderProcessor.parse_blank_file(paths['other']),
+                             (None, 'Выберите правильный файл заказа'))
+            positions, error = OrderProcessor.parse_blank_file(paths['broken'])
+            self.assertIsNone(positions)
+            self.assertTrue(error.startswith('Ошибка разбора файла'), error)
+
+
+class OrderBatchUploadTests(ErpTestCase):
+    """Пакетная загрузка через веб: бланки разбираются в процессе запроса, без пула процессов"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+    def archive(self, *names):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            for number, name in enumerate(names, start=1):
+                blank = self.blank_file([{'num': '1', 'name': 'Дверь тех-м', 'height': 2000, 'width': 1000,
+                                          'quantity': number}])
+                zf.writestr(name, blank.read())
+        return SimpleUploadedFile('blanks.zip', buffer.getvalue(), content_type='application/zip')
+
+    def test_upload_does_not_start_process_pool(self):
+        with mock.patch('erp_main.services.order_batch_import.ProcessPoolExecutor') as pool, \
+                mock.patch('os.cpu_count', return_value=4):
+            response = self.client.post(reverse('order_batch_upload'), {
+                'archive': self.archive('first.xlsx', 'second.xlsx'), 'invoice': self.invoice.pk,
+            })
+        self.assertEqual(response.status_code, 200)
+        pool.assert_not_called()
+        report = response.context['report']
+        self.assertEqual([result['success'] for result in report], [True, True], report)
+        self.assertEqual(Order.objects.filter(invoice=self.invoice).count(), 2)
+
+    def test_parse_files_uses_pool_for_several_workers(self):
+        with mock.patch('erp_main.services.order_batch_import.ProcessPoolExecutor') as pool:
+            pool.return_value.__enter__.return_value.map.return_value = [([], None), ([], None)]
+            OrderBatchImportService.parse_files(['a.xlsx', 'b.xlsx'], workers=2)
+        pool.assert_called_once()
+
+
+class ReorderReportTests(ErpTestCase):
+    """Отчет о закупке совпадает с needs_reorder() и доступен только администраторам и директорам"""
+
+    def test_available_equal_to_min_stock(self):
+        lock = DoorLock.objects.create(name='Замок', code='B', quantity_in_stock=10, min_stock=10)
+        DoorLock.objects.create(name='Замок', code='C', quantity_in_stock=11, min_stock=10)
+        self.assertTrue(lock.needs_reorder())
+        rows = list(ReorderReportService.queryset())
+        self.assertEqual([(row['code'], row['shortfall']) for row in rows], [('B', 0)])
+
+    def test_access_by_role(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('reorder_report')).status_code, 403)
+        self.user.groups.add(Group.objects.create(name='director'))
+        self.assertEqual(self.client.get(reverse('reorder_report')).status_code, 200)
+
+
+class OrganizationSubtypeListTests(ErpTestCase):
+    """Списки счетов и заказов загружают контрагентов с подтипами, число запросов не растет со страницей"""
+
+    def setUp(self):
+        self.user.is_superuser = self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+    def add_invoices(self):
+        """По счету и заказу на каждый тип контрагента: ИП и физлицо (юрлицо из ErpTestCase)"""
+        number = Invoice.objects.count()
+        user = User.objects.create(username=f'manager-{number}')
+        for organization in (
+            LegalEntity.objects.create(type='LEGAL', user=user, internal_legal_entity=self.internal_legal_entity,
+                                       legal_form='OOO', name=f'Ромашка {number}', inn=f'77100{number:05d}'),
+            IndividualEntrepreneur.objects.create(type='INDIVIDUAL', user=user,
+                                                  internal_legal_entity=self.internal_legal_entity,
+                                                  full_name=f'Петров Петр {number}', inn=f'7800000{number:05d}'),
+            PhysicalPerson.objects.create(type='PERSON', user=user, full_name=f'Сидоров Иван {number}',
+                                          phone=f'+7999{number:07d}'),
+        ):
+            invoice = Invoice.objects.create(
+                number=f'{organization.pk}', organization=organization, date=datetime.date.today(), amount=100,
+                internal_legal_entity=self.internal_legal_entity,
+            )
+            Order.objects.create(invoice=invoice, order_file='order.xlsx')
+
+    def count_queries(self, request):
+        # Уведомления в шапке кэшируются: считаем запросы страницы с пустым кэшем каждый раз
+        OrderAlertService.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def assertConstantQueries(self, request):
+        self.add_invoices()
+        before = self.count_queries(request)
+        self.add_invoices()
+        self.assertEqual(self.count_queries(request), before)
+
+    def test_invoices_list(self):
+        self.assertConstantQueries(lambda: self.client.get(reverse('invoices_list')))
+
+    def test_orders_list(self):
+        self.assertConstantQueries(lambda: self.client.get(reverse('orders_list')))
+
+    def test_api_lists(self):
+        self.add_invoices()
+        factory = APIRequestFactory()
+        for viewset in (InvoiceViewSet, OrderViewSet):
+            view = viewset.as_view({'get': 'list'})
+
+            def request():
+                api_request = factory.get('/')
+                force_authenticate(api_request, user=self.user)
+                response = view(api_request)
+                response.render()
+                return response
+
+            before = self.count_queries(request)
+            self.add_invoices()
+            self.assertEqual(self.count_queries(request), before, viewset.__name__)
+
+
+class OrganizationDuplicateFormTests(ErpTestCase):
+    """Дубликаты ИНН в форме контрагента - ошибка формы, а не IntegrityError при сохранении"""
+
+    def form(self, inn):
+        return LegalEntityForm(data={
+            'legal_form': 'OOO', 'name': 'Новая организация', 'inn': inn,
+            'internal_legal_entity': self.internal_legal_entity.pk,
+        })
+
+    def test_duplicate_inn_from_registry(self):
+        form = self.form(self.organization.inn)
+        self.assertFalse(form.is_valid())
+        self.assertIn('inn', form.errors)
+
+    def test_duplicate_inn_changed_without_save(self):
+        # update() не обновляет реестр идентификаторов
+        LegalEntity.objects.filter(pk=self.organization.pk).update(inn='7700000099')
+        form = self.form('7700000099')
+        self.assertFalse(form.is_valid())
+        self.assertIn('inn', form.errors)
+
+
+class OrganizationSearchTests(ErpTestCase):
+    """Общий поиск контрагентов: индекс FTS5 на SQLite, LIKE без индекса, числа подстрокой"""
+
+    def setUp(self):
+        self.company = LegalEntity.objects.create(
+            type='LEGAL', user=self.user, internal_legal_entity=self.internal_legal_entity,
+            legal_form='OOO', name='Василек', inn='7710012345',
+        )
+        self.person = PhysicalPerson.objects.create(type='PERSON', user=self.user, full_name='Сидоров Иван',
+                                                    phone='+7 (999) 123-45-67')
+
+    def found(self, query):
+        return set(Organization.objects.search(query).values_list('pk', flat=True))
+
+    def assertSearch(self):
+        self.assertEqual(self.found('васил'), {self.company.pk})
+        self.assertEqual(self.found('ООО Васил'), set())  # legal_form не индексируется
+        self.assertEqual(self.found('0012345'), {self.company.pk})
+        self.assertEqual(self.found('Василек 77100'), {self.company.pk})
+        for phone in ('9991234567', '89991234567', '+7 999 123-45-67', '1234567'):
+            self.assertEqual(self.found(phone), {self.person.pk}, phone)
+        self.assertEqual(self.found('сидор'), {self.person.pk})
+
+    def test_fts(self):
+        self.assertTrue(OrganizationSearch.fts_available('default'))
+        with CaptureQueriesContext(connection) as queries:
+            self.found('васил')
+        self.assertIn(OrganizationSearch.FTS_TABLE, queries.captured_queries[0]['sql'])
+        self.assertSearch()
+
+    def test_like_fallback(self):
+        with mock.patch.object(OrganizationSearch, 'fts_available', return_value=False):
+            with CaptureQueriesContext(connection) as queries:
+                self.found('васил')
+            self.assertNotIn(OrganizationSearch.FTS_TABLE, queries.captured_queries[0]['sql'])
+            self.assertSearch()
+
+    def test_fts_triggers_follow_changes(self):
+        self.company.name = 'Лютик'
+        self.company.save()
+        self.assertEqual(self.found('васил'), set())
+        self.assertEqual(self.found('лют'), {self.company.pk})
+
+        pk = self.company.pk
+        self.company.delete()
+        self.assertEqual(self.found('лют'), set())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {OrganizationSearch.FTS_TABLE} '
+                           f'WHERE {OrganizationSearch.FTS_TABLE} MATCH %s', ['"лютик"*'])
+            self.assertEqual(cursor.fetchone()[0], 0, pk)
+
+    def test_api_hides_search_text(self):
+        self.user.is_superuser = True
+        self.user.save()
+        request = APIRequestFactory().get('/', {'search': 'васил'})
+        force_authenticate(request, user=self.user)
+        response = OrganizationViewSet.as_view({'get': 'list'})(request)
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['id'] for row in rows], [self.company.pk])
+        self.assertNotIn('search_text', rows[0])
+
+
+class OrganizationSimilarityTests(ErpTestCase):
+    """Похожие наименования контрагентов по триграммам"""
+
+    def legal_entity(self, name):
+        number = Organization.objects.count()
+        return LegalEntity.objects.create(
+            type='LEGAL', user=self.user, internal_legal_entity=self.internal_legal_entity,
+            legal_form='OOO', name=name, inn=f'77200{number:05d}',
+        )
+
+    def test_word_order_and_legal_form_do_not_matter(self):
+        self.legal_entity('Василек')
+        self.assertEqual(OrganizationSimilarity.similar('Ромашка ООО'), [(self.organization.pk, 1.0)])
+        self.assertEqual(OrganizationSimilarity.similar('ООО "Ромашка"', exclude=self.organization.pk), [])
+        self.assertEqual(OrganizationSimilarity.similar('Лютик'), [])
+
+    def test_clusters(self):
+        duplicate = self.legal_entity('Ромашка ООО')
+        self.legal_entity('Василек')
+        self.assertEqual(OrganizationSimilarity.clusters(), [[self.organization.pk, duplicate.pk]])
+
+    def test_closer_match_is_not_cut_by_shared_trigrams(self):
+        # У длинных наименований больше общих триграмм с запросом, но схожесть ниже
+        for suffix in 'абвгде':
+            self.legal_entity(f'Ромашка Плюс Групп {suffix}')
+        closest = self.legal_entity('Ромашка Плю')
+        self.assertEqual(OrganizationSimilarity.similar('Ромашка Плюс', limit=1)[0][0], closest.pk)
+
+    def test_frequent_trigrams_are_skipped(self):
+        closest = self.legal_entity('Ромашка Плю')
+        # Триграммы слова "ромашка" есть у двух контрагентов и при max_postings=1 не используются
+        self.assertEqual(OrganizationSimilarity.similar('Ромашка Плю', max_postings=1), [(closest.pk, 1.0)])
+        self.assertEqual(OrganizationSimilarity.similar('Ромашка', max_postings=1), [])
+
+
+class MorphologyTests(TestCase):
+    """Склонения для договоров через общий анализатор и кэш"""
+
+    def test_genitive_case(self):
+        self.assertEqual(Morphology.genitive_case('генеральный директор'), 'генерального директора')
+        self.assertEqual(Morphology.get_workday_phrase(21), '21 рабочий день')
+        self.assertEqual(Morphology.get_workday_phrase(10), '10 рабочих дней')
+
+    def test_inflection_error_is_logged(self):
+        Morphology.cache_clear()
+        with mock.patch.object(Morphology, 'analyzer', side_effect=RuntimeError('словари не найдены')):
+            with self.assertLogs('erp_main.services.morphology', level='WARNING') as logs:
+                self.assertEqual(Morphology.genitive_case('директор'), 'директор')
+        Morphology.cache_clear()
+        self.assertEqual(logs.records[0].args[0], 'директор')
+
+    def test_preload_follows_setting(self):
+        with mock.patch.object(Morphology, 'warm_up') as warm_up:
+            with self.settings(CONTRACT_MORPHOLOGY_PRELOAD=False):
+                Morphology.preload()
+            warm_up.assert_not_called()
+            with self.settings(CONTRACT_MORPHOLOGY_PRELOAD=True):
+                Morphology.preload()
+            warm_up.assert_called_once()
@@ -2,16 +2,18 @@ from django.contrib.auth.views import LogoutView
 from django.urls import path
 from .views import (
     custom_login, glass_info, update_glass_status,
-    OrderUploadView, orders_list, order_detail, update_order_item_status,
+    OrderUploadView, OrderBatchUploadView, orders_list, order_detail, update_order_item_status, order_import_job_status,
     invoice_add, invoice_detail, invoices_list,
 
     save_shipment, shipment_detail, delete_shipment, calendar_view, debug_users, passport, create_contract
 )
 from .views.organizations import OrganizationCreateView, OrganizationUpdateView, OrganizationListView, \
-    TakeOverOrganizationView, OrganizationTypeSelectView, OrganizationDetailView, OrganizationDeleteView
+    TakeOverOrganizationView, OrganizationTypeSelectView, OrganizationDetailView, OrganizationDeleteView, \
+    SimilarOrganizationsView
 from .views import certificates
 from .views.orders import update_workshop
 from .views.base import index
+from .views.stock import ReorderReportView
 
 
 urlpatterns = [
@@ -25,9 +27,14 @@ urlpatterns = [
     # Orders
     path('orders/upload/', OrderUploadView.as_view(), name='order_upload'),
     path('orders/upload/<int:order_id>/', OrderUploadView.as_view(), name='order_upload'),
+    path('orders/upload/batch/', OrderBatchUploadView.as_view(), name='order_batch_upload'),
     path('orders/', orders_list, name='orders_list'),
     path('orders/<int:order_id>/', order_detail, name='order_detail'),
     path('orders/update_status/', update_order_item_status, name='update_order_item_status'),
+    path('orders/import-jobs/<int:job_id>/', order_import_job_status, name='order_import_job_status'),
+
+    # Stock
+    path('stock/reorder/', ReorderReportView.as_view(), name='reorder_report'),
 
     # Invoices
     path('invoices/add/', invoice_add, name='invoice_add'),
@@ -38,6 +45,7 @@ urlpatterns = [
     path('organizations/', OrganizationListView.as_view(), name='organization_list'),
     path('organizations/select-type/', OrganizationTypeSelectView.as_view(), name='organization_select_type'),
     path('organizations/create/', OrganizationCreateView.as_view(), name='organization_add'),
+    path('organizations/similar/', SimilarOrganizationsView.as_view(), name='organization_similar'),
     path('organizations/<int:pk>/', OrganizationDetailView.as_view(), name='organization_detail'),
     path('organizations/<int:pk>/update/', OrganizationUpdateView.as_view(), name='organization_update'),
     path('organizations/<int:pk>/delete/', OrganizationDeleteView.as_view(), name='organization_delete'),
@@ -1,6 +1,5 @@
 import json
 import os
-import pymorphy3
 from django.conf import settings
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
@@ -17,6 +16,7 @@ from erp_main.views.permissions import get_user_role_from_request
 from .models import Order, OrderItem, Organization, Invoice, InternalLegalEntity, GlassInfo, OrderChangeHistory, Contract, \
     Shipment
 from .forms import OrderForm, InvoiceForm, OrderFileForm, ShipmentForm, InternalLegalEntityForm
+from .services.morphology import Morphology
 import logging
 from docx import Document
 from datetime import datetime, timedelta, time
@@ -697,65 +697,10 @@ def create_contract(request, pk):
     month_num = now.month
     month_name = months_ru[month_num - 1]
 
-    def genitive_case(word):
-        if not word:  # Если слово пустое, возвращаем пустую строку
-            return ""
-        morph = pymorphy3.MorphAnalyzer()
-        try:
-            words = word.split()  # Разделяем словосочетание на отдельные слова
-            modified_words = []  # Список для измененных слов
-
-            for w in words:
-                parsed_word = morph.parse(w)[0]  # Анализируем каждое слово
-                if "NOUN" in parsed_word.tag or "ADJF" in parsed_word.tag:  # Если это существительное или прилагательное
-                    genitive = parsed_word.inflect({"gent"}).word  # Склоняем в родительный падеж
-                    modified_words.append(genitive)  # Добавляем в список
-                else:
-                    modified_words.append(w)  # Если это не существительное или прилагательное, добавляем исходное слово
-
-            # Проверяем, состоит ли словосочетание из трех слов (например, ФИО)
-            if len(words) == 3:
-                if 'уляшва' in modified_words:
-                    modified_words[0] = 'уляшова'
-                capitalized_words = [word.capitalize() for word in modified_words]  # Капитализируем каждое слово
-                return " ".join(capitalized_words)  # Соединяем слова обратно в строку
-            else:
-                return " ".join(modified_words)  # Возвращаем без изменений в регистре
-
-        except Exception as e:
-            print(f"Ошибка при склонении слова '{word}': {e}")
-            return word  # В случае ошибки возвращаем исходное слово
-
-    def format_full_name(surname, name, patronymic):
-        # Преобразование в формат "Фамилия И. О."
-        formatted_name = f"{surname.capitalize()} {name[0].upper()}. {patronymic[0].upper()}."
-        return formatted_name
-
-    def get_workday_phrase(number):
-        # Инициализация морфологического анализатора
-        morph = pymorphy3.MorphAnalyzer()
-
-        # Определение формы слова "рабочий"
-        if number % 10 == 1 and number % 100 != 11:
-            workday_form = morph.parse('рабочий')[0].inflect(
-                {'nomn', 'sing'}).word  # Именительный падеж, единственное число
-        elif number % 10 in [2, 3, 4] and not (number % 100 in [12, 13, 14]):
-            workday_form = morph.parse('рабочий')[0].inflect(
-                {'gent', 'plur'}).word  # Родительный падеж, множественное число
-        else:
-            workday_form = morph.parse('рабочий')[0].inflect(
-                {'gent', 'plur'}).word  # Родительный падеж, множественное число
-
-        # Определение формы слова "день"
-        if number % 10 == 1 and number % 100 != 11:
-            day_form = 'день'  # 1, 21
-        elif number % 10 in [2, 3, 4] and not (number % 100 in [12, 13, 14]):
-            day_form = 'дня'  # 2, 3, 4, 22, 23, 24
-        else:
-            day_form = 'дней'  # 5-20, 25-31
-
-        # Формируем строку
-        return f"{number} {workday_form} {day_form}"
+    # Общий анализатор процесса и кэш склонений вместо нового MorphAnalyzer на каждый вызов
+    genitive_case = Morphology.genitive_case
+    format_full_name = Morphology.format_full_name
+    get_workday_phrase = Morphology.get_workday_phrase
 
     if request.method == 'POST':
         legal_entity_id = request.POST.get('legal_entity')
@@ -7,7 +7,7 @@ from .base import index, glass_info, update_glass_status, debug_users
 from .orders import update_workshop
 
 # Order views
-from .orders import OrderUploadView, orders_list, order_detail, update_order_item_status
+from .orders import OrderUploadView, OrderBatchUploadView, orders_list, order_detail, update_order_item_status, order_import_job_status
 
 # Invoice views
 from .invoices import invoice_add, invoice_detail, invoices_list
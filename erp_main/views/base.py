@@ -74,7 +74,7 @@ def index(request):
             order_query = order_query.filter(items__p_status=order_status).distinct()
 
         # Получаем данные
-        user_invoices = invoice_query.order_by('-date')
+        user_invoices = invoice_query.select_related('organization').order_by('-date')
         user_orders = order_query.order_by('-created_at')
 
         # Подготовка контекста
@@ -90,7 +90,7 @@ def index(request):
             'total_invoices_amount': user_invoices.aggregate(total=Sum('amount'))['total'] or 0,
             'invoices': user_invoices,
             'orders': user_orders,
-            'organizations': user_orgs,
+            'organizations': user_orgs.with_subtypes().with_stats(),
         }
 
         return render(request, 'index.html', context)
@@ -7,7 +7,7 @@ from django.http import JsonResponse
 from django.urls import reverse
 from django.db import IntegrityError
 
-from ..models import Invoice, Organization, InternalLegalEntity
+from ..models import Invoice, Organization, InternalLegalEntity, prefetch_organization_subtypes
 from ..forms import InvoiceForm
 from .permissions import get_user_role_from_request, can_add_invoice, ajax_permission_required
 
@@ -92,12 +92,15 @@ def invoices_list(request):
         invoices = Invoice.objects.all()
     else:
         invoices = Invoice.objects.filter(organization__user=request.user)
+    invoices = invoices.select_related('internal_legal_entity').prefetch_related(
+        prefetch_organization_subtypes('organization', Organization.objects.select_related('user'))
+    )
 
     # Фильтрация по поисковому запросу
     if search_query:
         invoices = invoices.filter(
             Q(number__icontains=search_query) |
-            Q(organization__name__icontains=search_query)
+            Q(organization__in=Organization.objects.search(search_query))
         )
 
     # Фильтрация по выбранному юридическому лицу
@@ -2,6 +2,8 @@
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
 
+from ..services.organization_identifiers import OrganizationIdentifiers
+
 
 class OrganizationManager:
     @classmethod
@@ -18,25 +20,24 @@ class OrganizationManager:
 
     @classmethod
     def find_by_inn(cls, inn):
-        """Найти контрагента по ИНН (для юрлиц и ИП)"""
-        from ..models import LegalEntity, IndividualEntrepreneur
-
-        legal_entity = LegalEntity.objects.filter(inn=inn).select_related('internal_legal_entity').first()
-        if legal_entity:
-            return legal_entity
+        """Найти контрагента по ИНН (для юрлиц и ИП) через реестр идентификаторов"""
+        return cls._find(OrganizationIdentifiers.INN, inn)
 
-        individual_entrepreneur = IndividualEntrepreneur.objects.filter(inn=inn).select_related(
-            'internal_legal_entity').first()
-        if individual_entrepreneur:
-            return individual_entrepreneur
-
-        return None
+    @classmethod
+    def find_by_ogrn(cls, ogrn):
+        """Найти контрагента по ОГРН/ОГРНИП"""
+        return cls._find(OrganizationIdentifiers.OGRN, ogrn)
 
     @classmethod
     def find_by_phone(cls, phone):
-        """Найти контрагента по телефону (для физлиц)"""
-        from ..models import PhysicalPerson
-        return PhysicalPerson.objects.filter(phone=phone).first()
+        """Найти контрагента по телефону (для физлиц), номер в любом формате"""
+        return cls._find(OrganizationIdentifiers.PHONE, phone)
+
+    @staticmethod
+    def _find(kind, value):
+        """Конкретный экземпляр (юрлицо, ИП, физлицо) первого найденного контрагента или None"""
+        organization = OrganizationIdentifiers.find(kind, value).with_subtypes().first()
+        return organization.subtype if organization else None
 
     @classmethod
     def get_by_internal_company(cls, internal_company):
@@ -6,15 +6,15 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.views.generic import FormView
 from django.core.exceptions import ValidationError, PermissionDenied
-from django.db.models import Q
-from openpyxl import load_workbook
+from django.db import transaction
+from django.db.models import Q, OuterRef, Subquery
 import json
 import logging
-import re
 from django.contrib import messages
 
-from ..models import Order, OrderItem, Organization, InternalLegalEntity, GlassInfo, OrderChangeHistory
-from ..forms import OrderForm, OrderFileForm
+from ..models import (Order, OrderItem, Organization, InternalLegalEntity, OrderChangeHistory, OrderImportJob,
+                      prefetch_organization_subtypes)
+from ..forms import OrderForm, OrderFileForm, OrderBatchForm
 from .mixins import UserAccessMixin
 from .permissions import (  # Импорт из нового файла permissions.py
     get_user_role_from_request,
@@ -23,7 +23,11 @@ from .permissions import (  # Импорт из нового файла permissi
     can_edit_order_detail,
     can_modify_order_item, ajax_permission_required
 )
+from ..services.order_batch_import import OrderBatchImportService
+from ..services.order_import_jobs import OrderImportJobService
 from ..services.order_processor import OrderProcessor
+from ..services.order_reservation import OrderReservationService
+from ..services.order_summary import OrderSummaryService
 
 logger = logging.getLogger(__name__)
 
@@ -91,29 +95,34 @@ class OrderUploadView(UserAccessMixin, FormView):
         if uploaded_file:
             order.order_file = uploaded_file
 
-            # Проверка файла
+            # Быстрая проверка заголовка, разбор бланка выполняется в фоне
             try:
-                wb = load_workbook(uploaded_file)
-                if not self.processor.validate_file_header(wb.active):
-                    form.add_error('order_file', 'Выберите правильный файл заказа')
-                    return self.form_invalid(form)
+                self.processor.check_blank(uploaded_file)
+            except ValidationError:
+                form.add_error('order_file', 'Выберите правильный файл заказа')
+                return self.form_invalid(form)
             except Exception as e:
                 form.add_error('order_file', 'Ошибка загрузки файла: ' + str(e))
                 return self.form_invalid(form)
 
-        # Сохраняем объект Order
-        order.save()
-
-        # Обработка загрузки файла и обновление позиций заказа
-        if uploaded_file:
-            wb = load_workbook(uploaded_file)
-            new_positions = self.processor.process_file_data(wb.active)
-
-            if is_update:
-                self._update_order_items(order, new_positions, old_file)
-            else:
-                self._create_order_items(order, new_positions)
+        job = None
+        with transaction.atomic():
+            # Сохраняем объект Order
+            order.save()
 
+            # Позиции заказа создаются или обновляются заданием в фоне
+            if uploaded_file:
+                job = OrderImportJobService.enqueue(order, self.request.user, is_update=is_update,
+                                                    old_file=old_file if is_update else None)
+
+        if job and self.request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({
+                **OrderImportJobService.as_dict(job),
+                'status_url': reverse('order_import_job_status', args=[job.pk]),
+                'order_url': reverse('order_detail', args=[order.id]),
+            })
+        if job:
+            messages.info(self.request, 'Бланк заказа поставлен в обработку')
         return redirect(reverse('order_detail', args=[order.id]))
 
     def _can_edit_order(self, order):
@@ -130,176 +139,42 @@ class OrderUploadView(UserAccessMixin, FormView):
 
         return False
 
-    def _update_order_items(self, order, new_positions, old_file):
-        """Обновление позиций существующего заказа"""
-        current_items = {item.position_num: item for item in
-                         OrderItem.objects.filter(order=order).prefetch_related('glasses')}
-        changes_made = []
-
-        for data in new_positions:
-            n_num = str(data[0])
-            name = data[1]
-            n_kind = self.processor.get_product_kind(name)
-            n_type = self.processor.get_product_type(name)
-            n_construction = 'NK' if re.search('-м', name.lower()) else 'SK'
-
-            new_item_data = {
-                'p_kind': n_kind,
-                'p_type': n_type,
-                'p_construction': n_construction,
-                'p_height': data[2],
-                'p_width': data[3],
-                'p_active_trim': data[4],
-                'p_open': data[5],
-                'p_platband': data[6],
-                'p_furniture': data[7],
-                'p_door_closer': data[8],
-                'p_step': data[9],
-                'p_ral': str(data[10]),
-                'p_quantity': data[11],
-                'p_comment': data[12],
-                'p_glass': self.processor.count_glass_data(data[13:]),
-            }
-
-            if n_num in current_items:
-                first = 0
-                current_item = current_items[n_num]
-                for field, new_value in new_item_data.items():
-                    old_value = getattr(current_item, field, None)
-
-                    # Handle glass changes separately
-                    if field == 'p_glass':
-                        # Get existing glass info from database
-                        old_glass = {(g.height, g.width): g.quantity for g in current_item.glasses.all()}
-                        new_glass = new_value
-
-                        # Check if glass has changed
-                        if old_glass != new_glass:
-                            if first == 0:
-                                changes_made.append(f'<br> поз. {n_num}: изменено стекло ')
-                                first = 1
-
-                            # Format old glass info
-                            old_glass_str = ", ".join(
-                                [f"{h}x{w} ({q} шт.)" for (h, w), q in old_glass.items()]) if old_glass else "нет"
-                            # Format new glass info
-                            new_glass_str = ", ".join(
-                                [f"{h}x{w} ({q} шт.)" for (h, w), q in new_glass.items()]) if new_glass else "нет"
-
-                            changes_made.append(f"с \"{old_glass_str}\" на \"{new_glass_str}\";")
-
-                            # Update p_glass field
-                            setattr(current_item, 'p_glass', str(new_glass))
-                    else:
-                        if str(old_value) != str(new_value):
-                            field_name = OrderItem._meta.get_field(field).verbose_name
-                            if old_value:
-                                if first == 0:
-                                    changes_made.append(
-                                        f'<br> поз. {n_num}:  {field_name} с "{old_value}" на "{new_value}"; ')
-                                    first = 1
-                                else:
-                                    changes_made.append(f'{field_name} с "{old_value}" на "{new_value}";')
-                            else:
-                                changes_made.append(f'поз. {n_num}: добавлен {field_name} "{new_value}";')
-                            setattr(current_item, field, new_value)
-
-                if changes_made:
-                    # Delete existing glass info before saving new one
-                    current_item.glasses.all().delete()
-                    current_item.save()
-
-                    # Save new glass info
-                    for (height, width), quantity in new_item_data['p_glass'].items():
-                        if height and width:  # Only create records for valid dimensions
-                            GlassInfo.objects.create(
-                                order_items=current_item,
-                                height=height,
-                                width=width,
-                                quantity=quantity
-                            )
-            else:
-                new_item = OrderItem(order=order, position_num=n_num, **new_item_data)
-                new_item.p_status = 'in_query'
-                new_item.save()
-
-                # Save glass info for new item
-                for (height, width), quantity in new_item_data['p_glass'].items():
-                    if height and width:
-                        GlassInfo.objects.create(
-                            order_items=new_item,
-                            height=height,
-                            width=width,
-                            quantity=quantity
-                        )
-
-        if changes_made:
-            comment = str(changes_made).replace('[', '').replace(']', '').replace("'", "").replace(",", "").strip()[5::]
-            order.save()
-            add_changes = OrderChangeHistory(order=order, order_file=old_file, changed_by=self.request.user,
-                                             comment=comment)
-            add_changes.save()
-
-            if order.order_file:
-                try:
-                    wb = load_workbook(order.order_file.path)
-                    sheet = wb.active
-                    sheet['K3'] = comment.replace('<br>', '')
-                    wb.save(order.order_file.path)
-                except Exception as e:
-                    logger.error(f"Ошибка при записи комментария в файл: {e}")
-
-    def _create_order_items(self, order, new_positions):
-        """Создание новых позиций заказа"""
-        for data in new_positions:
-            n_num = data[0]
-            name = data[1]
-            n_kind = self.processor.get_product_kind(name)
-            n_type = self.processor.get_product_type(name)
-            n_construction = 'NK' if re.search('-м', name.lower()) else 'SK'
-
-            new_item_data = {
-                'p_kind': n_kind,
-                'p_type': n_type,
-                'p_construction': n_construction,
-                'p_height': data[2],
-                'p_width': data[3],
-                'p_active_trim': data[4],
-                'p_open': data[5],
-                'p_platband': data[6],
-                'p_furniture': data[7],
-                'p_door_closer': data[8],
-                'p_step': data[9],
-                'p_ral': data[10],
-                'p_quantity': data[11],
-                'p_comment': data[12],
-                'p_glass': self.processor.count_glass_data(data[13:]),
-            }
-
-            new_item = OrderItem(order=order, position_num=n_num, **new_item_data)
-            new_item.p_status = 'in_query'
-            new_item.save()
-
-            # Сохраняем информацию о стеклах
-            self._save_glass_info(new_item, new_item_data['p_glass'])
-
-    def _save_glass_info(self, new_item, counted_glass):
-        """Сохраняет информацию о стеклах для нового элемента заказа"""
-        for (height, width), quantity in counted_glass.items():
-            if height and width:
-                GlassInfo.objects.create(
-                    order_items=new_item,
-                    height=height,
-                    width=width,
-                    quantity=quantity
-                )
-
     def form_invalid(self, form):
         """Обработка невалидной формы"""
         organizations = Organization.objects.all()
         return self.render_to_response(self.get_context_data(form=form, organizations=organizations))
 
 
+class OrderBatchUploadView(UserAccessMixin, FormView):
+    """Пакетная загрузка бланков заказов из ZIP-архива с отчетом по каждому файлу"""
+    template_name = 'order_batch_upload.html'
+    form_class = OrderBatchForm
+    required_roles = ['admin', 'director', 'manager', 'production']
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        # Без пула процессов: запуск интерпретаторов spawn на каждый запрос дороже разбора архива,
+        # большие пакеты загружаются командой import_order_blanks
+        report = OrderBatchImportService.import_source(
+            form.cleaned_data['archive'],
+            invoice=form.cleaned_data['invoice'],
+            due_date=form.cleaned_data.get('due_date'),
+            comment=form.cleaned_data.get('comment', ''),
+            workers=1,
+        )
+        if not report:
+            form.add_error('archive', 'В архиве нет файлов .xlsx')
+            return self.form_invalid(form)
+
+        created = sum(1 for result in report if result['success'])
+        messages.info(self.request, f'Создано заказов: {created} из {len(report)}')
+        return self.render_to_response(self.get_context_data(form=form, report=report))
+
+
 @login_required
 def orders_list(request):
     """Список заказов с учетом ролей пользователей"""
@@ -319,6 +194,14 @@ def orders_list(request):
     if source:
         orders = Order.objects.filter(invoice__organization=source).order_by('-id')
 
+    # Счетчики позиций и цех первой позиции считаем в том же запросе, что и страницу заказов
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('position_num')
+    orders = orders.select_related('invoice').prefetch_related(
+        prefetch_organization_subtypes('invoice__organization', Organization.objects.select_related('user'))
+    ).with_rollups().annotate(
+        first_item_workshop=Subquery(first_item.values('workshop')[:1])
+    )
+
     paginator = Paginator(orders, 20)
     page_number = request.GET.get('page')
     orders_page = paginator.get_page(page_number)
@@ -335,7 +218,10 @@ def orders_list(request):
 @login_required
 def order_detail(request, order_id):
     """Детали заказа с проверкой прав доступа"""
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(
+        Order.objects.select_related('invoice__organization__user').with_rollups(),
+        id=order_id
+    )
     user_role = get_user_role_from_request(request)
 
     # Проверяем права доступа к заказу
@@ -346,7 +232,7 @@ def order_detail(request, order_id):
     changes = order.changes.all()
 
     # Отфильтрованные OrderItem, где статус не равен 'changed'
-    filtered_items = order.items.exclude(p_status__in=['changed'])
+    filtered_items = order.items.exclude(p_status__in=['changed']).prefetch_related('nameplates')
 
     if request.method == 'POST':
         # Проверяем права на редактирование заказа
@@ -365,12 +251,22 @@ def order_detail(request, order_id):
         'order': order,
         'filtered_items': filtered_items,
         'changes': changes,
+        'import_job': order.import_jobs.first(),
         'user_role': user_role,  # Передаем роль в шаблон
     }
 
     return render(request, 'order_detail.html', context)
 
 
+@login_required
+def order_import_job_status(request, job_id):
+    """Состояние фоновой обработки бланка заказа"""
+    job = get_object_or_404(OrderImportJob.objects.select_related('order__invoice__organization__user'), pk=job_id)
+    if not can_view_order(request.user, get_user_role_from_request(request), job.order):
+        return JsonResponse({'status': 'error', 'message': 'Недостаточно прав'}, status=403)
+    return JsonResponse(OrderImportJobService.as_dict(job))
+
+
 @require_POST
 @login_required
 def update_order_item_status(request):
@@ -380,32 +276,41 @@ def update_order_item_status(request):
         updates = data.get('updates', {})
         user_role = get_user_role_from_request(request)
 
-        for item_id in updates.keys():
-            order_item = get_object_or_404(OrderItem, id=item_id)
-
-            # Проверяем права на изменение позиции заказа
-            if not can_modify_order_item(request.user, user_role, order_item):
-                return JsonResponse({
-                    'status': 'error',
-                    'message': 'У вас недостаточно прав для изменения этой позиции заказа'
-                }, status=403)
-
-            new_data = updates[item_id]
-
-            # Сохраняем предыдущую логику обновления статусов
-            order_item.p_status = new_data['status']
-            order_item.workshop = new_data['workshop']
-            if order_item.workshop == '2' and new_data['path'] != 'order_detail':
-                order_item.p_status = 'stopped'
-            if ((order_item.p_status == 'stopped' or order_item.p_status == 'canceled') and
-                    new_data['path'] != 'order_detail'):
-                order_item.workshop = '2'
-            order_item.save()
+        with transaction.atomic():
+            order_ids, started = set(), False
+            for item_id in updates.keys():
+                order_item = get_object_or_404(OrderItem, id=item_id)
+
+                # Проверяем права на изменение позиции заказа
+                if not can_modify_order_item(request.user, user_role, order_item):
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': 'У вас недостаточно прав для изменения этой позиции заказа'
+                    }, status=403)
+
+                new_data = updates[item_id]
+
+                # Сохраняем предыдущую логику обновления статусов
+                order_item.p_status = new_data['status']
+                order_item.workshop = new_data['workshop']
+                if order_item.workshop == '2' and new_data['path'] != 'order_detail':
+                    order_item.p_status = 'stopped'
+                if ((order_item.p_status == 'stopped' or order_item.p_status == 'canceled') and
+                        new_data['path'] != 'order_detail'):
+                    order_item.workshop = '2'
+                order_item.save()
+                order_ids.add(order_item.order_id)
+                started = started or order_item.p_status == 'product'
+
+            OrderReservationService.sync_orders(order_ids, request.user, reserve=started)
 
         return JsonResponse({'status': 'success', 'message': 'Информация обновлена'})
 
     except json.JSONDecodeError:
         return JsonResponse({'status': 'error', 'message': 'Неверный формат'}, status=400)
+    except ValueError as e:
+        # Не хватает фурнитуры для резерва запущенных позиций
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         logger.exception("Error updating order items' statuses")
         return JsonResponse({'status': 'error', 'message': 'An error occurred while processing your request.'},
@@ -533,6 +438,16 @@ def process_order_action(order_items, action, user):
     if new_workshop:
         update_data['workshop'] = new_workshop
 
-    order_items.update(**update_data)
+    try:
+        with transaction.atomic():
+            order_ids = set(order_items.values_list('order_id', flat=True))
+            order_items.update(**update_data)
+            # update() не вызывает сигналы, поэтому сводки пересчитываем явно
+            OrderSummaryService.refresh(list(order_ids))
+            # Резерв фурнитуры следует за статусами: запуск резервирует, отгрузка списывает,
+            # остановка, отмена и возврат в очередь снимают резерв
+            OrderReservationService.sync_orders(order_ids, user, reserve=new_status == 'product')
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
 
     return {'success': True, 'comment': comment}
\ No newline at end of file
@@ -4,13 +4,14 @@ from django.views.decorators.http import require_http_methods
 from django.views.generic import CreateView, UpdateView, View, ListView, DeleteView, DetailView
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 from django.forms import formset_factory, modelformset_factory
 from ..models import Organization, LegalEntity, IndividualEntrepreneur, PhysicalPerson, InternalLegalEntity
 from ..forms import LegalEntityForm, IndividualEntrepreneurForm, PhysicalPersonForm, InternalLegalEntityForm
+from ..services.organization_similarity import OrganizationSimilarity
 
 
 class OrganizationCreateView(LoginRequiredMixin, CreateView):
@@ -149,12 +150,11 @@ class OrganizationListView(LoginRequiredMixin, ListView):
         # Предзагрузка всех связанных данных
         queryset = queryset.select_related('user', 'internal_legal_entity')
 
-        # Предзагрузка дочерних моделей для корректной работы свойств
-        queryset = queryset.prefetch_related(
-            'legalentity',
-            'individualentrepreneur',
-            'physicalperson'
-        )
+        # Подтипы загружаются по запросу на тип: ИНН, телефон и e-mail в списке без запросов на строку
+        queryset = queryset.with_subtypes()
+
+        # Последний заказ, число заказов, сумма счетов, оплаты и долг - подзапросами в том же запросе
+        queryset = queryset.with_stats()
 
         # Фильтрация по типу
         org_type = self.request.GET.get('type')
@@ -164,37 +164,8 @@ class OrganizationListView(LoginRequiredMixin, ListView):
         # Поиск
         search_query = self.request.GET.get('search')
         if search_query:
-            # Используем Q-объекты для более эффективного поиска
-            from django.db.models import Q
-
-            # Создаем подзапросы для каждого типа организации
-            legal_entity_ids = LegalEntity.objects.filter(
-                Q(name__icontains=search_query) |
-                Q(inn__icontains=search_query) |
-                Q(leader_name__icontains=search_query) |
-                Q(email__icontains=search_query)
-            ).values_list('organization_ptr_id', flat=True)
-
-            individual_entrepreneur_ids = IndividualEntrepreneur.objects.filter(
-                Q(full_name__icontains=search_query) |
-                Q(inn__icontains=search_query) |
-                Q(email__icontains=search_query)
-            ).values_list('organization_ptr_id', flat=True)
-
-            physical_person_ids = PhysicalPerson.objects.filter(
-                Q(full_name__icontains=search_query) |
-                Q(phone__icontains=search_query) |
-                Q(email__icontains=search_query)
-            ).values_list('organization_ptr_id', flat=True)
-
-            # Объединяем все ID
-            all_ids = list(legal_entity_ids) + list(individual_entrepreneur_ids) + list(physical_person_ids)
-
-            if all_ids:
-                queryset = queryset.filter(id__in=all_ids)
-            else:
-                # Если ничего не найдено, возвращаем пустой queryset
-                queryset = queryset.none()
+            # Один запрос по полнотекстовому индексу Organization.search_text для всех типов
+            queryset = queryset.search(search_query)
 
         return queryset.order_by('-created_at')
 
@@ -239,10 +210,16 @@ class OrganizationDetailView(LoginRequiredMixin, DetailView):
                 'correspondent_account': organization.correspondent_account
             }
 
+        # Последние 10 записей истории, более ранние - по ссылке с ?history_before=<id>
+        history_entries, history_before = organization.history_entries.page(
+            before=self.request.GET.get('history_before')
+        )
+
         context.update({
             'documents': organization.documents.all(),
             'bank_details': bank_details,
-            'history_entries': organization.history[-10:][::-1] if organization.history else []  # Последние 10 записей
+            'history_entries': history_entries,
+            'history_before': history_before,
         })
         return context
 
@@ -278,6 +255,34 @@ class TakeOverOrganizationView(LoginRequiredMixin, View):
         return redirect('organization_list')
 
 
+class SimilarOrganizationsView(LoginRequiredMixin, View):
+    """Похожие контрагенты для формы создания: ?name=<наименование>&exclude=<id редактируемого>"""
+
+    def get(self, request):
+        exclude = request.GET.get('exclude', '')
+        scored = OrganizationSimilarity.similar(
+            request.GET.get('name', ''),
+            exclude=int(exclude) if exclude.isdigit() else None,
+        )
+        organizations = Organization.objects.filter(pk__in=[pk for pk, _ in scored]) \
+            .select_related('user').with_subtypes().in_bulk()
+        results = []
+        for pk, similarity in scored:
+            organization = organizations.get(pk)
+            if organization is None:
+                continue
+            results.append({
+                'id': pk,
+                'name': organization.display_name,
+                'type': organization.get_type_display(),
+                'inn': organization.inn or organization.phone,
+                'manager': organization.user.get_full_name() or organization.user.username,
+                'similarity': round(similarity, 2),
+                'url': reverse('organization_detail', args=[pk]),
+            })
+        return JsonResponse({'results': results})
+
+
 class OrganizationTypeSelectView(LoginRequiredMixin, View):
     """Представление для выбора типа организации перед созданием"""
 
@@ -1,4 +1,36 @@
-from django.db import models
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.generic import ListView
 
-class Stock(models.Model):
-    pass
+from ..services.reorder_report import ReorderReportService
+from .mixins import UserAccessMixin
+
+
+class ReorderReportView(UserAccessMixin, ListView):
+    """Отчет о закупке фурнитуры: позиции ниже минимального запаса с учетом заказов в очереди"""
+    # В отчете закупочные цены поставщиков
+    required_roles = ['admin', 'director']
+    template_name = 'reorder_report.html'
+    context_object_name = 'rows'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return ReorderReportService.queryset(supplier=self.request.GET.get('supplier'))
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('format') == 'xlsx':
+            buffer = ReorderReportService.export_xlsx(supplier=request.GET.get('supplier'))
+            response = HttpResponse(
+                buffer.getvalue(),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+            filename = f'reorder_{timezone.localdate():%Y-%m-%d}.xlsx'
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['supplier_totals'] = ReorderReportService.supplier_totals()
+        context['current_supplier'] = self.request.GET.get('supplier', '')
+        return context